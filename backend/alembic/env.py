@@ -25,12 +25,15 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 from app.core.database import Base
 from app.models import (
+    analytics_rollup,
     audit_ledger,
+    autosave_draft,
     changelog,
     client,
     client_changelog,
     estimate,
     estimate_approval,
+    export_job,
     item,
     organization,
     template,
@@ -0,0 +1,79 @@
+"""add estimate autosave drafts
+
+Revision ID: a2b3c4d5e6f7
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-18 14:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a2b3c4d5e6f7"
+down_revision: Union[str, None] = "e5f6a7b8c9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "estimate_autosave_drafts",
+        sa.Column(
+            "estimate_id",
+            sa.Integer(),
+            sa.ForeignKey("estimates.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "organization_id",
+            sa.Integer(),
+            sa.ForeignKey("organizations.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column("patch", postgresql.JSONB(), nullable=False),
+        sa.Column("writes", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column(
+            "first_write_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column(
+            "last_write_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index(
+        "ix_estimate_autosave_drafts_organization_id",
+        "estimate_autosave_drafts",
+        ["organization_id"],
+    )
+    op.create_index(
+        "ix_estimate_autosave_drafts_first_write_at",
+        "estimate_autosave_drafts",
+        ["first_write_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_estimate_autosave_drafts_first_write_at",
+        table_name="estimate_autosave_drafts",
+    )
+    op.drop_index(
+        "ix_estimate_autosave_drafts_organization_id",
+        table_name="estimate_autosave_drafts",
+    )
+    op.drop_table("estimate_autosave_drafts")
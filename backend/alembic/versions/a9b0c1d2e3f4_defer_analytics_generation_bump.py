@@ -0,0 +1,174 @@
+"""bump the analytics generation once per transaction, at commit
+
+Revision ID: a9b0c1d2e3f4
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-18 23:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9b0c1d2e3f4"
+down_revision: Union[str, None] = "f1a2b3c4d5e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Организации, чьё поколение нужно поднять при коммите, копятся в настройке
+# транзакции: строку analytics_generations пишем один раз и только в самом
+# конце, чтобы её блокировка не держалась всю транзакцию
+DEFER_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_defer(p_organization_ids integer[])
+RETURNS void AS $$
+BEGIN
+    PERFORM set_config(
+        'analytics.generation_pending',
+        coalesce(
+            (
+                SELECT string_agg(DISTINCT t.organization_id::text, ',')
+                FROM (
+                    SELECT unnest(string_to_array(
+                        nullif(current_setting('analytics.generation_pending', true), ''), ','
+                    ))::integer
+                    UNION
+                    SELECT unnest(p_organization_ids)
+                ) AS t(organization_id)
+                WHERE t.organization_id IS NOT NULL
+            ),
+            ''
+        ),
+        true
+    );
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Отложенный триггер срабатывает при коммите; первая же строка поднимает
+# все накопленные поколения, остальные видят пустой список
+FLUSH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_flush() RETURNS trigger AS $$
+DECLARE
+    v_pending text := coalesce(current_setting('analytics.generation_pending', true), '');
+BEGIN
+    IF v_pending <> '' THEN
+        PERFORM set_config('analytics.generation_pending', '', true);
+        PERFORM analytics_generation_bump(string_to_array(v_pending, ',')::integer[]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_rollups_touch(
+    p_organization_ids integer[], p_days date[]
+) RETURNS void AS $$
+DECLARE
+    touched record;
+BEGIN
+    PERFORM analytics_generation_defer(p_organization_ids);
+    IF coalesce(current_setting('analytics.rollups_deferred', true), '') = 'on' THEN
+        RETURN;
+    END IF;
+    FOR touched IN
+        SELECT DISTINCT t.organization_id, t.day
+        FROM unnest(p_organization_ids, p_days) AS t(organization_id, day)
+        WHERE t.organization_id IS NOT NULL AND t.day IS NOT NULL
+        ORDER BY 1, 2
+    LOOP
+        PERFORM pg_advisory_xact_lock(touched.organization_id, touched.day - DATE '2000-01-01');
+        PERFORM refresh_analytics_daily_rollups(touched.organization_id, touched.day, touched.day + 1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+CLIENTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_clients_updated() RETURNS trigger AS $$
+BEGIN
+    PERFORM analytics_generation_defer(array_agg(n.organization_id))
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    WHERE o.name IS DISTINCT FROM n.name;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_rollups_touch(
+    p_organization_ids integer[], p_days date[]
+) RETURNS void AS $$
+DECLARE
+    touched record;
+BEGIN
+    PERFORM analytics_generation_bump(p_organization_ids);
+    IF coalesce(current_setting('analytics.rollups_deferred', true), '') = 'on' THEN
+        RETURN;
+    END IF;
+    FOR touched IN
+        SELECT DISTINCT t.organization_id, t.day
+        FROM unnest(p_organization_ids, p_days) AS t(organization_id, day)
+        WHERE t.organization_id IS NOT NULL AND t.day IS NOT NULL
+        ORDER BY 1, 2
+    LOOP
+        PERFORM pg_advisory_xact_lock(touched.organization_id, touched.day - DATE '2000-01-01');
+        PERFORM refresh_analytics_daily_rollups(touched.organization_id, touched.day, touched.day + 1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_CLIENTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_clients_updated() RETURNS trigger AS $$
+BEGIN
+    PERFORM analytics_generation_bump(array_agg(n.organization_id))
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    WHERE o.name IS DISTINCT FROM n.name;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+FLUSH_TRIGGERS = (
+    ("trg_estimates_analytics_generation_flush", "estimates", "INSERT OR UPDATE OR DELETE"),
+    ("trg_estimate_items_analytics_generation_flush", "estimate_items", "INSERT OR UPDATE OR DELETE"),
+    ("trg_clients_analytics_generation_flush", "clients", "UPDATE OF name"),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute(DEFER_FUNCTION)
+    op.execute(FLUSH_FUNCTION)
+    op.execute(TOUCH_FUNCTION)
+    op.execute(CLIENTS_FUNCTION)
+    for name, table, event in FLUSH_TRIGGERS:
+        op.execute(
+            f"""
+            CREATE CONSTRAINT TRIGGER {name}
+            AFTER {event} ON {table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW EXECUTE FUNCTION analytics_generation_flush();
+            """
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    for name, table, _ in FLUSH_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+    op.execute(PREVIOUS_CLIENTS_FUNCTION)
+    op.execute(PREVIOUS_TOUCH_FUNCTION)
+    op.execute("DROP FUNCTION IF EXISTS analytics_generation_flush()")
+    op.execute("DROP FUNCTION IF EXISTS analytics_generation_defer(integer[])")
@@ -0,0 +1,63 @@
+"""delta-encoded estimate versions
+
+Revision ID: b3c4d5e6f7a8
+Revises: a2b3c4d5e6f7
+Create Date: 2026-10-18 16:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3c4d5e6f7a8"
+down_revision: Union[str, None] = "a2b3c4d5e6f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "estimate_versions",
+        sa.Column("kind", sa.String(length=16), nullable=False, server_default="keyframe"),
+    )
+    op.add_column("estimate_versions", sa.Column("base_version", sa.Integer(), nullable=True))
+    op.add_column("estimate_versions", sa.Column("encoding", sa.String(length=16), nullable=True))
+    op.add_column("estimate_versions", sa.Column("data", sa.LargeBinary(), nullable=True))
+    op.add_column("estimate_versions", sa.Column("size_bytes", sa.Integer(), nullable=True))
+    op.alter_column("estimate_versions", "payload", existing_type=sa.JSON(), nullable=True)
+
+    # Существующие строки остаются полными снимками; перевести их в
+    # keyframe/delta можно командой python -m app.cli.versions convert
+    op.execute(
+        "UPDATE estimate_versions SET size_bytes = octet_length(payload::text) "
+        "WHERE payload IS NOT NULL"
+    )
+    op.create_index(
+        "ix_estimate_versions_estimate_id_version",
+        "estimate_versions",
+        ["estimate_id", "version"],
+    )
+
+
+def downgrade() -> None:
+    # Версии без payload хранятся только как keyframe/delta: удалить их
+    # значит потерять историю. Сначала: python -m app.cli.versions expand
+    bind = op.get_bind()
+    encoded = bind.execute(
+        sa.text("SELECT count(*) FROM estimate_versions WHERE payload IS NULL")
+    ).scalar()
+    if encoded:
+        raise RuntimeError(
+            f"{encoded} estimate versions have no JSON payload; "
+            "run `python -m app.cli.versions expand` before downgrading"
+        )
+    op.drop_index("ix_estimate_versions_estimate_id_version", table_name="estimate_versions")
+    op.alter_column("estimate_versions", "payload", existing_type=sa.JSON(), nullable=False)
+    op.drop_column("estimate_versions", "size_bytes")
+    op.drop_column("estimate_versions", "data")
+    op.drop_column("estimate_versions", "encoding")
+    op.drop_column("estimate_versions", "base_version")
+    op.drop_column("estimate_versions", "kind")
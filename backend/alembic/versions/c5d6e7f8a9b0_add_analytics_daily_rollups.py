@@ -0,0 +1,271 @@
+"""daily analytics rollups maintained by triggers
+
+Revision ID: c5d6e7f8a9b0
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-18 18:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d6e7f8a9b0"
+down_revision: Union[str, None] = "b3c4d5e6f7a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Пересчитывает строки за дни [p_from, p_to) (NULL — без границы) из estimates
+# и estimate_items. Дни считаются в UTC.
+REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION refresh_analytics_daily_rollups(
+    p_organization_id integer, p_from date, p_to date
+) RETURNS void AS $$
+DECLARE
+    v_from timestamptz := coalesce(p_from::timestamp AT TIME ZONE 'UTC', '-infinity');
+    v_to timestamptz := coalesce(p_to::timestamp AT TIME ZONE 'UTC', 'infinity');
+BEGIN
+    DELETE FROM analytics_daily_rollups
+    WHERE organization_id = p_organization_id
+      AND day >= coalesce(p_from, '-infinity'::date)
+      AND day < coalesce(p_to, 'infinity'::date);
+
+    INSERT INTO analytics_daily_rollups (
+        organization_id, day, client_id, responsible, category, status,
+        vat_enabled, use_internal_price, estimates_count, priced_estimates_count,
+        items_count, total_external, margin, revenue
+    )
+    SELECT
+        e.organization_id,
+        (e.date AT TIME ZONE 'UTC')::date,
+        e.client_id,
+        e.responsible,
+        '*',
+        e.status,
+        e.vat_enabled,
+        e.use_internal_price,
+        count(*),
+        count(*) FILTER (WHERE e.items_count > 0),
+        coalesce(sum(e.items_count), 0),
+        coalesce(sum(e.total_external) FILTER (WHERE e.items_count > 0), 0),
+        coalesce(sum(e.margin) FILTER (WHERE e.items_count > 0), 0),
+        coalesce(
+            sum(CASE WHEN e.use_internal_price THEN e.margin ELSE e.total_external END)
+                FILTER (WHERE e.items_count > 0),
+            0
+        )
+    FROM estimates e
+    WHERE e.organization_id = p_organization_id
+      AND e.date >= v_from
+      AND e.date < v_to
+    GROUP BY 1, 2, 3, 4, 6, 7, 8;
+
+    INSERT INTO analytics_daily_rollups (
+        organization_id, day, client_id, responsible, category, status,
+        vat_enabled, use_internal_price, estimates_count, priced_estimates_count,
+        items_count, total_external, margin, revenue
+    )
+    SELECT
+        e.organization_id,
+        (e.date AT TIME ZONE 'UTC')::date,
+        e.client_id,
+        e.responsible,
+        lower(i.category),
+        e.status,
+        e.vat_enabled,
+        e.use_internal_price,
+        count(DISTINCT e.id),
+        count(DISTINCT e.id),
+        count(*),
+        coalesce(sum(i.quantity * i.external_price), 0),
+        coalesce(sum(i.quantity * (i.external_price - i.internal_price)), 0),
+        coalesce(
+            sum(
+                i.quantity * CASE
+                    WHEN e.use_internal_price THEN i.external_price - i.internal_price
+                    ELSE i.external_price
+                END
+            ),
+            0
+        )
+    FROM estimates e
+    JOIN estimate_items i ON i.estimate_id = e.id
+    WHERE e.organization_id = p_organization_id
+      AND e.date >= v_from
+      AND e.date < v_to
+      AND i.category IS NOT NULL
+      AND lower(i.category) <> '*'
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Пересчёт затронутых дней. Блокировка на (организация, день) до конца
+# транзакции: параллельная запись в тот же день дождётся коммита и
+# пересчитает его уже с учётом чужих изменений.
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_rollups_touch(
+    p_organization_ids integer[], p_days date[]
+) RETURNS void AS $$
+DECLARE
+    touched record;
+BEGIN
+    IF coalesce(current_setting('analytics.rollups_deferred', true), '') = 'on' THEN
+        RETURN;
+    END IF;
+    FOR touched IN
+        SELECT DISTINCT t.organization_id, t.day
+        FROM unnest(p_organization_ids, p_days) AS t(organization_id, day)
+        WHERE t.organization_id IS NOT NULL AND t.day IS NOT NULL
+        ORDER BY 1, 2
+    LOOP
+        PERFORM pg_advisory_xact_lock(touched.organization_id, touched.day - DATE '2000-01-01');
+        PERFORM refresh_analytics_daily_rollups(touched.organization_id, touched.day, touched.day + 1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+ESTIMATE_ROLLUP_COLUMNS = (
+    "organization_id",
+    "date",
+    "client_id",
+    "responsible",
+    "status",
+    "vat_enabled",
+    "use_internal_price",
+    "items_count",
+    "total_external",
+    "margin",
+)
+
+
+def _touch(alias: str) -> str:
+    return (
+        f"PERFORM analytics_rollups_touch(array_agg({alias}.organization_id), "
+        f"array_agg(({alias}.date AT TIME ZONE 'UTC')::date))"
+    )
+
+
+def _columns(alias: str) -> str:
+    return ", ".join(f"{alias}.{column}" for column in ESTIMATE_ROLLUP_COLUMNS)
+
+
+TRIGGER_FUNCTIONS = {
+    "analytics_rollups_estimates_inserted": f"{_touch('n')} FROM new_rows n;",
+    "analytics_rollups_estimates_deleted": f"{_touch('o')} FROM old_rows o;",
+    # Только сметы, у которых изменилось что-то, влияющее на агрегаты
+    "analytics_rollups_estimates_updated": f"""
+        {_touch('t')}
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL (
+            VALUES (o.organization_id, o.date), (n.organization_id, n.date)
+        ) AS t(organization_id, date)
+        WHERE ({_columns('o')}) IS DISTINCT FROM ({_columns('n')});
+    """,
+    "analytics_rollups_items_inserted": f"""
+        {_touch('e')}
+        FROM estimates e WHERE e.id IN (SELECT estimate_id FROM new_rows);
+    """,
+    "analytics_rollups_items_deleted": f"""
+        {_touch('e')}
+        FROM estimates e WHERE e.id IN (SELECT estimate_id FROM old_rows);
+    """,
+    "analytics_rollups_items_updated": f"""
+        {_touch('e')}
+        FROM estimates e
+        WHERE e.id IN (SELECT estimate_id FROM old_rows UNION SELECT estimate_id FROM new_rows);
+    """,
+}
+
+TRIGGERS = (
+    ("trg_estimates_rollups_insert", "estimates", "INSERT", "NEW TABLE AS new_rows", "analytics_rollups_estimates_inserted"),
+    ("trg_estimates_rollups_update", "estimates", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows", "analytics_rollups_estimates_updated"),
+    ("trg_estimates_rollups_delete", "estimates", "DELETE", "OLD TABLE AS old_rows", "analytics_rollups_estimates_deleted"),
+    ("trg_estimate_items_rollups_insert", "estimate_items", "INSERT", "NEW TABLE AS new_rows", "analytics_rollups_items_inserted"),
+    ("trg_estimate_items_rollups_update", "estimate_items", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows", "analytics_rollups_items_updated"),
+    ("trg_estimate_items_rollups_delete", "estimate_items", "DELETE", "OLD TABLE AS old_rows", "analytics_rollups_items_deleted"),
+)
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_estimates_organization_id_date",
+        "estimates",
+        ["organization_id", "date"],
+    )
+    op.create_table(
+        "analytics_daily_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("client_id", sa.Integer(), nullable=True),
+        sa.Column("responsible", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="estimate_status", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("vat_enabled", sa.Boolean(), nullable=True),
+        sa.Column("use_internal_price", sa.Boolean(), nullable=False),
+        sa.Column("estimates_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("priced_estimates_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("items_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_external", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("margin", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("revenue", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ix_analytics_daily_rollups_org_category_day",
+        "analytics_daily_rollups",
+        ["organization_id", "category", "day"],
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute(REFRESH_FUNCTION)
+    op.execute(TOUCH_FUNCTION)
+    for name, body in TRIGGER_FUNCTIONS.items():
+        op.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+            BEGIN
+                {body.strip()}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """
+        )
+    for name, table, event, referencing, function in TRIGGERS:
+        op.execute(
+            f"""
+            CREATE TRIGGER {name}
+            AFTER {event} ON {table}
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+            """
+        )
+    op.execute("SELECT refresh_analytics_daily_rollups(id, NULL, NULL) FROM organizations")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name, table, *_ in TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        for name in TRIGGER_FUNCTIONS:
+            op.execute(f"DROP FUNCTION IF EXISTS {name}()")
+        op.execute("DROP FUNCTION IF EXISTS analytics_rollups_touch(integer[], date[])")
+        op.execute("DROP FUNCTION IF EXISTS refresh_analytics_daily_rollups(integer, date, date)")
+
+    op.drop_index("ix_analytics_daily_rollups_org_category_day", table_name="analytics_daily_rollups")
+    op.drop_table("analytics_daily_rollups")
+    op.drop_index("ix_estimates_organization_id_date", table_name="estimates")
@@ -0,0 +1,72 @@
+"""add export jobs
+
+Revision ID: d4e5f6a7b8c9
+Revises: b9d0e1f2a3b4
+Create Date: 2026-10-18 10:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4e5f6a7b8c9"
+down_revision: Union[str, None] = "b9d0e1f2a3b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "export_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "organization_id",
+            sa.Integer(),
+            sa.ForeignKey("organizations.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=False, server_default=sa.text("'{}'")),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="queued"),
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("file_path", sa.String(length=1024), nullable=True),
+        sa.Column("file_name", sa.String(length=255), nullable=True),
+        sa.Column("media_type", sa.String(length=100), nullable=True),
+        sa.Column("file_size", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_index("ix_export_jobs_id", "export_jobs", ["id"], unique=False)
+    op.create_index("ix_export_jobs_organization_id", "export_jobs", ["organization_id"], unique=False)
+    op.create_index("ix_export_jobs_user_id", "export_jobs", ["user_id"], unique=False)
+    op.create_index("ix_export_jobs_status", "export_jobs", ["status"], unique=False)
+    op.create_index("ix_export_jobs_expires_at", "export_jobs", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_export_jobs_expires_at", table_name="export_jobs")
+    op.drop_index("ix_export_jobs_status", table_name="export_jobs")
+    op.drop_index("ix_export_jobs_user_id", table_name="export_jobs")
+    op.drop_index("ix_export_jobs_organization_id", table_name="export_jobs")
+    op.drop_index("ix_export_jobs_id", table_name="export_jobs")
+    op.drop_table("export_jobs")
@@ -0,0 +1,137 @@
+"""organization analytics generation counter
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-10-18 19:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d6e7f8a9b0c1"
+down_revision: Union[str, None] = "c5d6e7f8a9b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_bump(p_organization_ids integer[])
+RETURNS void AS $$
+BEGIN
+    INSERT INTO analytics_generations AS g (organization_id, generation, updated_at)
+    SELECT DISTINCT t.organization_id, 1, now()
+    FROM unnest(p_organization_ids) AS t(organization_id)
+    WHERE t.organization_id IS NOT NULL
+    ORDER BY 1
+    ON CONFLICT (organization_id)
+    DO UPDATE SET generation = g.generation + 1, updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Тот же пересчёт дней, что и в c5d6e7f8a9b0, плюс новое поколение аналитики
+# организации — в том числе при отложенном пересчёте
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_rollups_touch(
+    p_organization_ids integer[], p_days date[]
+) RETURNS void AS $$
+DECLARE
+    touched record;
+BEGIN
+    PERFORM analytics_generation_bump(p_organization_ids);
+    IF coalesce(current_setting('analytics.rollups_deferred', true), '') = 'on' THEN
+        RETURN;
+    END IF;
+    FOR touched IN
+        SELECT DISTINCT t.organization_id, t.day
+        FROM unnest(p_organization_ids, p_days) AS t(organization_id, day)
+        WHERE t.organization_id IS NOT NULL AND t.day IS NOT NULL
+        ORDER BY 1, 2
+    LOOP
+        PERFORM pg_advisory_xact_lock(touched.organization_id, touched.day - DATE '2000-01-01');
+        PERFORM refresh_analytics_daily_rollups(touched.organization_id, touched.day, touched.day + 1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_rollups_touch(
+    p_organization_ids integer[], p_days date[]
+) RETURNS void AS $$
+DECLARE
+    touched record;
+BEGIN
+    IF coalesce(current_setting('analytics.rollups_deferred', true), '') = 'on' THEN
+        RETURN;
+    END IF;
+    FOR touched IN
+        SELECT DISTINCT t.organization_id, t.day
+        FROM unnest(p_organization_ids, p_days) AS t(organization_id, day)
+        WHERE t.organization_id IS NOT NULL AND t.day IS NOT NULL
+        ORDER BY 1, 2
+    LOOP
+        PERFORM pg_advisory_xact_lock(touched.organization_id, touched.day - DATE '2000-01-01');
+        PERFORM refresh_analytics_daily_rollups(touched.organization_id, touched.day, touched.day + 1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Переименование клиента меняет топ клиентов
+CLIENTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION analytics_generation_clients_updated() RETURNS trigger AS $$
+BEGIN
+    PERFORM analytics_generation_bump(array_agg(n.organization_id))
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    WHERE o.name IS DISTINCT FROM n.name;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analytics_generations",
+        sa.Column("organization_id", sa.Integer(), primary_key=True),
+        sa.Column("generation", sa.BigInteger(), nullable=False, server_default="1"),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute(BUMP_FUNCTION)
+    op.execute(TOUCH_FUNCTION)
+    op.execute(CLIENTS_FUNCTION)
+    op.execute(
+        """
+        CREATE TRIGGER trg_clients_analytics_generation
+        AFTER UPDATE ON clients
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION analytics_generation_clients_updated();
+        """
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS trg_clients_analytics_generation ON clients")
+        op.execute("DROP FUNCTION IF EXISTS analytics_generation_clients_updated()")
+        op.execute(PREVIOUS_TOUCH_FUNCTION)
+        op.execute("DROP FUNCTION IF EXISTS analytics_generation_bump(integer[])")
+
+    op.drop_table("analytics_generations")
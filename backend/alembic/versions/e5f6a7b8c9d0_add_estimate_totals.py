@@ -0,0 +1,69 @@
+"""add stored estimate totals
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-18 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f6a7b8c9d0"
+down_revision: Union[str, None] = "d4e5f6a7b8c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TOTAL_COLUMNS = ("total_internal", "total_external", "total_with_vat", "margin")
+
+
+def upgrade() -> None:
+    for column in TOTAL_COLUMNS:
+        op.add_column(
+            "estimates",
+            sa.Column(column, sa.Float(), nullable=False, server_default="0"),
+        )
+    op.add_column(
+        "estimates",
+        sa.Column("items_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    op.execute(
+        """
+        WITH item_totals AS (
+            SELECT
+                estimate_id,
+                COUNT(*) AS items_count,
+                SUM(COALESCE(quantity, 0) * COALESCE(internal_price, 0)) AS total_internal,
+                SUM(COALESCE(quantity, 0) * COALESCE(external_price, 0)) AS total_external
+            FROM estimate_items
+            WHERE estimate_id IS NOT NULL
+            GROUP BY estimate_id
+        )
+        UPDATE estimates AS e
+        SET
+            items_count = t.items_count,
+            total_internal = t.total_internal,
+            total_external = t.total_external,
+            margin = CASE
+                WHEN e.use_internal_price THEN t.total_external - t.total_internal
+                ELSE 0
+            END,
+            total_with_vat = t.total_external * CASE
+                WHEN e.vat_enabled THEN 1 + e.vat_rate / 100.0
+                ELSE 1
+            END
+        FROM item_totals AS t
+        WHERE e.id = t.estimate_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("estimates", "items_count")
+    for column in reversed(TOTAL_COLUMNS):
+        op.drop_column("estimates", column)
@@ -0,0 +1,65 @@
+"""indexes for analytics and estimate list filters
+
+Revision ID: e8f9a0b1c2d3
+Revises: d6e7f8a9b0c1
+Create Date: 2026-10-18 20:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8f9a0b1c2d3"
+down_revision: Union[str, None] = "d6e7f8a9b0c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, таблица, колонки/выражения, условие частичного индекса)
+INDEXES = (
+    ("ix_estimate_items_estimate_id", "estimate_items", ["estimate_id"], "estimate_id IS NOT NULL"),
+    ("ix_estimate_items_template_id", "estimate_items", ["template_id"], "template_id IS NOT NULL"),
+    (
+        "ix_estimate_items_lower_category_estimate_id",
+        "estimate_items",
+        [sa.text("lower(category)"), "estimate_id"],
+        "estimate_id IS NOT NULL",
+    ),
+    (
+        "ix_estimates_organization_id_status_date",
+        "estimates",
+        ["organization_id", "status", "date"],
+        None,
+    ),
+    (
+        "ix_estimates_organization_id_client_id_date",
+        "estimates",
+        ["organization_id", "client_id", "date"],
+        "client_id IS NOT NULL",
+    ),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    op.execute("ANALYZE estimates")
+    op.execute("ANALYZE estimate_items")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, *_ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
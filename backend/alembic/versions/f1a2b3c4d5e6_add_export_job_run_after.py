@@ -0,0 +1,29 @@
+"""delay retried export jobs
+
+Revision ID: f1a2b3c4d5e6
+Revises: e8f9a0b1c2d3
+Create Date: 2026-10-18 22:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a2b3c4d5e6"
+down_revision: Union[str, None] = "e8f9a0b1c2d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "export_jobs",
+        sa.Column("run_after", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("export_jobs", "run_after")
@@ -27,7 +27,9 @@ from app.schemas.user import (
     UserOut,
 )
 from app.services.audit_ledger import append_audit_ledger_entry, verify_audit_chain
+from app.services.estimate_totals import apply_estimate_totals
 from app.utils.auth import get_current_admin
+from app.utils.pdf import invalidate_estimate_pdfs
 
 router = APIRouter(tags=["admin"], dependencies=[Depends(get_current_admin)])
 
@@ -534,6 +536,7 @@ async def admin_create_user_estimate(
         user_id=user_id,
         organization_id=organization_id,
     )
+    apply_estimate_totals(estimate, estimate_in.items or [])
     db.add(estimate)
     await db.flush()
 
@@ -574,6 +577,7 @@ async def admin_update_user_estimate(
         item_payload = item.model_dump()
         item_payload.pop("id", None)
         db.add(EstimateItem(**item_payload, estimate_id=estimate.id))
+    apply_estimate_totals(estimate, estimate_in.items or [])
 
     if old_read_only != estimate.read_only:
         await append_audit_ledger_entry(
@@ -592,6 +596,7 @@ async def admin_update_user_estimate(
         )
 
     await db.commit()
+    invalidate_estimate_pdfs(estimate.id)
     return await _get_estimate_or_404(db, user_id, estimate.id)
 
 
@@ -619,6 +624,7 @@ async def admin_delete_user_estimate(
         request=request,
     )
     await db.commit()
+    invalidate_estimate_pdfs(estimate_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
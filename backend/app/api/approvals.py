@@ -38,12 +38,10 @@ router = APIRouter(tags=["approvals"], dependencies=[Depends(get_current_user)])
 
 
 def _calculate_totals(estimate: Estimate) -> tuple[float, float]:
-    total_external = float(
-        sum((item.external_price or 0) * (item.quantity or 0) for item in estimate.items or [])
+    return (
+        round(float(estimate.total_external or 0), 2),
+        round(float(estimate.total_with_vat or 0), 2),
     )
-    vat = total_external * (estimate.vat_rate / 100) if estimate.vat_enabled else 0
-    total_with_vat = total_external + vat
-    return round(total_external, 2), round(total_with_vat, 2)
 
 
 @router.get("/my", response_model=list[MyApprovalTaskOut])
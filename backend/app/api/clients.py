@@ -104,14 +104,6 @@ def prettify_value(val):
     return str(val)
 
 
-def _estimate_total_with_vat(estimate: Estimate) -> float:
-    total_external = sum(
-        (item.external_price or 0) * (item.quantity or 0) for item in estimate.items
-    )
-    vat = total_external * ((estimate.vat_rate or 0) / 100) if estimate.vat_enabled else 0
-    return float(total_external + vat)
-
-
 @router.post("/", response_model=ClientOut, status_code=status.HTTP_201_CREATED)
 async def create_client(
     client_in: ClientCreate,
@@ -217,7 +209,6 @@ async def get_clients_pipeline(
     client_ids = [client.id for client in clients]
     estimates_result = await db.execute(
         select(Estimate)
-        .options(selectinload(Estimate.items))
         .where(
             Estimate.organization_id == context.organization_id,
             Estimate.client_id.in_(client_ids),
@@ -250,7 +241,7 @@ async def get_clients_pipeline(
         paid_revenue = 0.0
         open_revenue = 0.0
         for estimate in client_estimates:
-            estimate_total = _estimate_total_with_vat(estimate)
+            estimate_total = float(estimate.total_with_vat or 0)
             if estimate.status == EstimateStatus.PAID:
                 paid_revenue += estimate_total
             elif estimate.status in {
@@ -1,5 +1,6 @@
 # backend/app/api/estimates.py
 # Implementation of the estimates API endpoints
+import asyncio
 import logging
 import re
 from typing import List, Optional
@@ -8,14 +9,16 @@ from urllib.parse import quote
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
-from sqlalchemy import delete, func
+from sqlalchemy import and_, case, delete, func, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
 from app.models.changelog import EstimateChangeLog
 from app.models.client_changelog import ClientChangeLog
+from app.models.autosave_draft import EstimateAutosaveDraft
 from app.models.estimate import Estimate, EstimateStatus
 from app.models.estimate_approval import EstimateApprovalStep, EstimateApprovalWorkflow
 from app.models.estimate_favorite import EstimateFavorite
@@ -28,19 +31,24 @@ from app.schemas.approval import ApprovalWorkflowOut, ApprovalWorkflowUpsertIn
 from app.schemas.changelog import ChangeLogOut
 from app.schemas.estimate import (
     EstimateAutosave,
+    EstimateBulkExportIn,
     EstimateCreate,
     EstimateProfitGuardCheckIn,
     EstimateProfitGuardCheckOut,
     EstimateOut,
     EstimateReadOnlyUpdate,
+    EstimateSelectionIn,
     EstimateSendEmail,
+    EstimateSummaryOut,
     EstimateUpdate,
     ProfitGuardRisk,
 )
 from app.utils.auth import get_current_user
 from app.utils.email import EmailAttachment, send_email
-from app.utils.excel import generate_excel
-from app.utils.pdf import render_pdf
+from app.utils.excel import EstimatesWorkbookWriter, generate_excel
+from app.utils.pdf import PdfRenderQueueFull, invalidate_estimate_pdfs, render_pdf_async
+from app.utils.pagination import decode_cursor, next_cursor_for
+from app.utils.zip_stream import stream_zip
 from app.utils.workspace import (
     WORKSPACE_PERMISSION_APPROVAL_MANAGE,
     WORKSPACE_PERMISSION_DATA_EDIT,
@@ -55,7 +63,26 @@ from app.services.approval_workflow import (
     to_workflow_out,
 )
 from app.services.audit_ledger import append_audit_ledger_entry
-from app.schemas.paginated import Paginated
+from app.services.autosave_buffer import (
+    apply_autosave_patch,
+    autosave_coalescer,
+    autosave_flush_due,
+    discard_estimate_autosave,
+    flush_estimate_autosave,
+    flush_organization_autosaves,
+    stage_autosave_patch,
+)
+from app.services.estimate_totals import apply_estimate_totals
+from app.services.export_documents import (
+    build_estimate_act_document,
+    build_estimate_excel_document,
+    build_estimate_invoice_document,
+    build_estimate_pdf_document,
+    calculate_estimate_totals,
+    load_estimate_with_relations,
+)
+from app.services.version_store import build_estimate_version, latest_keyframe_join
+from app.schemas.paginated import CursorPaginated, Paginated
 
 from datetime import datetime
 from datetime import timezone
@@ -273,17 +300,21 @@ def ensure_estimate_not_read_only(estimate: Estimate):
         )
 
 
+def ensure_workflow_not_in_review(workflow_status: Optional[str]):
+    if workflow_status == WORKFLOW_STATUS_IN_REVIEW:
+        raise HTTPException(
+            status_code=409,
+            detail="Смета находится в процессе согласования и недоступна для редактирования",
+        )
+
+
 async def ensure_estimate_not_in_active_approval(db: AsyncSession, estimate_id: int):
     workflow_status = await db.scalar(
         select(EstimateApprovalWorkflow.status).where(
             EstimateApprovalWorkflow.estimate_id == estimate_id
         )
     )
-    if workflow_status == WORKFLOW_STATUS_IN_REVIEW:
-        raise HTTPException(
-            status_code=409,
-            detail="Смета находится в процессе согласования и недоступна для редактирования",
-        )
+    ensure_workflow_not_in_review(workflow_status)
 
 
 @router.post("/profit-guard/check", response_model=EstimateProfitGuardCheckOut)
@@ -302,67 +333,6 @@ async def check_profit_guard(
     )
 
 
-def ensure_financial_documents_allowed(estimate: Estimate):
-    allowed_statuses = {EstimateStatus.APPROVED, EstimateStatus.PAID}
-    if estimate.status not in allowed_statuses:
-        raise HTTPException(
-            status_code=409,
-            detail="Счет и акт доступны только для согласованных или оплаченных смет",
-        )
-
-
-def build_financial_document_number(
-    prefix: str,
-    estimate_id: int,
-    issued_at: datetime,
-) -> str:
-    return f"{prefix}-{issued_at.strftime('%Y%m%d')}-{estimate_id:06d}"
-
-
-def calculate_estimate_totals(estimate: Estimate) -> dict[str, float]:
-    total_internal = (
-        sum(
-            (item.internal_price or 0) * (item.quantity or 0) for item in estimate.items
-        )
-        if estimate.use_internal_price
-        else 0
-    )
-    total_external = sum(
-        (item.external_price or 0) * (item.quantity or 0) for item in estimate.items
-    )
-    total_diff = total_external - total_internal if estimate.use_internal_price else 0
-    vat = total_external * (estimate.vat_rate / 100) if estimate.vat_enabled else 0
-    total_with_vat = total_external + vat
-    return {
-        "total_internal": total_internal,
-        "total_external": total_external,
-        "total_diff": total_diff,
-        "vat": vat,
-        "total_with_vat": total_with_vat,
-    }
-
-
-async def load_estimate_with_relations(
-    db: AsyncSession,
-    estimate_id: int,
-    organization_id: int,
-) -> Estimate:
-    result = await db.execute(
-        select(Estimate)
-        .options(
-            selectinload(Estimate.items),
-            selectinload(Estimate.client),
-            selectinload(Estimate.notes),
-            selectinload(Estimate.user),
-        )
-        .where(Estimate.id == estimate_id)
-    )
-    estimate = result.scalar_one_or_none()
-    if not estimate or estimate.organization_id != organization_id:
-        raise HTTPException(status_code=404, detail="Смета не найдена или нет доступа")
-    return estimate
-
-
 async def load_workspace_estimate(
     db: AsyncSession,
     estimate_id: int,
@@ -437,6 +407,7 @@ async def create_estimate(
         user_id=user.id,
         organization_id=context.organization_id,
     )
+    apply_estimate_totals(new_estimate, items_data)
     db.add(new_estimate)
     await db.flush()
 
@@ -472,6 +443,102 @@ async def create_estimate(
     return result.scalar_one()
 
 
+ESTIMATE_ITEM_FIELDS = (
+    "name",
+    "description",
+    "quantity",
+    "unit",
+    "internal_price",
+    "external_price",
+    "category",
+)
+
+
+def estimate_update_load_query(estimate_id: int):
+    workflow_status = (
+        select(EstimateApprovalWorkflow.status)
+        .where(EstimateApprovalWorkflow.estimate_id == Estimate.id)
+        .scalar_subquery()
+    )
+    next_version = (
+        select(func.coalesce(func.max(EstimateVersion.version), 0) + 1)
+        .where(EstimateVersion.estimate_id == Estimate.id)
+        .scalar_subquery()
+    )
+    autosave_pending = (
+        select(EstimateAutosaveDraft.estimate_id)
+        .where(EstimateAutosaveDraft.estimate_id == Estimate.id)
+        .exists()
+    )
+    # Последний keyframe нужен, чтобы сохранить старое состояние разницей с ним
+    keyframe, keyframe_on = latest_keyframe_join(Estimate.id)
+    return (
+        select(
+            Estimate,
+            workflow_status.label("workflow_status"),
+            next_version.label("next_version"),
+            autosave_pending.label("autosave_pending"),
+            keyframe,
+        )
+        .outerjoin(keyframe, keyframe_on)
+        .options(selectinload(Estimate.items), joinedload(Estimate.client))
+        .where(Estimate.id == estimate_id)
+    )
+
+
+async def persist_estimate_items_diff(
+    db: AsyncSession,
+    estimate_id: int,
+    old_items: dict[int, EstimateItem],
+    new_items: list,
+) -> list[dict]:
+    """
+    Write only the difference between the stored items and the payload:
+    one executemany UPDATE for changed rows, one INSERT for new rows and one
+    DELETE for removed rows. Unchanged rows are not touched at all.
+    Payload ids that do not belong to this estimate are inserted as new rows.
+
+    Returns the resulting items in payload order, new ones with their ids.
+    """
+    saved_items = []
+    to_update = []
+    to_insert = []
+    kept_ids = set()
+    for item in new_items:
+        values = {field: getattr(item, field) for field in ESTIMATE_ITEM_FIELDS}
+        item_id = getattr(item, "id", None)
+        old_item = old_items.get(item_id) if item_id is not None else None
+        if old_item is None or item_id in kept_ids:
+            to_insert.append({**values, "estimate_id": estimate_id})
+            saved_items.append(values)
+            continue
+        kept_ids.add(item_id)
+        saved_items.append({"id": item_id, **values})
+        if any(getattr(old_item, field) != value for field, value in values.items()):
+            to_update.append({"id": item_id, **values})
+
+    removed_ids = [item_id for item_id in old_items if item_id not in kept_ids]
+    if removed_ids:
+        await db.execute(
+            delete(EstimateItem).where(
+                EstimateItem.estimate_id == estimate_id,
+                EstimateItem.id.in_(removed_ids),
+            )
+        )
+    if to_update:
+        await db.execute(update(EstimateItem), to_update)
+    if to_insert:
+        result = await db.execute(
+            insert(EstimateItem).returning(EstimateItem.id, sort_by_parameter_order=True),
+            to_insert,
+        )
+        new_ids = iter(result.scalars().all())
+        for values in saved_items:
+            if "id" not in values:
+                values["id"] = next(new_ids)
+    return saved_items
+
+
 @router.put("/{estimate_id}", response_model=EstimateOut)
 async def update_estimate(
     estimate_id: int,
@@ -482,50 +549,40 @@ async def update_estimate(
     ),
 ):
     user = context.user
-    result = await db.execute(select(Estimate).where(Estimate.id == estimate_id))
-    estimate = result.scalar_one_or_none()
-
-    result = await db.execute(
-        select(Estimate)
-        .options(selectinload(Estimate.items), selectinload(Estimate.client))
-        .where(Estimate.id == estimate_id)
-    )
-
-    old_estimate = result.scalar_one_or_none()
-
-    if not estimate:
+    # Смета, позиции, клиент, статус согласования и номер следующей версии —
+    # одним запросом (плюс selectin для позиций)
+    result = await db.execute(estimate_update_load_query(estimate_id))
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Смета не найдена")
+    estimate, workflow_status, next_ver, autosave_pending, base_keyframe = row
 
     if estimate.organization_id != context.organization_id:
         raise HTTPException(status_code=403, detail="Нет доступа к этой смете")
 
     ensure_estimate_not_read_only(estimate)
-    await ensure_estimate_not_in_active_approval(db, estimate.id)
-    await ensure_client_in_workspace(
+    ensure_workflow_not_in_review(workflow_status)
+    old_client = estimate.client
+    # Текущий клиент уже в identity map, запрос уходит только при смене клиента
+    new_client = await ensure_client_in_workspace(
         db,
         updated_data.client_id,
         context.organization_id,
     )
+    client_names = {
+        client.id: client.name for client in (old_client, new_client) if client is not None
+    }
 
-    old_out = EstimateOut.from_orm(old_estimate)
+    old_out = EstimateOut.from_orm(estimate)
     old_payload = jsonable_encoder(old_out)
 
-    max_ver = (
-        await db.scalar(
-            select(func.max(EstimateVersion.version)).where(
-                EstimateVersion.estimate_id == estimate_id
-            )
-        )
-        or 0
-    )
-    next_ver = max_ver + 1
-
     db.add(
-        EstimateVersion(
-            estimate_id=estimate_id,
-            version=next_ver,
-            user_id=user.id,
-            payload=old_payload,
+        build_estimate_version(
+            estimate_id,
+            next_ver,
+            user.id,
+            old_payload,
+            base_keyframe,
         )
     )
 
@@ -579,8 +636,7 @@ async def update_estimate(
                 # Добавили значение
                 pretty_value = value
                 if field == "client_id":
-                    new_client = await db.get(Client, value) if value else None
-                    pretty_value = new_client.name if new_client else value
+                    pretty_value = client_names.get(value, value)
                 details.append(
                     {"label": actions["add"], "new": prettify_value(pretty_value)}
                 )
@@ -588,8 +644,7 @@ async def update_estimate(
                 # Удалили значение
                 pretty_value = old_val
                 if field == "client_id":
-                    old_client = await db.get(Client, old_val) if old_val else None
-                    pretty_value = old_client.name if old_client else old_val
+                    pretty_value = client_names.get(old_val, old_val)
                 details.append(
                     {"label": actions["del"], "old": prettify_value(pretty_value)}
                 )
@@ -598,10 +653,8 @@ async def update_estimate(
                 pretty_old = old_val
                 pretty_new = value
                 if field == "client_id":
-                    old_client = await db.get(Client, old_val) if old_val else None
-                    new_client = await db.get(Client, value) if value else None
-                    pretty_old = old_client.name if old_client else old_val
-                    pretty_new = new_client.name if new_client else value
+                    pretty_old = client_names.get(old_val, old_val)
+                    pretty_new = client_names.get(value, value)
                 details.append(
                     {
                         "label": actions["edit"],
@@ -612,7 +665,7 @@ async def update_estimate(
 
         setattr(estimate, field, value)
 
-    old_items = {item.id: item for item in old_estimate.items if item.id is not None}
+    old_items = {item.id: item for item in estimate.items if item.id is not None}
     new_items = {
         item.id: item
         for item in updated_data.items
@@ -673,14 +726,12 @@ async def update_estimate(
                         }
                     )
 
-    # Обновление услуг в БД
-    await db.execute(
-        delete(EstimateItem).where(EstimateItem.estimate_id == estimate_id)
-    )
-    for item in updated_data.items:
-        db.add(EstimateItem(**item.dict(), estimate_id=estimate_id))
-
     now = datetime.now(timezone.utc)
+    apply_estimate_totals(estimate, updated_data.items)
+    estimate.client = new_client
+    # Явное значение вместо onupdate=func.now(): иначе после flush поле
+    # истекает и для ответа понадобился бы ещё один SELECT
+    estimate.updated_at = now
 
     db.add(
         EstimateChangeLog(
@@ -705,14 +756,31 @@ async def update_estimate(
             )
         )
 
+    # Обновление услуг в БД: только изменённые строки, id сохраняются.
+    # Первый же запрос сбрасывает в БД версию, смету и записи журнала.
+    saved_items = await persist_estimate_items_diff(
+        db, estimate_id, old_items, updated_data.items
+    )
+    if autosave_pending:
+        # Явное сохранение содержит всё, что копилось в черновике автосохранения
+        await discard_estimate_autosave(db, estimate_id)
+
     await db.commit()
+    invalidate_estimate_pdfs(estimate_id)
 
-    result = await db.execute(
-        select(Estimate)
-        .options(selectinload(Estimate.items), selectinload(Estimate.client))
-        .where(Estimate.id == estimate_id)
+    # Ответ собирается из памяти: позиции менялись bulk-запросами в обход
+    # identity map, а остальные поля уже актуальны
+    return EstimateOut.model_validate(
+        {
+            **{
+                field: getattr(estimate, field)
+                for field in EstimateOut.model_fields
+                if field not in {"items", "is_favorite"}
+            },
+            "items": saved_items,
+        },
+        from_attributes=True,
     )
-    return result.scalar_one()
 
 
 @router.patch("/{estimate_id}/autosave")
@@ -742,40 +810,25 @@ async def autosave_estimate(
             data["client_id"],
             context.organization_id,
         )
-        estimate.client_id = data["client_id"]
-
-    for field in (
-        "name",
-        "responsible",
-        "event_datetime",
-        "event_place",
-        "status",
-        "vat_enabled",
-        "vat_rate",
-        "use_internal_price",
-    ):
-        if field in data:
-            setattr(estimate, field, data[field])
 
-    if "items" in data:
-        await db.execute(delete(EstimateItem).where(EstimateItem.estimate_id == estimate_id))
-        for item in data["items"] or []:
-            item_data = item if isinstance(item, dict) else item.dict()
-            db.add(
-                EstimateItem(
-                    estimate_id=estimate_id,
-                    name=item_data.get("name", ""),
-                    description=item_data.get("description", ""),
-                    quantity=item_data.get("quantity", 0),
-                    unit=item_data.get("unit", "шт"),
-                    internal_price=item_data.get("internal_price", 0),
-                    external_price=item_data.get("external_price", 0),
-                    category=item_data.get("category", ""),
-                )
-            )
+    if settings.AUTOSAVE_COALESCE_ENABLED:
+        # Правка копится в черновике; в смету она попадает при достижении
+        # порога, при чтении/выгрузке или фоновой зачисткой
+        writes, first_write_at = await stage_autosave_patch(db, estimate, user.id, payload)
+        if autosave_flush_due(writes, first_write_at):
+            await flush_estimate_autosave(db, estimate_id, reason="threshold")
+            await db.commit()
+            await db.refresh(estimate)
+        else:
+            await db.commit()
+        autosave_coalescer.record_write(staged=True)
+        return {"detail": "Черновик сохранен", "updated_at": estimate.updated_at}
 
+    await apply_autosave_patch(db, estimate, data)
     await db.commit()
+    invalidate_estimate_pdfs(estimate_id)
     await db.refresh(estimate)
+    autosave_coalescer.record_write(staged=False)
 
     return {"detail": "Черновик сохранен", "updated_at": estimate.updated_at}
 
@@ -799,6 +852,8 @@ async def set_estimate_read_only(
         raise HTTPException(status_code=403, detail="Нет доступа к этой смете")
 
     await ensure_estimate_not_in_active_approval(db, estimate.id)
+    # Замороженная смета должна содержать последние правки редактора
+    flushed = await flush_estimate_autosave(db, estimate.id, reason="read")
     if estimate.read_only != payload.read_only:
         estimate.read_only = payload.read_only
         details = [
@@ -843,11 +898,14 @@ async def set_estimate_read_only(
             request=request,
         )
         await db.commit()
+    elif flushed:
+        await db.commit()
 
     result = await db.execute(
         select(Estimate)
         .options(selectinload(Estimate.items), selectinload(Estimate.client))
         .where(Estimate.id == estimate_id)
+        .execution_options(populate_existing=True)
     )
     return result.scalar_one()
 
@@ -887,6 +945,7 @@ async def delete_estimate(
     )
     await db.delete(estimate)
     await db.commit()
+    invalidate_estimate_pdfs(estimate_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -941,6 +1000,38 @@ async def remove_favorite(
     return Response(status_code=204)
 
 
+def append_estimate_list_filters(
+    filters: list,
+    *,
+    name: Optional[str] = None,
+    client: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None,
+) -> list:
+    if name:
+        filters.append(Estimate.name.ilike(f"%{name}%"))
+    if client:
+        filters.append(Estimate.client_id == client)
+    if date_from:
+        try:
+            dt_from = datetime.fromisoformat(date_from)
+            filters.append(Estimate.date >= dt_from)
+        except ValueError:
+            pass
+
+    if date_to:
+        try:
+            dt_to = datetime.fromisoformat(date_to)
+            filters.append(Estimate.date < dt_to)
+        except ValueError:
+            pass
+
+    if status:
+        filters.append(Estimate.status == status)
+    return filters
+
+
 async def list_estimates(
     name: str = Query(None),
     client: Optional[int] = Query(None),  # Change type to Optional[int]
@@ -953,7 +1044,12 @@ async def list_estimates(
     context: WorkspaceContext | None = None,
     user=None,
     favorite: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None),
+    with_total: Optional[bool] = Query(None),
 ):
+    # Без cursor — прежняя пагинация page/limit с total. С cursor (next_cursor
+    # предыдущей страницы) выборка идёт по id < last_id без OFFSET, а COUNT(*)
+    # выполняется только при with_total.
     if db is None:
         raise HTTPException(status_code=500, detail="Database session is required")
 
@@ -982,27 +1078,19 @@ async def list_estimates(
         status = None
     if not isinstance(favorite, bool):
         favorite = None
+    if not isinstance(cursor, str):
+        cursor = None
+    if not isinstance(with_total, bool):
+        with_total = None
 
-    if name:
-        filters.append(Estimate.name.ilike(f"%{name}%"))
-    if client:
-        filters.append(Estimate.client_id == client)
-    if date_from:
-        try:
-            dt_from = datetime.fromisoformat(date_from)
-            filters.append(Estimate.date >= dt_from)
-        except ValueError:
-            pass
-
-    if date_to:
-        try:
-            dt_to = datetime.fromisoformat(date_to)
-            filters.append(Estimate.date < dt_to)
-        except ValueError:
-            pass
-
-    if status:
-        filters.append(Estimate.status == status)
+    append_estimate_list_filters(
+        filters,
+        name=name,
+        client=client,
+        date_from=date_from,
+        date_to=date_to,
+        status=status,
+    )
 
     query = (
         select(Estimate)
@@ -1016,13 +1104,19 @@ async def list_estimates(
             EstimateFavorite.user_id == user_obj.id
         )
 
-    total = await db.scalar(count_query)
+    if cursor is not None:
+        query = query.where(Estimate.id < decode_cursor(cursor))
+    else:
+        query = query.offset((page - 1) * limit)
 
-    result = await db.execute(
-        query.order_by(Estimate.id.desc()).offset((page - 1) * limit).limit(limit)
-    )
+    # Лишняя строка показывает, есть ли следующая страница, без COUNT(*)
+    result = await db.execute(query.order_by(Estimate.id.desc()).limit(limit + 1))
+    estimates = list(result.scalars().all())
+    next_cursor = next_cursor_for(estimates, limit)
 
-    estimates = result.scalars().all()
+    total = None
+    if cursor is None or with_total:
+        total = await db.scalar(count_query)
 
     # Получаем id всех избранных смет для текущего пользователя
     fav_result = await db.execute(
@@ -1033,10 +1127,10 @@ async def list_estimates(
     for estimate in estimates:
         estimate.is_favorite = estimate.id in favorite_ids
 
-    return {"items": estimates, "total": total}
+    return {"items": estimates, "total": total, "next_cursor": next_cursor}
 
 
-@router.get("/", response_model=Paginated[EstimateOut])
+@router.get("/", response_model=CursorPaginated[EstimateOut])
 async def list_estimates_endpoint(
     name: str = Query(None),
     client: Optional[int] = Query(None),
@@ -1050,7 +1144,11 @@ async def list_estimates_endpoint(
         require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
     ),
     favorite: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None),
+    with_total: bool = Query(False),
 ):
+    if await flush_organization_autosaves(db, context.organization_id):
+        await db.commit()
     return await list_estimates(
         name=name,
         client=client,
@@ -1062,9 +1160,111 @@ async def list_estimates_endpoint(
         db=db,
         context=context,
         favorite=favorite,
+        cursor=cursor,
+        with_total=with_total,
+    )
+
+
+def estimate_summary_query(user_id: int):
+    """
+    Estimate rows with the stored totals: the client name and the favorite
+    flag come from joins, estimate_items is never read.
+    """
+    return (
+        select(
+            Estimate.id,
+            Estimate.name,
+            Estimate.date,
+            Estimate.updated_at,
+            Estimate.status,
+            Estimate.responsible,
+            Estimate.event_datetime,
+            Estimate.client_id,
+            Client.name.label("client_name"),
+            Estimate.vat_enabled,
+            Estimate.vat_rate,
+            Estimate.use_internal_price,
+            Estimate.read_only,
+            Estimate.user_id,
+            EstimateFavorite.id.is_not(None).label("is_favorite"),
+            Estimate.items_count,
+            Estimate.total_internal,
+            Estimate.total_external,
+            case((Estimate.use_internal_price, Estimate.margin), else_=None).label("margin"),
+            (Estimate.total_with_vat - Estimate.total_external).label("vat_amount"),
+            Estimate.total_with_vat,
+        )
+        .select_from(Estimate)
+        .outerjoin(Client, Client.id == Estimate.client_id)
+        .outerjoin(
+            EstimateFavorite,
+            and_(
+                EstimateFavorite.estimate_id == Estimate.id,
+                EstimateFavorite.user_id == user_id,
+            ),
+        )
     )
 
 
+@router.get("/summary", response_model=CursorPaginated[EstimateSummaryOut])
+async def list_estimate_summaries(
+    name: Optional[str] = Query(None),
+    client: Optional[int] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    favorite: Optional[bool] = Query(None),
+    page: int = Query(1, ge=1),
+    limit: int = Query(5, ge=1),
+    cursor: Optional[str] = Query(None),
+    with_total: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    # Лёгкая проекция списка смет: без позиций, с итогами из SQL.
+    # Пагинация такая же, как у GET /api/estimates/.
+    if await flush_organization_autosaves(db, context.organization_id):
+        await db.commit()
+    filters = [Estimate.organization_id == context.organization_id]
+    append_estimate_list_filters(
+        filters,
+        name=name,
+        client=client,
+        date_from=date_from,
+        date_to=date_to,
+        status=status,
+    )
+
+    query = estimate_summary_query(context.user.id).where(*filters)
+    count_query = select(func.count()).select_from(Estimate).where(*filters)
+    if favorite:
+        query = query.where(EstimateFavorite.id.is_not(None))
+        count_query = count_query.join(EstimateFavorite).where(
+            EstimateFavorite.user_id == context.user.id
+        )
+
+    if cursor is not None:
+        query = query.where(Estimate.id < decode_cursor(cursor))
+    else:
+        query = query.offset((page - 1) * limit)
+
+    result = await db.execute(query.order_by(Estimate.id.desc()).limit(limit + 1))
+    rows = list(result.all())
+    next_cursor = next_cursor_for(rows, limit)
+
+    total = None
+    if cursor is None or with_total:
+        total = await db.scalar(count_query)
+
+    return {
+        "items": [dict(row._mapping) for row in rows],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+
+
 @router.get("/{estimate_id}", response_model=EstimateOut)
 async def get_estimate(
     estimate_id: int,
@@ -1074,11 +1274,12 @@ async def get_estimate(
     ),
 ):
     user = context.user
-    result = await db.execute(
+    query = (
         select(Estimate)
         .options(selectinload(Estimate.items), selectinload(Estimate.client))
         .where(Estimate.id == estimate_id)
     )
+    result = await db.execute(query)
     estimate = result.scalar_one_or_none()
     if not estimate:
         raise HTTPException(status_code=404, detail="Смета не найдена")
@@ -1086,6 +1287,11 @@ async def get_estimate(
     if estimate.organization_id != context.organization_id:
         raise HTTPException(status_code=403, detail="Нет доступа к этой смете")
 
+    if await flush_estimate_autosave(db, estimate_id, reason="read"):
+        await db.commit()
+        result = await db.execute(query.execution_options(populate_existing=True))
+        estimate = result.scalar_one()
+
     fav = await db.execute(
         select(EstimateFavorite).where(
             EstimateFavorite.user_id == user.id,
@@ -1274,6 +1480,10 @@ async def start_estimate_approval_workflow(
 ):
     user = context.user
     estimate = await load_workspace_estimate(db, estimate_id, context.organization_id)
+    # Отложенное автосохранение попадает в смету до запуска: согласуется
+    # актуальное содержимое, а после запуска буфер черновик уже не применит
+    if await flush_estimate_autosave(db, estimate_id, reason="approval"):
+        await db.commit()
     ensure_estimate_not_read_only(estimate)
 
     workflow = await load_estimate_approval_workflow(db, estimate_id)
@@ -1362,36 +1572,25 @@ async def export_estimate_pdf(
     ),
 ):
     user = context.user
-    estimate = await load_estimate_with_relations(
+    pdf_bytes, filename, details = await build_estimate_pdf_document(
         db,
         estimate_id,
         context.organization_id,
     )
-    totals = calculate_estimate_totals(estimate)
-
-    pdf_bytes = render_pdf(
-        "estimate_pdf.html",
-        {
-            "estimate": estimate,
-            **totals,
-        },
-    )
     await append_audit_ledger_entry(
         db,
         actor_user_id=user.id,
         action="estimate.export.pdf",
         entity_type="estimate",
-        entity_id=str(estimate.id),
-        details={"estimate_name": estimate.name},
+        entity_id=str(estimate_id),
+        details=details,
         request=request,
     )
     await db.commit()
     return StreamingResponse(
         iter([pdf_bytes]),
         media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=estimate_{estimate.id}.pdf"
-        },
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
@@ -1405,44 +1604,25 @@ async def export_estimate_invoice_pdf(
     ),
 ):
     user = context.user
-    estimate = await load_estimate_with_relations(
+    pdf_bytes, filename, details = await build_estimate_invoice_document(
         db,
         estimate_id,
         context.organization_id,
     )
-    ensure_financial_documents_allowed(estimate)
-    totals = calculate_estimate_totals(estimate)
-    issued_at = datetime.now(timezone.utc)
-    invoice_number = build_financial_document_number("INV", estimate.id, issued_at)
-
-    pdf_bytes = render_pdf(
-        "invoice_pdf.html",
-        {
-            "estimate": estimate,
-            "invoice_number": invoice_number,
-            "issue_date": issued_at,
-            **totals,
-        },
-    )
     await append_audit_ledger_entry(
         db,
         actor_user_id=user.id,
         action="estimate.export.invoice_pdf",
         entity_type="estimate",
-        entity_id=str(estimate.id),
-        details={
-            "estimate_name": estimate.name,
-            "invoice_number": invoice_number,
-        },
+        entity_id=str(estimate_id),
+        details=details,
         request=request,
     )
     await db.commit()
     return StreamingResponse(
         iter([pdf_bytes]),
         media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=invoice_{estimate.id}.pdf"
-        },
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
@@ -1456,42 +1636,25 @@ async def export_estimate_act_pdf(
     ),
 ):
     user = context.user
-    estimate = await load_estimate_with_relations(
+    pdf_bytes, filename, details = await build_estimate_act_document(
         db,
         estimate_id,
         context.organization_id,
     )
-    ensure_financial_documents_allowed(estimate)
-    totals = calculate_estimate_totals(estimate)
-    issued_at = datetime.now(timezone.utc)
-    act_number = build_financial_document_number("ACT", estimate.id, issued_at)
-
-    pdf_bytes = render_pdf(
-        "act_pdf.html",
-        {
-            "estimate": estimate,
-            "act_number": act_number,
-            "issue_date": issued_at,
-            **totals,
-        },
-    )
     await append_audit_ledger_entry(
         db,
         actor_user_id=user.id,
         action="estimate.export.act_pdf",
         entity_type="estimate",
-        entity_id=str(estimate.id),
-        details={
-            "estimate_name": estimate.name,
-            "act_number": act_number,
-        },
+        entity_id=str(estimate_id),
+        details=details,
         request=request,
     )
     await db.commit()
     return StreamingResponse(
         iter([pdf_bytes]),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=act_{estimate.id}.pdf"},
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
@@ -1522,12 +1685,13 @@ async def send_estimate_email(
     if payload.attach_pdf:
         totals = calculate_estimate_totals(estimate)
 
-        pdf_bytes = render_pdf(
+        pdf_bytes = await render_pdf_async(
             "estimate_pdf.html",
             {
                 "estimate": estimate,
                 **totals,
             },
+            estimate_id=estimate.id,
         )
         attachments.append(
             {
@@ -1538,11 +1702,12 @@ async def send_estimate_email(
         )
 
     if payload.attach_excel:
-        excel_file = generate_excel(estimate)
+        with await asyncio.to_thread(generate_excel, estimate) as excel_file:
+            excel_bytes = excel_file.read()
         attachments.append(
             {
                 "filename": f"estimate_{estimate.id}.xlsx",
-                "content": excel_file.getvalue(),
+                "content": excel_bytes,
                 "content_type": (
                     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 ),
@@ -1602,39 +1767,249 @@ async def export_estimate_excel(
     ),
 ):
     user = context.user
-    result = await db.execute(
-        select(Estimate)
-        .options(
-            selectinload(Estimate.items),
-            selectinload(Estimate.client),
-            selectinload(Estimate.notes),
-        )
-        .where(Estimate.id == estimate_id)
+    excel_bytes, filename, details = await build_estimate_excel_document(
+        db,
+        estimate_id,
+        context.organization_id,
     )
-    estimate = result.scalar_one_or_none()
-
-    if not estimate or estimate.organization_id != context.organization_id:
-        raise HTTPException(status_code=404, detail="Смета не найдена или нет доступа")
-
-    filename = f"{estimate.name}.xlsx"
     ascii_filename = re.sub(r"[^\x00-\x7F]+", "_", filename)
     utf8_filename = quote(filename)
 
-    excel_file = generate_excel(estimate)
     await append_audit_ledger_entry(
         db,
         actor_user_id=user.id,
         action="estimate.export.excel",
         entity_type="estimate",
-        entity_id=str(estimate.id),
-        details={"estimate_name": estimate.name, "filename": filename},
+        entity_id=str(estimate_id),
+        details=details,
         request=request,
     )
     await db.commit()
     return StreamingResponse(
-        excel_file,
+        iter([excel_bytes]),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={
             "Content-Disposition": f"attachment; filename={ascii_filename}; filename*=UTF-8''{utf8_filename}"
         },
     )
+
+
+BULK_EXPORT_RENDER_ATTEMPTS = 3
+
+
+async def render_bulk_export_entry(estimate: Estimate, export_format: str) -> tuple[str, bytes]:
+    if export_format == "excel":
+        with await asyncio.to_thread(generate_excel, estimate) as excel_file:
+            return f"estimate_{estimate.id}.xlsx", excel_file.read()
+
+    for attempt in range(1, BULK_EXPORT_RENDER_ATTEMPTS + 1):
+        try:
+            pdf_bytes = await render_pdf_async(
+                "estimate_pdf.html",
+                {
+                    "estimate": estimate,
+                    **calculate_estimate_totals(estimate),
+                },
+                estimate_id=estimate.id,
+            )
+            return f"estimate_{estimate.id}.pdf", pdf_bytes
+        except PdfRenderQueueFull:
+            # Пул рендера занят другими запросами — ждём, а не обрываем архив
+            if attempt == BULK_EXPORT_RENDER_ATTEMPTS:
+                raise
+            await asyncio.sleep(attempt)
+
+
+async def load_bulk_export_batches(
+    estimate_ids: list[int],
+    organization_id: int,
+    batch_size: int,
+):
+    # Сессия запроса закрывается до окончания стриминга, поэтому
+    # генератор архива читает сметы через собственные сессии — по одной на
+    # пачку: пока пачка рендерится, соединение уже возвращено в пул и не
+    # висит в idle in transaction на всё время скачивания архива.
+    for start in range(0, len(estimate_ids), batch_size):
+        batch_ids = estimate_ids[start : start + batch_size]
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(Estimate)
+                .options(
+                    selectinload(Estimate.items),
+                    selectinload(Estimate.client),
+                    selectinload(Estimate.notes),
+                    selectinload(Estimate.user),
+                )
+                .where(
+                    Estimate.id.in_(batch_ids),
+                    Estimate.organization_id == organization_id,
+                )
+            )
+            by_id = {estimate.id: estimate for estimate in result.scalars().all()}
+        estimates = [by_id[item_id] for item_id in batch_ids if item_id in by_id]
+        yield batch_ids, estimates
+
+
+async def iter_bulk_export_entries(batches, export_format: str, concurrency: int):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    errors: list[str] = []
+
+    async def _render(estimate: Estimate):
+        async with semaphore:
+            try:
+                return await render_bulk_export_entry(estimate, export_format)
+            except Exception as exc:
+                logger.warning(
+                    "Bulk export failed for estimate %s", estimate.id, exc_info=True
+                )
+                errors.append(f"Смета {estimate.id}: {exc or type(exc).__name__}")
+                return None
+
+    async for batch_ids, estimates in batches:
+        found_ids = {estimate.id for estimate in estimates}
+        errors.extend(
+            f"Смета {estimate_id}: не найдена"
+            for estimate_id in batch_ids
+            if estimate_id not in found_ids
+        )
+        tasks = [asyncio.create_task(_render(estimate)) for estimate in estimates]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                entry = await finished
+                if entry is not None:
+                    yield entry
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    if errors:
+        yield "errors.txt", "\n".join(errors).encode("utf-8")
+
+
+async def resolve_export_estimate_ids(
+    db: AsyncSession,
+    payload: EstimateSelectionIn,
+    context: WorkspaceContext,
+) -> list[int]:
+    # Пачки смет читаются в отдельных сессиях — применённые черновики
+    # должны быть уже закоммичены
+    if await flush_organization_autosaves(db, context.organization_id, reason="export"):
+        await db.commit()
+    filters = [Estimate.organization_id == context.organization_id]
+    if payload.ids:
+        filters.append(Estimate.id.in_(payload.ids))
+    else:
+        append_estimate_list_filters(
+            filters,
+            name=payload.name,
+            client=payload.client,
+            date_from=payload.date_from,
+            date_to=payload.date_to,
+            status=payload.status,
+        )
+
+    query = select(Estimate.id).where(*filters)
+    if payload.favorite and not payload.ids:
+        query = query.join(EstimateFavorite).where(EstimateFavorite.user_id == context.user.id)
+
+    max_items = max(1, settings.EXPORTS_BULK_MAX_ITEMS)
+    result = await db.execute(query.order_by(Estimate.id.desc()).limit(max_items + 1))
+    estimate_ids = list(result.scalars().all())
+    if not estimate_ids:
+        raise HTTPException(status_code=404, detail="Сметы для выгрузки не найдены")
+    if len(estimate_ids) > max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Слишком много смет для выгрузки: не более {max_items} за раз",
+        )
+    return estimate_ids
+
+
+@router.post("/export/bulk")
+async def export_estimates_bulk(
+    payload: EstimateBulkExportIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    user = context.user
+    estimate_ids = await resolve_export_estimate_ids(db, payload, context)
+
+    await append_audit_ledger_entry(
+        db,
+        actor_user_id=user.id,
+        action=f"estimate.export.bulk.{payload.format}",
+        entity_type="estimate",
+        entity_id=None,
+        details={"estimate_ids": estimate_ids, "count": len(estimate_ids)},
+        request=request,
+    )
+    await db.commit()
+
+    concurrency = max(1, settings.EXPORTS_BULK_CONCURRENCY)
+    entries = iter_bulk_export_entries(
+        load_bulk_export_batches(estimate_ids, context.organization_id, concurrency * 4),
+        payload.format,
+        concurrency,
+    )
+    filename = f"estimates_{payload.format}_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.zip"
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+EXCEL_WORKBOOK_BATCH_SIZE = 25
+
+
+def _iter_spooled_file(file_obj, chunk_size: int = 64 * 1024):
+    try:
+        while chunk := file_obj.read(chunk_size):
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+@router.post("/export/workbook")
+async def export_estimates_workbook(
+    payload: EstimateSelectionIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    user = context.user
+    estimate_ids = await resolve_export_estimate_ids(db, payload, context)
+
+    # Сметы читаются пачками и сразу пишутся в свой write-only лист,
+    # поэтому в памяти одновременно находится не больше одной пачки.
+    writer = EstimatesWorkbookWriter()
+    async for _batch_ids, estimates in load_bulk_export_batches(
+        estimate_ids,
+        context.organization_id,
+        EXCEL_WORKBOOK_BATCH_SIZE,
+    ):
+        await asyncio.to_thread(writer.add_estimates, estimates)
+    workbook_file = await asyncio.to_thread(writer.close)
+
+    await append_audit_ledger_entry(
+        db,
+        actor_user_id=user.id,
+        action="estimate.export.workbook",
+        entity_type="estimate",
+        entity_id=None,
+        details={"estimate_ids": estimate_ids, "count": len(estimate_ids)},
+        request=request,
+    )
+    await db.commit()
+
+    filename = f"estimates_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.xlsx"
+    return StreamingResponse(
+        _iter_spooled_file(workbook_file),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
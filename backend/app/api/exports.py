@@ -0,0 +1,115 @@
+# backend/app/api/exports.py
+# Asynchronous export jobs: enqueue, poll status, download the stored file
+
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.estimates import load_workspace_estimate
+from app.core.database import get_db
+from app.models.export_job import ExportJob, ExportJobStatus
+from app.schemas.export_job import (
+    ANALYTICS_EXPORT_JOB_KINDS,
+    AnalyticsExportParams,
+    ExportJobCreate,
+    ExportJobOut,
+)
+from app.services.export_documents import ensure_financial_documents_allowed
+from app.services.export_jobs import enqueue_export_job, to_export_job_out
+from app.utils.auth import get_current_user
+from app.utils.workspace import (
+    WORKSPACE_PERMISSION_DATA_VIEW,
+    WorkspaceContext,
+    require_workspace_permission,
+)
+
+router = APIRouter(tags=["exports"], dependencies=[Depends(get_current_user)])
+
+
+async def load_user_export_job(
+    db: AsyncSession,
+    job_id: int,
+    context: WorkspaceContext,
+) -> ExportJob:
+    job = await db.get(ExportJob, job_id)
+    if (
+        not job
+        or job.organization_id != context.organization_id
+        or job.user_id != context.user.id
+    ):
+        raise HTTPException(status_code=404, detail="Задача выгрузки не найдена")
+    return job
+
+
+@router.post("/", response_model=ExportJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    payload: ExportJobCreate,
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    if payload.kind in ANALYTICS_EXPORT_JOB_KINDS:
+        analytics_params = payload.analytics or AnalyticsExportParams()
+        params = analytics_params.model_dump(mode="json")
+    else:
+        # Проверяем доступ сразу, чтобы не ставить в очередь заведомо невыполнимую задачу
+        estimate = await load_workspace_estimate(db, payload.estimate_id, context.organization_id)
+        if payload.kind in ("invoice_pdf", "act_pdf"):
+            ensure_financial_documents_allowed(estimate)
+        params = {"estimate_id": estimate.id}
+
+    job = await enqueue_export_job(
+        db,
+        user_id=context.user.id,
+        organization_id=context.organization_id,
+        kind=payload.kind,
+        params=params,
+    )
+    return to_export_job_out(job)
+
+
+@router.get("/{job_id}", response_model=ExportJobOut)
+async def get_export_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    job = await load_user_export_job(db, job_id, context)
+    return to_export_job_out(job)
+
+
+@router.get("/{job_id}/download")
+async def download_export_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    job = await load_user_export_job(db, job_id, context)
+    if job.status == ExportJobStatus.EXPIRED:
+        raise HTTPException(status_code=410, detail="Срок хранения файла выгрузки истёк")
+    if job.status == ExportJobStatus.FAILED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Выгрузка завершилась с ошибкой: {job.error}",
+        )
+    if job.status != ExportJobStatus.SUCCEEDED:
+        raise HTTPException(
+            status_code=409,
+            detail="Выгрузка ещё не готова",
+            headers={"Retry-After": "2"},
+        )
+    if not job.file_path or not Path(job.file_path).is_file():
+        raise HTTPException(status_code=410, detail="Файл выгрузки недоступен")
+
+    return FileResponse(
+        job.file_path,
+        media_type=job.media_type or "application/octet-stream",
+        filename=job.file_name,
+    )
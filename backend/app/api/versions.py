@@ -1,8 +1,9 @@
 # backend/app/api/versions.py
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy import delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -13,11 +14,19 @@ from app.models.client_changelog import ClientChangeLog
 from app.models.client import Client
 from app.models.estimate import Estimate
 from app.models.item import EstimateItem
+from app.models.user import User
 from app.models.version import EstimateVersion
+from app.schemas.client import ClientOut
 from app.schemas.estimate import EstimateOut
-from app.schemas.version import VersionOut
+from app.schemas.item import EstimateItemOut
+from app.schemas.version import VersionDiffOut, VersionMetaOut, VersionOut
 from app.schemas.paginated import Paginated
+from app.services.autosave_buffer import discard_estimate_autosave, flush_estimate_autosave
+from app.services.estimate_totals import apply_estimate_totals
+from app.services.version_diff import compare_snapshots
+from app.services.version_store import delete_estimate_versions, load_version_payloads
 from app.utils.auth import get_current_user
+from app.utils.pdf import invalidate_estimate_pdfs
 from app.utils.workspace import (
     WORKSPACE_PERMISSION_DATA_EDIT,
     WORKSPACE_PERMISSION_DATA_VIEW,
@@ -47,16 +56,45 @@ def _parse_datetime(value):
     return value
 
 
-@router.get("/", response_model=Paginated[VersionOut])
+def _version_out(
+    version: EstimateVersion,
+    payload: dict,
+    user_name: Optional[str] = None,
+) -> VersionOut:
+    return VersionOut(
+        id=version.id,
+        estimate_id=version.estimate_id,
+        version=version.version,
+        created_at=version.created_at,
+        user_id=version.user_id,
+        user_name=user_name,
+        payload=payload,
+    )
+
+
+VERSION_META_COLUMNS = (
+    EstimateVersion.id,
+    EstimateVersion.estimate_id,
+    EstimateVersion.version,
+    EstimateVersion.created_at,
+    EstimateVersion.user_id,
+    User.name.label("user_name"),
+)
+
+
+@router.get("/", response_model=Paginated[VersionOut] | Paginated[VersionMetaOut])
 async def list_versions(
     estimate_id: int,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
+    include_payload: bool = Query(True),
     db: AsyncSession = Depends(get_db),
     context: WorkspaceContext = Depends(
         require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
     ),
 ):
+    # include_payload=false — только номер, автор и дата: снимки не читаются
+    # и не распаковываются
     # проверяем, что смета принадлежит пользователю
     est = await db.get(Estimate, estimate_id)
     if not est or est.organization_id != context.organization_id:
@@ -69,14 +107,91 @@ async def list_versions(
     )
     total = await db.scalar(count_q)
 
+    if not include_payload:
+        q = await db.execute(
+            select(*VERSION_META_COLUMNS)
+            .outerjoin(User, User.id == EstimateVersion.user_id)
+            .where(EstimateVersion.estimate_id == estimate_id)
+            .order_by(EstimateVersion.version.asc())
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )
+        return Paginated[VersionMetaOut](
+            items=[VersionMetaOut.model_validate(row._mapping) for row in q.all()],
+            total=total,
+        )
+
     q = await db.execute(
-        select(EstimateVersion)
+        select(EstimateVersion, User.name)
+        .outerjoin(User, User.id == EstimateVersion.user_id)
         .where(EstimateVersion.estimate_id == estimate_id)
         .order_by(EstimateVersion.version.asc())
         .offset((page - 1) * limit)
         .limit(limit)
     )
-    return {"items": q.scalars().all(), "total": total}
+    rows = q.all()
+    payloads = await load_version_payloads(db, estimate_id, [v for v, _name in rows])
+    return Paginated[VersionOut](
+        items=[_version_out(v, payloads[v.version], user_name) for v, user_name in rows],
+        total=total,
+    )
+
+
+def current_estimate_payload(est: Estimate) -> dict:
+    """Current state in the same shape as a version snapshot (EstimateOut)."""
+    data = {
+        field: getattr(est, field, None)
+        for field in EstimateOut.model_fields
+        if field not in {"items", "client", "is_favorite"}
+    }
+    data["items"] = [EstimateItemOut.model_validate(item) for item in est.items]
+    data["client"] = ClientOut.model_validate(est.client) if est.client else None
+    return jsonable_encoder(data)
+
+
+@router.get("/diff", response_model=VersionDiffOut)
+async def diff_versions(
+    estimate_id: int,
+    from_version: int = Query(..., ge=1),
+    to_version: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db),
+    context: WorkspaceContext = Depends(
+        require_workspace_permission(WORKSPACE_PERMISSION_DATA_VIEW)
+    ),
+):
+    est = await db.get(Estimate, estimate_id)
+    if not est or est.organization_id != context.organization_id:
+        raise HTTPException(404, "Смета не найдена или нет доступа")
+    if to_version is None:
+        # Без to_version версия сравнивается с текущим состоянием сметы,
+        # включая ещё не применённые правки автосохранения
+        if await flush_estimate_autosave(db, estimate_id, reason="read"):
+            await db.commit()
+        q_est = await db.execute(
+            select(Estimate)
+            .options(selectinload(Estimate.items), selectinload(Estimate.client))
+            .where(Estimate.id == estimate_id)
+            .execution_options(populate_existing=True)
+        )
+        est = q_est.scalar_one()
+
+    wanted = {from_version} if to_version is None else {from_version, to_version}
+    q = await db.execute(
+        select(EstimateVersion).where(
+            EstimateVersion.estimate_id == estimate_id,
+            EstimateVersion.version.in_(wanted),
+        )
+    )
+    payloads = await load_version_payloads(db, estimate_id, q.scalars().all())
+    if not wanted <= payloads.keys():
+        raise HTTPException(404, "Версия не найдена")
+
+    new = payloads[to_version] if to_version is not None else current_estimate_payload(est)
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        **compare_snapshots(payloads[from_version], new),
+    }
 
 
 @router.get("/{version}", response_model=VersionOut)
@@ -101,7 +216,8 @@ async def get_version(
     v = q.scalar_one_or_none()
     if not v:
         raise HTTPException(404, "Версия не найдена")
-    return v
+    payloads = await load_version_payloads(db, estimate_id, [v])
+    return _version_out(v, payloads[v.version])
 
 
 @router.post("/{version}/restore", response_model=EstimateOut)
@@ -139,7 +255,7 @@ async def restore_version(
         raise HTTPException(404, "Смета не найдена или нет доступа")
     _ensure_estimate_not_read_only(est)
 
-    data = ver.payload
+    data = (await load_version_payloads(db, estimate_id, [ver]))[version]
     restore_fields = {
         "name",
         "responsible",
@@ -174,6 +290,9 @@ async def restore_version(
         item_payload = dict(item)
         item_payload.pop("id", None)
         db.add(EstimateItem(**item_payload, estimate_id=estimate_id))
+    apply_estimate_totals(est, data.get("items", []))
+    # Несохранённые правки автосохранения не должны перекрыть восстановленную версию
+    await discard_estimate_autosave(db, estimate_id)
 
     # 5) добавим запись в change_log
     from app.models.changelog import EstimateChangeLog
@@ -197,6 +316,7 @@ async def restore_version(
         )
 
     await db.commit()
+    invalidate_estimate_pdfs(estimate_id)
 
     # 6) вернуть обновлённую смету
     await db.refresh(est)
@@ -228,12 +348,7 @@ async def delete_version(
     ver = q.scalar_one_or_none()
     if not ver:
         raise HTTPException(404, "Версия не найдена")
-    # 3) удалить
-    await db.execute(
-        delete(EstimateVersion).where(
-            EstimateVersion.estimate_id == estimate_id,
-            EstimateVersion.version == version,
-        )
-    )
+    # 3) удалить; дельты, опиравшиеся на этот снимок, пересобираются
+    await delete_estimate_versions(db, estimate_id, [version])
     await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
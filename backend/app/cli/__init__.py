@@ -0,0 +1,23 @@
+# Maintenance commands: python -m app.cli.<command> --help
+
+
+def load_models() -> None:
+    """Register every mapper, as the API process does, before running queries."""
+    from app.models import (  # noqa: F401
+        analytics_rollup,
+        audit_ledger,
+        autosave_draft,
+        changelog,
+        client,
+        client_changelog,
+        estimate,
+        estimate_approval,
+        estimate_favorite,
+        export_job,
+        item,
+        note,
+        organization,
+        template,
+        user,
+        version,
+    )
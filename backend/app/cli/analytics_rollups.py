@@ -0,0 +1,69 @@
+# backend/app/cli/analytics_rollups.py
+"""
+Rebuild the daily analytics rollups from estimates and estimate items.
+
+    python -m app.cli.analytics_rollups rebuild
+    python -m app.cli.analytics_rollups rebuild --organization-id 3 --batch-size 31
+
+Rollups are kept up to date by database triggers; a rebuild is only needed
+after changing the aggregation or loading data with the triggers deferred.
+Days are recomputed in batches, each in its own transaction and under the
+same per-day locks the triggers take, so the API can keep writing meanwhile.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import func, select
+
+from app.cli import load_models
+from app.core.database import SessionLocal
+from app.models.analytics_rollup import AnalyticsDailyRollup
+from app.models.organization import Organization
+from app.services.analytics_rollups import organization_rollup_days, refresh_rollup_days
+
+
+async def rebuild(organization_ids: list[int] | None, batch_size: int) -> dict:
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        if not organization_ids:
+            result = await db.execute(select(Organization.id).order_by(Organization.id))
+            organization_ids = list(result.scalars().all())
+
+    report = {"organizations": 0, "days": 0, "rows": 0}
+    for organization_id in organization_ids:
+        async with SessionLocal() as db:
+            days = await organization_rollup_days(db, organization_id)
+        for offset in range(0, len(days), batch_size):
+            async with SessionLocal() as db:
+                await refresh_rollup_days(db, organization_id, days[offset : offset + batch_size])
+                await db.commit()
+        report["organizations"] += 1
+        report["days"] += len(days)
+
+    async with SessionLocal() as db:
+        report["rows"] = await db.scalar(
+            select(func.count())
+            .select_from(AnalyticsDailyRollup)
+            .where(AnalyticsDailyRollup.organization_id.in_(organization_ids))
+        )
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.analytics_rollups", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=("rebuild",))
+    parser.add_argument("--organization-id", type=int, action="append", help="only this organization (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=31, help="days per transaction")
+    args = parser.parse_args(argv)
+
+    load_models()
+    report = asyncio.run(rebuild(args.organization_id, max(1, args.batch_size)))
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
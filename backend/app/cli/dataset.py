@@ -0,0 +1,433 @@
+# backend/app/cli/dataset.py
+"""
+Fill an organization with a large synthetic dataset for benchmarks.
+
+    python -m app.cli.dataset generate --estimates 100000 --items-per-estimate 20
+    python -m app.cli.dataset generate --slug bench --reset --seed 7 --end-date 2026-01-01
+
+Users, memberships, clients, estimates with items, versions (keyframes and
+deltas, as the API stores them), change logs, notes and audit ledger
+entries. Rows get ids reserved from their sequences and are loaded with
+COPY (executemany on drivers without it), one transaction per batch of
+estimates; analytics rollup triggers are deferred and the organization's
+rollups rebuilt at the end. The same --seed and --end-date give the same
+data. Audit entries continue the existing hash chain.
+"""
+
+import argparse
+import asyncio
+import enum
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import JSON, delete, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.cli import load_models
+from app.core.database import engine
+from app.models.audit_ledger import AuditLedgerEntry
+from app.models.changelog import EstimateChangeLog
+from app.models.client import Client, ClientPipelineStage
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.models.note import Note
+from app.models.organization import (
+    WORKSPACE_ROLE_ESTIMATOR,
+    WORKSPACE_ROLE_OWNER,
+    Organization,
+    OrganizationMembership,
+)
+from app.models.user import User
+from app.models.version import EstimateVersion
+from app.services.analytics_rollups import defer_rollup_refresh, rebuild_organization_rollups
+from app.services.audit_ledger import (
+    GENESIS_HASH,
+    build_audit_hash_payload,
+    compute_audit_entry_hash,
+)
+from app.services.estimate_totals import apply_estimate_totals
+from app.services.version_store import VERSION_KIND_KEYFRAME, encode_version
+
+CATEGORIES = ["Звук", "Свет", "Сцена", "Персонал", "Логистика", "Видео", "Декор", "Кейтеринг"]
+UNITS = ["шт", "час", "день", "комплект"]
+PLACES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Сочи"]
+AUDIT_ACTIONS = [
+    ("estimate.read_only.changed", "estimate"),
+    ("estimate.deleted", "estimate"),
+    ("client.pipeline.updated", "client"),
+]
+SPAN_DAYS = 3 * 365
+
+
+async def _reserve_ids(conn, table, count: int) -> list[int]:
+    if count <= 0:
+        return []
+    result = await conn.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {"table": table.name, "count": count},
+    )
+    return sorted(result.scalars().all())
+
+
+def _copy_value(value, column):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if value is not None and isinstance(column.type, JSON):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def _bulk_insert(conn, table, rows: list[dict]) -> int:
+    if not rows:
+        return 0
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    if not hasattr(driver, "copy_records_to_table"):
+        await conn.execute(insert(table), rows)
+        return len(rows)
+    columns = list(rows[0])
+    table_columns = [table.c[name] for name in columns]
+    records = [
+        tuple(_copy_value(row[name], column) for name, column in zip(columns, table_columns))
+        for row in rows
+    ]
+    await driver.copy_records_to_table(table.name, records=records, columns=columns)
+    return len(rows)
+
+
+async def _organization(conn, slug: str, reset: bool) -> int:
+    organization_id = await conn.scalar(select(Organization.id).where(Organization.slug == slug))
+    if organization_id is None:
+        return await conn.scalar(
+            insert(Organization).values(name=f"Dataset {slug}", slug=slug).returning(Organization.id)
+        )
+    if not reset:
+        raise SystemExit(f"Organization {slug!r} already exists, pass --reset to regenerate it")
+    # Пользователи остаются: на них ссылаются записи журнала аудита
+    estimate_ids = select(Estimate.id).where(Estimate.organization_id == organization_id)
+    await defer_rollup_refresh(conn)
+    await conn.execute(delete(EstimateItem).where(EstimateItem.estimate_id.in_(estimate_ids)))
+    await conn.execute(delete(Estimate).where(Estimate.organization_id == organization_id))
+    await conn.execute(delete(Client).where(Client.organization_id == organization_id))
+    await rebuild_organization_rollups(conn, organization_id)
+    return organization_id
+
+
+async def _users(conn, organization_id: int, slug: str, count: int) -> list[int]:
+    logins = [f"{slug}-user-{index}" for index in range(max(1, count))]
+    await conn.execute(
+        pg_insert(User)
+        .values(
+            [
+                {
+                    "email": f"{login}@example.com",
+                    "login": login,
+                    "name": f"Сотрудник {index}",
+                    "hashed_password": "-",
+                    "is_active": True,
+                    "current_organization_id": organization_id,
+                    "default_organization_id": organization_id,
+                }
+                for index, login in enumerate(logins)
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[User.login])
+    )
+    result = await conn.execute(select(User.login, User.id).where(User.login.in_(logins)))
+    ids = dict(result.all())
+    user_ids = [ids[login] for login in logins]
+    await conn.execute(
+        pg_insert(OrganizationMembership)
+        .values(
+            [
+                {
+                    "organization_id": organization_id,
+                    "user_id": user_id,
+                    "role": WORKSPACE_ROLE_OWNER if index == 0 else WORKSPACE_ROLE_ESTIMATOR,
+                }
+                for index, user_id in enumerate(user_ids)
+            ]
+        )
+        .on_conflict_do_nothing(constraint="uq_organization_membership")
+    )
+    return user_ids
+
+
+def _moment(rng: random.Random, end: datetime) -> datetime:
+    return end - timedelta(minutes=rng.randint(1, SPAN_DAYS * 24 * 60))
+
+
+def _client_rows(rng, ids, organization_id, user_ids, end) -> list[dict]:
+    return [
+        {
+            "id": client_id,
+            "name": f"Клиент {index}",
+            "company": f"ООО «Компания {index}»",
+            "email": f"client{index}@example.com",
+            "phone": f"+7 900 {rng.randint(1000000, 9999999)}",
+            "pipeline_stage": rng.choice(list(ClientPipelineStage)),
+            "pipeline_expected_revenue": rng.randint(0, 5000) * 1000.0,
+            "created_at": _moment(rng, end),
+            "user_id": rng.choice(user_ids),
+            "organization_id": organization_id,
+        }
+        for index, client_id in enumerate(ids)
+    ]
+
+
+def _edit_payload(rng: random.Random, payload: dict, moment: datetime) -> dict:
+    payload = json.loads(json.dumps(payload))
+    payload["updated_at"] = moment.isoformat()
+    items = payload["items"]
+    for item in rng.sample(items, k=min(len(items), rng.randint(1, 3))):
+        item["quantity"] = rng.randint(1, 10)
+    if rng.random() < 0.1:
+        payload["status"] = rng.choice(list(EstimateStatus)).value
+    return payload
+
+
+@dataclass
+class _Batch:
+    """Rows of one batch of estimates with everything that hangs off them."""
+
+    estimates: list[dict] = field(default_factory=list)
+    items: list[dict] = field(default_factory=list)
+    versions: list[dict] = field(default_factory=list)
+    changelogs: list[dict] = field(default_factory=list)
+    notes: list[dict] = field(default_factory=list)
+
+
+def _estimate_batch(rng, args, estimate_ids, item_ids, context) -> _Batch:
+    batch = _Batch()
+    item_ids = iter(item_ids)
+    for number, estimate_id in enumerate(estimate_ids, start=len(context["estimate_ids"]) + 1):
+        created = _moment(rng, context["end"])
+        user_id = rng.choice(context["user_ids"])
+        client_id = rng.choice(context["client_ids"]) if context["client_ids"] else None
+        use_internal_price = rng.random() < 0.5
+        vat_enabled = rng.random() < 0.7
+        items = []
+        for _ in range(args.items_per_estimate):
+            internal_price = rng.randint(10, 500) * 100.0
+            items.append(
+                {
+                    "id": next(item_ids),
+                    "name": f"Услуга {rng.randint(1, 400)}",
+                    "description": "Аренда оборудования с доставкой и монтажом",
+                    "quantity": float(rng.randint(1, 10)),
+                    "unit": rng.choice(UNITS),
+                    "internal_price": internal_price,
+                    "external_price": internal_price + rng.randint(0, 300) * 100.0,
+                    "category": rng.choice(CATEGORIES),
+                    "estimate_id": estimate_id,
+                    "template_id": None,
+                }
+            )
+        estimate = {
+            "id": estimate_id,
+            "name": f"Мероприятие {number}",
+            "date": created,
+            "updated_at": created,
+            "event_datetime": created + timedelta(days=rng.randint(7, 90)),
+            "event_place": rng.choice(PLACES),
+            "client_id": client_id,
+            "responsible": f"Сотрудник {context['user_ids'].index(user_id)}",
+            "status": rng.choice(list(EstimateStatus)),
+            "vat_enabled": vat_enabled,
+            "vat_rate": 20,
+            "use_internal_price": use_internal_price,
+            "read_only": False,
+            "user_id": user_id,
+            "organization_id": context["organization_id"],
+        }
+        # Итоги — той же функцией, что и при сохранении сметы через API
+        totals = SimpleNamespace(**estimate)
+        apply_estimate_totals(totals, items)
+        estimate.update(vars(totals))
+        batch.estimates.append(estimate)
+        batch.items.extend(items)
+
+        # История правок: версия — снимок сметы до очередного сохранения
+        payload = {
+            key: value.value if isinstance(value, enum.Enum) else value
+            for key, value in estimate.items()
+            if key not in ("organization_id", "user_id")
+        }
+        payload.update(
+            date=created.isoformat(),
+            updated_at=created.isoformat(),
+            event_datetime=estimate["event_datetime"].isoformat(),
+            items=[{key: item[key] for key in item if key != "template_id"} for item in items],
+        )
+        keyframe, keyframe_payload = None, None
+        moment = created
+        for version in range(1, args.versions_per_estimate + 1):
+            moment += timedelta(minutes=rng.randint(1, 600))
+            row = {
+                "estimate_id": estimate_id,
+                "version": version,
+                "created_at": moment,
+                "user_id": user_id,
+                **encode_version(version, payload, keyframe, keyframe_payload),
+            }
+            if row["kind"] == VERSION_KIND_KEYFRAME:
+                keyframe, keyframe_payload = SimpleNamespace(version=version), payload
+            batch.versions.append(row)
+            payload = _edit_payload(rng, payload, moment)
+        for index in range(args.changelogs_per_estimate):
+            batch.changelogs.append(
+                {
+                    "estimate_id": estimate_id,
+                    "user_id": user_id,
+                    "action": "Создание" if index == 0 else "Обновление сметы",
+                    "description": "Смета создана" if index == 0 else "Смета обновлена",
+                    "details": None if index == 0 else [f"Изменено количество: {rng.randint(1, 10)}"],
+                    "timestamp": created + timedelta(minutes=index * 10),
+                }
+            )
+        for index in range(args.notes_per_estimate):
+            batch.notes.append(
+                {
+                    "text": f"Заметка {index + 1}: уточнить у клиента состав работ",
+                    "created_at": created + timedelta(hours=index + 1),
+                    "updated_at": created + timedelta(hours=index + 1),
+                    "user_id": user_id,
+                    "estimate_id": estimate_id,
+                    "client_id": None,
+                    "template_id": None,
+                }
+            )
+    return batch
+
+
+async def _audit_entries(conn, rng, count: int, context, report: dict) -> None:
+    if count <= 0:
+        return
+    await conn.execute(text("LOCK TABLE audit_ledger_entries IN EXCLUSIVE MODE"))
+    prev_hash = await conn.scalar(
+        select(AuditLedgerEntry.entry_hash).order_by(AuditLedgerEntry.id.desc()).limit(1)
+    ) or GENESIS_HASH
+    ids = await _reserve_ids(conn, AuditLedgerEntry.__table__, count)
+    occurred_at = context["end"] - timedelta(days=SPAN_DAYS)
+    step = timedelta(days=SPAN_DAYS) / count
+    rows = []
+    for entry_id in ids:
+        occurred_at += step
+        action, entity_type = rng.choice(AUDIT_ACTIONS)
+        entity_ids = context["estimate_ids"] if entity_type == "estimate" else context["client_ids"]
+        entity_id = str(rng.choice(entity_ids)) if entity_ids else None
+        values = {
+            "occurred_at": occurred_at,
+            "actor_user_id": rng.choice(context["user_ids"]),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "request_method": "PATCH",
+            "request_path": f"/api/{entity_type}s/{entity_id}",
+            "ip_address": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "user_agent": "dataset-generator",
+            "details": {"synthetic": True},
+        }
+        entry_hash = compute_audit_entry_hash(prev_hash=prev_hash, payload=build_audit_hash_payload(**values))
+        rows.append({"id": entry_id, **values, "prev_hash": prev_hash, "entry_hash": entry_hash})
+        prev_hash = entry_hash
+    report["audit_entries"] += await _bulk_insert(conn, AuditLedgerEntry.__table__, rows)
+
+
+async def generate(args) -> dict:
+    started = time.perf_counter()
+    rng = random.Random(args.seed)
+    end = datetime.combine(args.end_date, datetime.min.time(), tzinfo=timezone.utc)
+    report = {
+        "users": 0,
+        "clients": 0,
+        "estimates": 0,
+        "items": 0,
+        "versions": 0,
+        "changelogs": 0,
+        "notes": 0,
+        "audit_entries": 0,
+    }
+    try:
+        async with engine.begin() as conn:
+            organization_id = await _organization(conn, args.slug, args.reset)
+            user_ids = await _users(conn, organization_id, args.slug, args.users)
+            client_ids = await _reserve_ids(conn, Client.__table__, args.clients)
+            await _bulk_insert(
+                conn, Client.__table__, _client_rows(rng, client_ids, organization_id, user_ids, end)
+            )
+        report["organization_id"] = organization_id
+        report["users"] = len(user_ids)
+        report["clients"] = len(client_ids)
+        context = {
+            "organization_id": organization_id,
+            "user_ids": user_ids,
+            "client_ids": client_ids,
+            "estimate_ids": [],
+            "end": end,
+        }
+
+        for offset in range(0, args.estimates, args.batch_size):
+            count = min(args.batch_size, args.estimates - offset)
+            async with engine.begin() as conn:
+                await defer_rollup_refresh(conn)
+                estimate_ids = await _reserve_ids(conn, Estimate.__table__, count)
+                item_ids = await _reserve_ids(conn, EstimateItem.__table__, count * args.items_per_estimate)
+                batch = _estimate_batch(rng, args, estimate_ids, item_ids, context)
+                report["estimates"] += await _bulk_insert(conn, Estimate.__table__, batch.estimates)
+                report["items"] += await _bulk_insert(conn, EstimateItem.__table__, batch.items)
+                report["versions"] += await _bulk_insert(conn, EstimateVersion.__table__, batch.versions)
+                report["changelogs"] += await _bulk_insert(conn, EstimateChangeLog.__table__, batch.changelogs)
+                report["notes"] += await _bulk_insert(conn, Note.__table__, batch.notes)
+            context["estimate_ids"].extend(estimate_ids)
+
+        async with engine.begin() as conn:
+            await _audit_entries(conn, rng, args.audit_entries, context, report)
+            await rebuild_organization_rollups(conn, organization_id)
+            for table in ("clients", "estimates", "estimate_items", "estimate_versions"):
+                await conn.execute(text(f"ANALYZE {table}"))
+    finally:
+        await engine.dispose()
+
+    duration = time.perf_counter() - started
+    rows = sum(value for key, value in report.items() if key != "organization_id")
+    report["duration_ms"] = round(duration * 1000, 1)
+    report["rows_per_second"] = round(rows / duration) if duration else rows
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.dataset", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=("generate",))
+    parser.add_argument("--slug", default="dataset", help="organization slug; users are <slug>-user-N")
+    parser.add_argument("--reset", action="store_true", help="replace the organization's clients and estimates")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--estimates", type=int, default=50000)
+    parser.add_argument("--items-per-estimate", type=int, default=20)
+    parser.add_argument("--versions-per-estimate", type=int, default=3)
+    parser.add_argument("--changelogs-per-estimate", type=int, default=2)
+    parser.add_argument("--notes-per-estimate", type=int, default=1)
+    parser.add_argument("--audit-entries", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000, help="estimates per transaction")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--end-date",
+        type=date.fromisoformat,
+        default=datetime.now(timezone.utc).date(),
+        help="data spans the three years before this day (YYYY-MM-DD)",
+    )
+    args = parser.parse_args(argv)
+    args.batch_size = max(1, args.batch_size)
+
+    load_models()
+    report = asyncio.run(generate(args))
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# backend/app/cli/versions.py
+"""
+Maintain estimate versions: storage format and retention.
+
+    python -m app.cli.versions convert   # full JSON snapshots -> keyframes + deltas
+    python -m app.cli.versions expand    # back to full JSON snapshots (before downgrade)
+    python -m app.cli.versions compact   # apply the [versions] retention policy now
+
+Each estimate is rewritten in its own transaction, so the command can be
+interrupted and started again.
+"""
+
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import func, select
+
+from app.cli import load_models
+from app.core.database import SessionLocal
+from app.models.version import EstimateVersion
+from app.services.version_retention import compact_estimate_versions
+from app.services.version_store import (
+    VERSION_KIND_KEYFRAME,
+    load_version_payloads,
+    reencode_versions,
+)
+
+
+async def _estimate_ids(db, criteria, after_id: int, batch_size: int) -> list[int]:
+    result = await db.execute(
+        select(EstimateVersion.estimate_id)
+        .where(*criteria, EstimateVersion.estimate_id > after_id)
+        .group_by(EstimateVersion.estimate_id)
+        .order_by(EstimateVersion.estimate_id)
+        .limit(batch_size)
+    )
+    return list(result.scalars().all())
+
+
+def _expand_rows(rows, payloads) -> None:
+    for row in rows:
+        payload = payloads[row.version]
+        row.payload = payload
+        row.kind = VERSION_KIND_KEYFRAME
+        row.base_version = None
+        row.encoding = None
+        row.data = None
+        row.size_bytes = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+async def run(mode: str, batch_size: int, dry_run: bool) -> dict:
+    if mode == "convert":
+        pending = [EstimateVersion.payload.is_not(None)]
+    else:
+        pending = [EstimateVersion.data.is_not(None)]
+
+    report = {"estimates": 0, "versions": 0, "bytes_before": 0, "bytes_after": 0}
+    after_id = 0
+    while True:
+        async with SessionLocal() as db:
+            estimate_ids = await _estimate_ids(db, pending, after_id, batch_size)
+        if not estimate_ids:
+            break
+        for estimate_id in estimate_ids:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(EstimateVersion)
+                    .where(EstimateVersion.estimate_id == estimate_id)
+                    .order_by(EstimateVersion.version.asc())
+                    .with_for_update()
+                )
+                rows = list(result.scalars().all())
+                payloads = await load_version_payloads(db, estimate_id, rows)
+                report["bytes_before"] += sum(row.size_bytes or 0 for row in rows)
+                if mode == "convert":
+                    reencode_versions(rows, payloads)
+                else:
+                    _expand_rows(rows, payloads)
+                report["bytes_after"] += sum(row.size_bytes or 0 for row in rows)
+                report["versions"] += len(rows)
+                report["estimates"] += 1
+                if dry_run:
+                    await db.rollback()
+                else:
+                    await db.commit()
+        after_id = estimate_ids[-1]
+
+    async with SessionLocal() as db:
+        report["remaining"] = await db.scalar(
+            select(func.count()).select_from(EstimateVersion).where(*pending)
+        )
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.versions", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("mode", choices=("convert", "expand", "compact"))
+    parser.add_argument("--batch-size", type=int, default=100, help="estimates per id batch")
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without writing")
+    args = parser.parse_args(argv)
+
+    load_models()
+    if args.mode == "compact":
+        report = asyncio.run(compact_estimate_versions(dry_run=args.dry_run))
+    else:
+        report = asyncio.run(run(args.mode, max(1, args.batch_size), args.dry_run))
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
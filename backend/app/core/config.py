@@ -50,6 +50,47 @@ class Settings(BaseModel):
     PROFIT_GUARD_MIN_MARGIN_PERCENT: float = 15.0
     ORGANIZATIONS_AUTO_DOMAIN_ENABLED: bool = False
 
+    EXPORTS_PDF_WORKERS: int = 2
+    EXPORTS_PDF_QUEUE_DEPTH: int = 16
+    EXPORTS_PDF_WORKER_PROCESSES: bool = True
+    EXPORTS_PDF_WORKER_MAX_JOBS: int = 100
+    EXPORTS_PDF_CACHE_ENABLED: bool = True
+    EXPORTS_PDF_CACHE_DIR: str = "/tmp/quickestimate-pdf-cache"
+    EXPORTS_PDF_CACHE_MAX_MB: int = 256
+    EXPORTS_BULK_CONCURRENCY: int = 4
+    EXPORTS_BULK_MAX_ITEMS: int = 500
+    EXPORTS_JOBS_ENABLED: bool = True
+    EXPORTS_JOBS_DIR: str = "/tmp/quickestimate-exports"
+    EXPORTS_JOBS_TTL_HOURS: int = 24
+    EXPORTS_JOBS_CONCURRENCY: int = 2
+
+    AUTOSAVE_COALESCE_ENABLED: bool = True
+    AUTOSAVE_FLUSH_AFTER_SECONDS: int = 30
+    AUTOSAVE_FLUSH_AFTER_WRITES: int = 20
+
+    VERSIONS_KEYFRAME_INTERVAL: int = 20
+    VERSIONS_COMPRESSION: str = "zlib"
+    VERSIONS_RETENTION_ENABLED: bool = True
+    VERSIONS_KEEP_ALL_DAYS: int = 7
+    VERSIONS_KEEP_DAILY_DAYS: int = 30
+    VERSIONS_COMPACT_INTERVAL_MINUTES: int = 60
+    VERSIONS_COMPACT_BATCH_SIZE: int = 500
+
+    ANALYTICS_ROLLUPS_ENABLED: bool = True
+    ANALYTICS_CACHE_ENABLED: bool = True
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 1000
+    ANALYTICS_CONCURRENT_SECTIONS: bool = False
+    ANALYTICS_SECTION_CONCURRENCY: int = 3
+    ANALYTICS_SECTION_POOL_SIZE: int = 6
+
+    INSTRUMENTATION_ENABLED: bool = True
+    INSTRUMENTATION_SERVER_TIMING: bool = False
+    INSTRUMENTATION_LOG_REQUESTS: bool = True
+    INSTRUMENTATION_LOG_MIN_DURATION_MS: int = 0
+
+    METRICS_ENABLED: bool = True
+
     SERVER_HOST: str = "0.0.0.0"
     SERVER_PORT: int = 8000
     SERVER_RELOAD: bool = False
@@ -119,6 +160,41 @@ ENV_OVERRIDE_KEYS = {
     "PROFIT_GUARD_ENABLED",
     "PROFIT_GUARD_MIN_MARGIN_PERCENT",
     "ORGANIZATIONS_AUTO_DOMAIN_ENABLED",
+    "EXPORTS_PDF_WORKERS",
+    "EXPORTS_PDF_QUEUE_DEPTH",
+    "EXPORTS_PDF_WORKER_PROCESSES",
+    "EXPORTS_PDF_WORKER_MAX_JOBS",
+    "EXPORTS_PDF_CACHE_ENABLED",
+    "EXPORTS_PDF_CACHE_DIR",
+    "EXPORTS_PDF_CACHE_MAX_MB",
+    "EXPORTS_BULK_CONCURRENCY",
+    "EXPORTS_BULK_MAX_ITEMS",
+    "EXPORTS_JOBS_ENABLED",
+    "EXPORTS_JOBS_DIR",
+    "EXPORTS_JOBS_TTL_HOURS",
+    "EXPORTS_JOBS_CONCURRENCY",
+    "AUTOSAVE_COALESCE_ENABLED",
+    "AUTOSAVE_FLUSH_AFTER_SECONDS",
+    "AUTOSAVE_FLUSH_AFTER_WRITES",
+    "VERSIONS_KEYFRAME_INTERVAL",
+    "VERSIONS_COMPRESSION",
+    "VERSIONS_RETENTION_ENABLED",
+    "VERSIONS_KEEP_ALL_DAYS",
+    "VERSIONS_KEEP_DAILY_DAYS",
+    "VERSIONS_COMPACT_INTERVAL_MINUTES",
+    "VERSIONS_COMPACT_BATCH_SIZE",
+    "ANALYTICS_ROLLUPS_ENABLED",
+    "ANALYTICS_CACHE_ENABLED",
+    "ANALYTICS_CACHE_TTL_SECONDS",
+    "ANALYTICS_CACHE_MAX_ENTRIES",
+    "ANALYTICS_CONCURRENT_SECTIONS",
+    "ANALYTICS_SECTION_CONCURRENCY",
+    "ANALYTICS_SECTION_POOL_SIZE",
+    "INSTRUMENTATION_ENABLED",
+    "INSTRUMENTATION_SERVER_TIMING",
+    "INSTRUMENTATION_LOG_REQUESTS",
+    "INSTRUMENTATION_LOG_MIN_DURATION_MS",
+    "METRICS_ENABLED",
     "SERVER_HOST",
     "SERVER_PORT",
     "SERVER_RELOAD",
@@ -310,6 +386,88 @@ def _parse_toml_config(config_data: dict[str, Any], config_path: Path) -> dict[s
             "auto_domain_enabled"
         ]
 
+    exports_cfg = config_data.get("exports", {})
+    if "pdf_workers" in exports_cfg:
+        parsed["EXPORTS_PDF_WORKERS"] = exports_cfg["pdf_workers"]
+    if "pdf_queue_depth" in exports_cfg:
+        parsed["EXPORTS_PDF_QUEUE_DEPTH"] = exports_cfg["pdf_queue_depth"]
+    if "pdf_worker_processes" in exports_cfg:
+        parsed["EXPORTS_PDF_WORKER_PROCESSES"] = exports_cfg["pdf_worker_processes"]
+    if "pdf_worker_max_jobs" in exports_cfg:
+        parsed["EXPORTS_PDF_WORKER_MAX_JOBS"] = exports_cfg["pdf_worker_max_jobs"]
+    if "pdf_cache_enabled" in exports_cfg:
+        parsed["EXPORTS_PDF_CACHE_ENABLED"] = exports_cfg["pdf_cache_enabled"]
+    if "pdf_cache_dir" in exports_cfg:
+        parsed["EXPORTS_PDF_CACHE_DIR"] = _resolve_path(exports_cfg["pdf_cache_dir"], config_dir)
+    if "pdf_cache_max_mb" in exports_cfg:
+        parsed["EXPORTS_PDF_CACHE_MAX_MB"] = exports_cfg["pdf_cache_max_mb"]
+    if "bulk_concurrency" in exports_cfg:
+        parsed["EXPORTS_BULK_CONCURRENCY"] = exports_cfg["bulk_concurrency"]
+    if "bulk_max_items" in exports_cfg:
+        parsed["EXPORTS_BULK_MAX_ITEMS"] = exports_cfg["bulk_max_items"]
+    if "jobs_enabled" in exports_cfg:
+        parsed["EXPORTS_JOBS_ENABLED"] = exports_cfg["jobs_enabled"]
+    if "jobs_dir" in exports_cfg:
+        parsed["EXPORTS_JOBS_DIR"] = _resolve_path(exports_cfg["jobs_dir"], config_dir)
+    if "jobs_ttl_hours" in exports_cfg:
+        parsed["EXPORTS_JOBS_TTL_HOURS"] = exports_cfg["jobs_ttl_hours"]
+    if "jobs_concurrency" in exports_cfg:
+        parsed["EXPORTS_JOBS_CONCURRENCY"] = exports_cfg["jobs_concurrency"]
+
+    autosave_cfg = config_data.get("autosave", {})
+    if "coalesce_enabled" in autosave_cfg:
+        parsed["AUTOSAVE_COALESCE_ENABLED"] = autosave_cfg["coalesce_enabled"]
+    if "flush_after_seconds" in autosave_cfg:
+        parsed["AUTOSAVE_FLUSH_AFTER_SECONDS"] = autosave_cfg["flush_after_seconds"]
+    if "flush_after_writes" in autosave_cfg:
+        parsed["AUTOSAVE_FLUSH_AFTER_WRITES"] = autosave_cfg["flush_after_writes"]
+
+    versions_cfg = config_data.get("versions", {})
+    if "keyframe_interval" in versions_cfg:
+        parsed["VERSIONS_KEYFRAME_INTERVAL"] = versions_cfg["keyframe_interval"]
+    if "compression" in versions_cfg:
+        parsed["VERSIONS_COMPRESSION"] = versions_cfg["compression"]
+    if "retention_enabled" in versions_cfg:
+        parsed["VERSIONS_RETENTION_ENABLED"] = versions_cfg["retention_enabled"]
+    if "keep_all_days" in versions_cfg:
+        parsed["VERSIONS_KEEP_ALL_DAYS"] = versions_cfg["keep_all_days"]
+    if "keep_daily_days" in versions_cfg:
+        parsed["VERSIONS_KEEP_DAILY_DAYS"] = versions_cfg["keep_daily_days"]
+    if "compact_interval_minutes" in versions_cfg:
+        parsed["VERSIONS_COMPACT_INTERVAL_MINUTES"] = versions_cfg["compact_interval_minutes"]
+    if "compact_batch_size" in versions_cfg:
+        parsed["VERSIONS_COMPACT_BATCH_SIZE"] = versions_cfg["compact_batch_size"]
+
+    analytics_cfg = config_data.get("analytics", {})
+    if "rollups_enabled" in analytics_cfg:
+        parsed["ANALYTICS_ROLLUPS_ENABLED"] = analytics_cfg["rollups_enabled"]
+    if "cache_enabled" in analytics_cfg:
+        parsed["ANALYTICS_CACHE_ENABLED"] = analytics_cfg["cache_enabled"]
+    if "cache_ttl_seconds" in analytics_cfg:
+        parsed["ANALYTICS_CACHE_TTL_SECONDS"] = analytics_cfg["cache_ttl_seconds"]
+    if "cache_max_entries" in analytics_cfg:
+        parsed["ANALYTICS_CACHE_MAX_ENTRIES"] = analytics_cfg["cache_max_entries"]
+    if "concurrent_sections" in analytics_cfg:
+        parsed["ANALYTICS_CONCURRENT_SECTIONS"] = analytics_cfg["concurrent_sections"]
+    if "section_concurrency" in analytics_cfg:
+        parsed["ANALYTICS_SECTION_CONCURRENCY"] = analytics_cfg["section_concurrency"]
+    if "section_pool_size" in analytics_cfg:
+        parsed["ANALYTICS_SECTION_POOL_SIZE"] = analytics_cfg["section_pool_size"]
+
+    instrumentation_cfg = config_data.get("instrumentation", {})
+    if "enabled" in instrumentation_cfg:
+        parsed["INSTRUMENTATION_ENABLED"] = instrumentation_cfg["enabled"]
+    if "server_timing" in instrumentation_cfg:
+        parsed["INSTRUMENTATION_SERVER_TIMING"] = instrumentation_cfg["server_timing"]
+    if "log_requests" in instrumentation_cfg:
+        parsed["INSTRUMENTATION_LOG_REQUESTS"] = instrumentation_cfg["log_requests"]
+    if "log_min_duration_ms" in instrumentation_cfg:
+        parsed["INSTRUMENTATION_LOG_MIN_DURATION_MS"] = instrumentation_cfg["log_min_duration_ms"]
+
+    metrics_cfg = config_data.get("metrics", {})
+    if "enabled" in metrics_cfg:
+        parsed["METRICS_ENABLED"] = metrics_cfg["enabled"]
+
     if "host" in server_cfg:
         parsed["SERVER_HOST"] = server_cfg["host"]
     if "port" in server_cfg:
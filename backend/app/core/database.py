@@ -8,6 +8,18 @@ engine = create_async_engine(settings.DATABASE_URL, echo=False)
 # Сессия для запросов
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# Отдельный пул для параллельных секций аналитики: соединение запроса
+# остаётся в основном пуле, а секции не могут выбрать его целиком
+analytics_sections_engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    pool_size=settings.ANALYTICS_SECTION_POOL_SIZE,
+    max_overflow=0,
+)
+AnalyticsSessionLocal = sessionmaker(
+    bind=analytics_sections_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
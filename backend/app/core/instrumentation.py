@@ -0,0 +1,207 @@
+# backend/app/core/instrumentation.py
+
+import asyncio
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.routing import request_response
+
+logger = logging.getLogger("app.requests")
+
+# Порядок фаз в заголовке и в строке лога
+PHASES = ("auth", "handler", "serialize", "render")
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    """Statement count and time per phase (ms) of one HTTP request."""
+
+    db_count: int = 0
+    db_ms: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+    handler_started: float = 0.0
+    handler_finished: float = 0.0
+
+    def add(self, phase: str, elapsed_ms: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed_ms
+
+
+# Контекст копируется в задачи и потоки (to_thread, greenlet_spawn движка),
+# поэтому все они дописывают в один объект запроса
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the block's wall time to ``phase`` of the current request (no-op outside one)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, (perf_counter() - started) * 1000)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        # На контексте выполнения, а не на соединении: замер упавшего запроса
+        # уходит вместе с контекстом и не остаётся в пуле
+        context._instrumentation_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    started = getattr(context, "_instrumentation_started", None)
+    if timings is None or started is None:
+        return
+    timings.db_count += 1
+    timings.db_ms += (perf_counter() - started) * 1000
+
+
+def install_sql_hooks(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _timed_endpoint(call):
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return await call(*args, **kwargs)
+            timings.handler_started = perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                timings.handler_finished = perf_counter()
+                timings.add("handler", (timings.handler_finished - timings.handler_started) * 1000)
+
+        return endpoint
+
+    @functools.wraps(call)
+    def sync_endpoint(*args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return call(*args, **kwargs)
+        timings.handler_started = perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            timings.handler_finished = perf_counter()
+            timings.add("handler", (timings.handler_finished - timings.handler_started) * 1000)
+
+    return sync_endpoint
+
+
+def _timed_route_handler(handler):
+    async def route_handler(request):
+        response = await handler(request)
+        timings = _current.get()
+        if timings is not None and timings.handler_finished:
+            # Проверка response_model и кодирование JSON идут после эндпоинта
+            timings.add("serialize", (perf_counter() - timings.handler_finished) * 1000)
+        return response
+
+    return route_handler
+
+
+def instrument_routes(routes) -> None:
+    """Time the endpoint and response serialization of every API route."""
+    for route in routes:
+        if not isinstance(route, APIRoute) or getattr(route, "_instrumented", False):
+            continue
+        route.dependant.call = _timed_endpoint(route.dependant.call)
+        route.app = request_response(_timed_route_handler(route.get_route_handler()))
+        route._instrumented = True
+
+
+def server_timing_header(timings: RequestTimings, total_ms: float) -> str:
+    entries = [f'db;dur={timings.db_ms:.1f};desc="{timings.db_count} queries"']
+    for phase in PHASES:
+        if phase in timings.phases:
+            entries.append(f"{phase};dur={timings.phases[phase]:.1f}")
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def _log_line(scope, status: int, timings: RequestTimings, total_ms: float) -> str:
+    route = scope.get("route")
+    fields = [
+        ("method", scope.get("method")),
+        ("path", scope.get("path")),
+        ("route", getattr(route, "path", None)),
+        ("status", status),
+        ("total_ms", f"{total_ms:.1f}"),
+        ("db_ms", f"{timings.db_ms:.1f}"),
+        ("db_count", timings.db_count),
+    ]
+    fields.extend(
+        (f"{phase}_ms", f"{timings.phases[phase]:.1f}") for phase in PHASES if phase in timings.phases
+    )
+    return "request " + " ".join(f"{key}={value}" for key, value in fields if value is not None)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measures every HTTP request: SQL statements and their time (engine hooks
+    from ``install_sql_hooks``), the phases recorded with ``timed`` and by
+    ``instrument_routes``, and the total. The result goes to the
+    ``Server-Timing`` response header and to one ``app.requests`` log line
+    for requests that took at least ``log_min_duration_ms``.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        server_timing: bool = True,
+        log_requests: bool = True,
+        log_min_duration_ms: float = 0,
+    ):
+        self.app = app
+        self.server_timing = server_timing
+        self.log_requests = log_requests
+        self.log_min_duration_ms = max(0.0, float(log_min_duration_ms))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    total_ms = (perf_counter() - started) * 1000
+                    headers = list(message.get("headers", []))
+                    value = server_timing_header(timings, total_ms)
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total_ms = (perf_counter() - started) * 1000
+            if self.log_requests and total_ms >= self.log_min_duration_ms:
+                logger.info(_log_line(scope, status, timings, total_ms))
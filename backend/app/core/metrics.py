@@ -0,0 +1,258 @@
+# backend/app/core/metrics.py
+
+import math
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable
+
+from app.core.database import engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Секунды; для HTTP — как у клиентских библиотек Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        callback: Callable[[], float] | None = None,
+    ):
+        if callback is not None and labelnames:
+            raise ValueError("Callback metrics cannot have labels")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+        self._values: dict[tuple, float] = {} if labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def _samples(self) -> list[str]:
+        if self._callback is not None:
+            return [f"{self.name} {_format_value(self._callback())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (счётчики по корзинам без накопления, сумма, количество)
+        self._series: dict[tuple, tuple[list[int], float, int]] = {}
+        if not self.labelnames:
+            self._series[()] = ([0] * len(self.buckets), 0.0, 0)
+
+    def observe(self, value: float, *labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the block's wall time in seconds (also a decorator for sync functions)."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, *labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = sorted(
+                (key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()
+            )
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of this backend process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=(), callback=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route template and status.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests being processed.",
+)
+
+
+def _pool_value(name: str) -> Callable[[], float]:
+    def read() -> float:
+        method = getattr(engine.pool, name, None)
+        return float(method()) if callable(method) else 0.0
+
+    return read
+
+
+registry.gauge("db_pool_size", "Configured connection pool size.", callback=_pool_value("size"))
+registry.gauge(
+    "db_pool_checked_out",
+    "Database connections currently checked out of the pool.",
+    callback=_pool_value("checkedout"),
+)
+registry.gauge(
+    "db_pool_checked_in",
+    "Idle database connections in the pool.",
+    callback=_pool_value("checkedin"),
+)
+registry.gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size.",
+    # QueuePool.overflow() отрицателен, пока пул не заполнен
+    callback=lambda: max(0.0, _pool_value("overflow")()),
+)
+
+
+class MetricsMiddleware:
+    """Counts in-flight requests and records their latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # Шаблон маршрута, а не путь: id в пути раздули бы число серий
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.observe(perf_counter() - started, scope["method"], route, status)
@@ -8,7 +8,7 @@ from fastapi import FastAPI, Request
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import HTTPException as FastAPIHTTPException, RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
@@ -17,9 +17,20 @@ from starlette.responses import FileResponse
 
 from app.core.config import settings
 from app.core.database import engine
+from app.core.instrumentation import (
+    RequestInstrumentationMiddleware,
+    install_sql_hooks,
+    instrument_routes,
+)
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry
 from app.core.logging import configure_logging, log_startup_banner, log_startup_checks
+from app.services.analytics_cache import analytics_cache
+from app.services.analytics_engine import section_latency
+from app.services.autosave_buffer import autosave_coalescer
+from app.services.export_jobs import export_job_worker
+from app.services.version_retention import version_compactor
 from app.utils.excel import generate_excel
-from app.utils.pdf import render_pdf
+from app.utils.pdf import PdfRenderQueueFull, pdf_cache, pdf_render_pool, render_pdf
 
 
 configure_logging(settings)
@@ -33,9 +44,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Retry-After"],
+    expose_headers=["Retry-After", "Server-Timing"],
 )
 
+if settings.INSTRUMENTATION_ENABLED:
+    install_sql_hooks(engine)
+    app.add_middleware(
+        RequestInstrumentationMiddleware,
+        server_timing=settings.INSTRUMENTATION_SERVER_TIMING,
+        log_requests=settings.INSTRUMENTATION_LOG_REQUESTS,
+        log_min_duration_ms=settings.INSTRUMENTATION_LOG_MIN_DURATION_MS,
+    )
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 from app.api import (
     admin,
@@ -44,6 +67,7 @@ from app.api import (
     auth,
     clients,
     estimates,
+    exports,
     notes,
     templates,
     user,
@@ -64,6 +88,10 @@ app.include_router(clients.router, prefix="/api/clients")
 app.include_router(versions.router, prefix="/api/versions")
 app.include_router(analytics.router, prefix="/api/analytics")
 app.include_router(notes.router, prefix="/api/notes")
+app.include_router(exports.router, prefix="/api/exports")
+
+if settings.INSTRUMENTATION_ENABLED:
+    instrument_routes(app.routes)
 
 
 def _is_test_env() -> bool:
@@ -169,6 +197,26 @@ async def live_health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/api/health/stats")
+async def runtime_stats() -> dict:
+    return {
+        "pdf_render": pdf_render_pool.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "export_jobs": export_job_worker.stats(),
+        "autosave": autosave_coalescer.stats(),
+        "version_compactor": version_compactor.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "analytics_sections": section_latency.stats(),
+    }
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/api/health/metrics", include_in_schema=False)
+    async def prometheus_metrics() -> Response:
+        return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/health/ready")
 async def readiness_health() -> JSONResponse:
     skip_heavy_checks = _is_test_env()
@@ -223,7 +271,19 @@ async def _run_startup_checks() -> None:
 @asynccontextmanager
 async def app_lifespan(_app: FastAPI):
     await _run_startup_checks()
-    yield
+    if settings.EXPORTS_JOBS_ENABLED and not _is_test_env():
+        export_job_worker.start()
+    if settings.AUTOSAVE_COALESCE_ENABLED and not _is_test_env():
+        autosave_coalescer.start()
+    if settings.VERSIONS_RETENTION_ENABLED and not _is_test_env():
+        version_compactor.start()
+    try:
+        yield
+    finally:
+        await version_compactor.stop()
+        await autosave_coalescer.stop()
+        await export_job_worker.stop()
+        pdf_render_pool.shutdown()
 
 
 app.router.lifespan_context = app_lifespan
@@ -244,6 +304,19 @@ async def api_http_error_handler(request: Request, exc: FastAPIHTTPException):
     return await http_exception_handler(request, exc)
 
 
+@app.exception_handler(PdfRenderQueueFull)
+async def pdf_render_queue_full_handler(request: Request, exc: PdfRenderQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content=_api_error_payload(
+            code="pdf_render_busy",
+            detail="Сервис генерации PDF перегружен, повторите попытку позже",
+            meta={"path": request.url.path},
+        ),
+        headers={"Retry-After": "5"},
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def api_validation_error_handler(request: Request, exc: RequestValidationError):
     if _is_api_request(request):
@@ -0,0 +1,83 @@
+# backend/app/models/analytics_rollup.py
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum as SQLEnum,
+    Float,
+    Index,
+    Integer,
+    String,
+    func,
+)
+
+from app.core.database import Base
+from app.models.estimate import EstimateStatus
+
+# Строка по смете целиком; остальные строки — по категории позиций (lower)
+ROLLUP_ALL_CATEGORIES = "*"
+
+
+class AnalyticsDailyRollup(Base):
+    """
+    Revenue of estimates aggregated per organization and UTC day. Rows are
+    derived data: database triggers on estimates/estimate_items recompute
+    the touched days, ``python -m app.cli.analytics_rollups rebuild`` all of them.
+
+    ``category = '*'`` rows describe whole estimates: ``estimates_count`` counts
+    every estimate, ``priced_estimates_count`` and the money columns only those
+    with items. Other rows hold the items of one (lower-cased) category and
+    count the estimates that have such items.
+    """
+
+    __tablename__ = "analytics_daily_rollups"
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    client_id = Column(Integer, nullable=True)
+    responsible = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    status = Column(
+        SQLEnum(
+            EstimateStatus,
+            name="estimate_status",
+            values_callable=lambda enum_cls: [item.value for item in enum_cls],
+            create_type=False,
+        ),
+        nullable=False,
+    )
+    vat_enabled = Column(Boolean, nullable=True)
+    use_internal_price = Column(Boolean, nullable=False)
+    estimates_count = Column(Integer, nullable=False, default=0)
+    priced_estimates_count = Column(Integer, nullable=False, default=0)
+    items_count = Column(Integer, nullable=False, default=0)
+    total_external = Column(Float, nullable=False, default=0)
+    margin = Column(Float, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index(
+            "ix_analytics_daily_rollups_org_category_day",
+            "organization_id",
+            "category",
+            "day",
+        ),
+    )
+
+
+class AnalyticsGeneration(Base):
+    """
+    Per-organization counter bumped whenever estimate data that analytics
+    depend on changes, once per writing transaction at its commit; cached
+    analytics results are valid only for the generation they were computed at.
+    """
+
+    __tablename__ = "analytics_generations"
+
+    organization_id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,34 @@
+# backend/app/models/autosave_draft.py
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.core.database import Base
+
+
+class EstimateAutosaveDraft(Base):
+    """
+    Pending autosave patches of an estimate, merged last-writer-wins until
+    they are flushed into the estimate. One row per estimate.
+    """
+
+    __tablename__ = "estimate_autosave_drafts"
+
+    estimate_id = Column(
+        Integer,
+        ForeignKey("estimates.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    organization_id = Column(
+        Integer,
+        ForeignKey("organizations.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    patch = Column(JSONB, nullable=False, default=dict)
+    writes = Column(Integer, nullable=False, default=1)
+    first_write_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
+    last_write_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
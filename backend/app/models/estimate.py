@@ -6,10 +6,13 @@ from sqlalchemy import (
     Integer,
     String,
     DateTime,
+    Float,
     func,
     Boolean,
     ForeignKey,
     Enum as SQLEnum,
+    Index,
+    text,
 )
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -90,6 +93,14 @@ class Estimate(Base):
     vat_rate = Column(Integer, default=20, nullable=False)
     use_internal_price = Column(Boolean, default=True, nullable=False)
     read_only = Column(Boolean, default=False, nullable=False)
+
+    # Итоги по позициям хранятся в смете, чтобы списки и аналитика не читали
+    # estimate_items. Поддерживаются app.services.estimate_totals.
+    items_count = Column(Integer, default=0, server_default="0", nullable=False)
+    total_internal = Column(Float, default=0, server_default="0", nullable=False)
+    total_external = Column(Float, default=0, server_default="0", nullable=False)
+    margin = Column(Float, default=0, server_default="0", nullable=False)
+    total_with_vat = Column(Float, default=0, server_default="0", nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
     organization_id = Column(
         Integer,
@@ -100,3 +111,17 @@ class Estimate(Base):
 
     user = relationship("User", back_populates="estimates")
     organization = relationship("Organization")
+
+    __table_args__ = (
+        # Пересчёт дневных агрегатов аналитики выбирает сметы организации за день
+        Index("ix_estimates_organization_id_date", "organization_id", "date"),
+        # Фильтры аналитики и списков по статусу и клиенту — вместе с периодом
+        Index("ix_estimates_organization_id_status_date", "organization_id", "status", "date"),
+        Index(
+            "ix_estimates_organization_id_client_id_date",
+            "organization_id",
+            "client_id",
+            "date",
+            postgresql_where=text("client_id IS NOT NULL"),
+        ),
+    )
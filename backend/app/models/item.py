@@ -1,5 +1,5 @@
 # backend/app/models/item.py
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Index, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -20,3 +20,23 @@ class EstimateItem(Base):
 
     estimate = relationship("Estimate", back_populates="items")
     template = relationship("EstimateTemplate", back_populates="items")
+
+
+# Позиции смет и шаблонов лежат в одной таблице — индексы частичные
+Index(
+    "ix_estimate_items_estimate_id",
+    EstimateItem.estimate_id,
+    postgresql_where=EstimateItem.estimate_id.is_not(None),
+)
+Index(
+    "ix_estimate_items_template_id",
+    EstimateItem.template_id,
+    postgresql_where=EstimateItem.template_id.is_not(None),
+)
+# Фильтр аналитики по категориям: lower(category) IN (...)
+Index(
+    "ix_estimate_items_lower_category_estimate_id",
+    func.lower(EstimateItem.category),
+    EstimateItem.estimate_id,
+    postgresql_where=EstimateItem.estimate_id.is_not(None),
+)
@@ -1,5 +1,5 @@
 # backend/app/models/version.py
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON, func
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON, LargeBinary, String, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -17,7 +17,15 @@ class EstimateVersion(Base):
     version = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    payload = Column(JSON, nullable=False)
+    # Снимок хранится либо целиком (keyframe), либо разницей с ближайшим
+    # предыдущим keyframe (delta) в data; payload остаётся только у строк,
+    # ещё не переведённых в новый формат (см. app.services.version_store)
+    payload = Column(JSON, nullable=True)
+    kind = Column(String(16), nullable=False, default="keyframe", server_default="keyframe")
+    base_version = Column(Integer, nullable=True)
+    encoding = Column(String(16), nullable=True)
+    data = Column(LargeBinary, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
 
     estimate = relationship("Estimate", back_populates="versions")
     user = relationship("User")
@@ -1,6 +1,6 @@
 ## backend/app/schemas/estimate.py
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, EmailStr, Field, field_validator
 
@@ -73,6 +73,31 @@ class EstimateOut(EstimateBase):
     model_config = {"from_attributes": True}
 
 
+class EstimateSummaryOut(BaseModel):
+    id: int
+    name: str
+    date: datetime
+    updated_at: Optional[datetime] = None
+    status: EstimateStatus
+    responsible: str
+    event_datetime: Optional[datetime] = None
+    client_id: Optional[int] = None
+    client_name: Optional[str] = None
+    vat_enabled: bool
+    vat_rate: int
+    use_internal_price: bool
+    read_only: bool
+    user_id: int
+    is_favorite: bool = False
+    items_count: int
+    total_internal: float
+    total_external: float
+    # Маржа имеет смысл только при учёте внутренних цен
+    margin: Optional[float] = None
+    vat_amount: float
+    total_with_vat: float
+
+
 class EstimateSendEmail(BaseModel):
     to: EmailStr
     subject: Optional[str] = Field(default=None, min_length=1, max_length=200)
@@ -81,6 +106,21 @@ class EstimateSendEmail(BaseModel):
     attach_excel: bool = True
 
 
+class EstimateSelectionIn(BaseModel):
+    # Явный список id имеет приоритет над фильтрами списка смет
+    ids: Optional[List[int]] = Field(default=None, min_length=1)
+    name: Optional[str] = None
+    client: Optional[int] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    status: Optional[str] = None
+    favorite: Optional[bool] = None
+
+
+class EstimateBulkExportIn(EstimateSelectionIn):
+    format: Literal["pdf", "excel"] = "pdf"
+
+
 class EstimateItemAutosave(BaseModel):
     id: Optional[int] = None
     name: str = ""
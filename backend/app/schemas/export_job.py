@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, model_validator
+
+from app.models.estimate import EstimateStatus
+from app.schemas.analytics import GranularityEnum
+
+ESTIMATE_EXPORT_JOB_KINDS = ("estimate_pdf", "estimate_excel", "invoice_pdf", "act_pdf")
+ANALYTICS_EXPORT_JOB_KINDS = ("analytics_csv", "analytics_excel", "analytics_pdf")
+
+ExportJobKind = Literal[
+    "estimate_pdf",
+    "estimate_excel",
+    "invoice_pdf",
+    "act_pdf",
+    "analytics_csv",
+    "analytics_excel",
+    "analytics_pdf",
+]
+
+
+class AnalyticsExportParams(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    status: Optional[List[EstimateStatus]] = None
+    vat_enabled: Optional[bool] = None
+    granularity: GranularityEnum = GranularityEnum.month
+    categories: Optional[List[str]] = None
+
+
+class ExportJobCreate(BaseModel):
+    kind: ExportJobKind
+    estimate_id: Optional[int] = None
+    analytics: Optional[AnalyticsExportParams] = None
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        if self.kind in ESTIMATE_EXPORT_JOB_KINDS and self.estimate_id is None:
+            raise ValueError("Для выгрузки сметы нужно указать estimate_id")
+        return self
+
+
+class ExportJobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: int
+    error: Optional[str] = None
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None
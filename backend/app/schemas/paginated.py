@@ -1,4 +1,4 @@
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel
 
 T = TypeVar("T")
@@ -6,3 +6,11 @@ T = TypeVar("T")
 class Paginated(BaseModel, Generic[T]):
     total: int
     items: List[T]
+
+
+class CursorPaginated(BaseModel, Generic[T]):
+    # total считается только по запросу: COUNT(*) на каждую страницу
+    # дороже самой выборки на больших пространствах
+    total: Optional[int] = None
+    items: List[T]
+    next_cursor: Optional[str] = None
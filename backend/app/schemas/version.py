@@ -1,15 +1,55 @@
 # backend/app/schemas/version.py
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 
-class VersionOut(BaseModel):
+class VersionMetaOut(BaseModel):
     id: int
     estimate_id: int
     version: int
     created_at: datetime
     user_id: int
-    payload: Dict[str, Any]
+    user_name: Optional[str] = None
 
     model_config = {"from_attributes": True}
+
+
+class VersionOut(VersionMetaOut):
+    payload: Dict[str, Any]
+
+
+class VersionFieldChange(BaseModel):
+    field: str
+    old: Any = None
+    new: Any = None
+
+
+class VersionItemChange(BaseModel):
+    id: Optional[int] = None
+    name: str
+    changes: List[VersionFieldChange]
+
+
+class VersionItemsDiff(BaseModel):
+    added: List[Dict[str, Any]] = []
+    removed: List[Dict[str, Any]] = []
+    changed: List[VersionItemChange] = []
+
+
+class VersionTotals(BaseModel):
+    items_count: int
+    total_internal: float
+    total_external: float
+    margin: float
+    total_with_vat: float
+
+
+class VersionDiffOut(BaseModel):
+    from_version: int
+    # None — сравнение с текущим состоянием сметы
+    to_version: Optional[int] = None
+    fields: List[VersionFieldChange]
+    items: VersionItemsDiff
+    totals_from: VersionTotals
+    totals_to: VersionTotals
@@ -0,0 +1,108 @@
+# backend/app/services/analytics_cache.py
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.analytics_rollup import AnalyticsGeneration
+
+
+class AnalyticsCache:
+    """
+    In-process LRU cache of analytics responses.
+
+    Keys are built from normalized filters (``AnalyticsFilters`` already holds
+    the organization), so equal filter sets share an entry. Every entry
+    remembers the organization's analytics generation it was computed at;
+    the generation lives in the database and is bumped by the rollup
+    triggers on every estimate/item write, so a write made through any
+    worker makes older entries unusable. The TTL bounds staleness for
+    anything the triggers do not see, the entry count bounds memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.enabled = bool(enabled) and self.max_entries > 0 and self.ttl_seconds > 0
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[int, float, Any]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._expired = 0
+        self._evictions = 0
+
+    async def generation(self, db: AsyncSession, organization_id: int) -> int:
+        """Current analytics generation; 0 until the organization's first write."""
+        if not self.enabled:
+            return 0
+        value = await db.scalar(
+            select(AnalyticsGeneration.generation).where(
+                AnalyticsGeneration.organization_id == organization_id
+            )
+        )
+        return int(value or 0)
+
+    def get(self, key: Hashable, generation: int) -> Any | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        entry_generation, expires_at, value = entry
+        if entry_generation != generation:
+            del self._entries[key]
+            self._stale += 1
+            self._misses += 1
+            return None
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._expired += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key: Hashable, generation: int, value: Any) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (generation, self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | float | bool]:
+        return {
+            "enabled": self.enabled,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "stale": self._stale,
+            "expired": self._expired,
+            "evictions": self._evictions,
+        }
+
+
+analytics_cache = AnalyticsCache(
+    max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS,
+    enabled=settings.ANALYTICS_CACHE_ENABLED,
+)
@@ -0,0 +1,523 @@
+# backend/app/services/analytics_engine.py
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from time import perf_counter
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import (
+    DateTime,
+    Float,
+    String,
+    and_,
+    case,
+    cast,
+    desc,
+    func,
+    literal_column,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import join
+
+from app.core.config import settings
+from app.core.database import AnalyticsSessionLocal
+from app.models.analytics_rollup import ROLLUP_ALL_CATEGORIES, AnalyticsDailyRollup
+from app.models.client import Client
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.schemas.analytics import GranularityEnum
+
+# Выручка позиции: маржа при учёте внутренних цен, иначе внешняя цена
+ITEM_REVENUE_EXPR = EstimateItem.quantity * case(
+    (
+        Estimate.use_internal_price,
+        EstimateItem.external_price - EstimateItem.internal_price,
+    ),
+    else_=EstimateItem.external_price,
+)
+# То же для сметы целиком — из итогов, сохранённых в самой смете
+ESTIMATE_REVENUE_EXPR = case(
+    (Estimate.use_internal_price, Estimate.margin),
+    else_=Estimate.total_external,
+)
+
+SECTION_SUMMARY = "summary"
+SECTION_MEDIAN = "median"
+SECTION_CLIENTS_COUNT = "clients_count"
+SECTION_TIMESERIES = "timeseries"
+SECTION_TOP_CLIENTS = "top_clients"
+SECTION_BY_RESPONSIBLE = "by_responsible"
+SECTION_TOP_SERVICES = "top_services"
+
+SOURCE_ROLLUPS = "rollups"
+SOURCE_RAW = "raw"
+
+# Метка замера для выполнения всех секций одним запросом
+TIMING_SINGLE_PASS = "single_pass"
+
+
+def _as_utc(value: date | datetime) -> datetime:
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@dataclass(frozen=True)
+class AnalyticsFilters:
+    """
+    Normalized analytics filters: statuses and lower-cased categories are
+    de-duplicated and sorted, so equal filter sets compare (and hash) equal.
+    """
+
+    organization_id: int
+    client_id: int | None = None
+    start_date: datetime | None = None
+    end_date: datetime | None = None
+    statuses: tuple[EstimateStatus, ...] = ()
+    vat_enabled: bool | None = None
+    categories: tuple[str, ...] = ()
+
+    @classmethod
+    def build(
+        cls,
+        organization_id: int,
+        *,
+        client_id: int | None = None,
+        start_date: date | datetime | None = None,
+        end_date: date | datetime | None = None,
+        status: Optional[Iterable[EstimateStatus]] = None,
+        vat_enabled: bool | None = None,
+        categories: Optional[Iterable[str]] = None,
+    ) -> "AnalyticsFilters":
+        return cls(
+            organization_id=organization_id,
+            client_id=client_id,
+            start_date=_as_utc(start_date) if start_date else None,
+            end_date=_as_utc(end_date) if end_date else None,
+            statuses=tuple(sorted(set(status or ()), key=lambda item: item.value)),
+            vat_enabled=vat_enabled,
+            categories=tuple(sorted({c.lower() for c in categories or ()})),
+        )
+
+    def estimate_conditions(self) -> list:
+        conditions = [Estimate.organization_id == self.organization_id]
+        if self.client_id is not None:
+            conditions.append(Estimate.client_id == self.client_id)
+        if self.start_date:
+            conditions.append(Estimate.date >= self.start_date)
+        if self.end_date:
+            conditions.append(Estimate.date <= self.end_date)
+        if self.statuses:
+            conditions.append(Estimate.status.in_(self.statuses))
+        if self.vat_enabled is not None:
+            conditions.append(Estimate.vat_enabled == self.vat_enabled)
+        return conditions
+
+    def rollup_days(self) -> tuple[date | None, date | None] | None:
+        """
+        Inclusive UTC day range covered by the date filters, or None when a
+        bound falls inside a day. The end bound is accepted from 23:59:59 on,
+        which is what the dashboard sends for "up to this day".
+        """
+        day_from = day_to = None
+        if self.start_date:
+            if self.start_date.time() != time.min:
+                return None
+            day_from = self.start_date.date()
+        if self.end_date:
+            if self.end_date.time() < time(23, 59, 59):
+                return None
+            day_to = self.end_date.date()
+        return day_from, day_to
+
+
+def rollups_cover(filters: AnalyticsFilters) -> bool:
+    """
+    Whether the daily rollups can answer these filters. Estimate counts are
+    kept per category, so they cannot be added up over several categories.
+    """
+    return (
+        settings.ANALYTICS_ROLLUPS_ENABLED
+        and filters.rollup_days() is not None
+        and len(filters.categories) <= 1
+        and ROLLUP_ALL_CATEGORIES not in filters.categories
+    )
+
+
+def _category_filters(categories: Optional[List[str]]) -> list:
+    if not categories:
+        return []
+    lowered = [c.lower() for c in categories]
+    return [func.lower(EstimateItem.category).in_(lowered)]
+
+
+def _revenue_source(category_filters: list):
+    """
+    Return (revenue expression, FROM clause, filters). Only a category filter
+    needs the per-item join; otherwise the stored estimate totals are summed.
+    Estimates without items are skipped either way, as the join used to do.
+    """
+    if category_filters:
+        return ITEM_REVENUE_EXPR, join(Estimate, EstimateItem, Estimate.items), category_filters
+    return ESTIMATE_REVENUE_EXPR, Estimate, [Estimate.items_count > 0]
+
+
+def _make_period_expr(granularity: GranularityEnum, column=None):
+    # Периоды по дням UTC, как в сводных таблицах, а не в TimeZone сессии
+    if column is None:
+        column = func.timezone("UTC", Estimate.date)
+    # для квартала используем специальный формат
+    if granularity == GranularityEnum.quarter:
+        return func.to_char(column, 'YYYY-"Q"Q').label("period")
+
+    fmt_map = {
+        GranularityEnum.day: "YYYY-MM-DD",
+        GranularityEnum.week: "IYYY-IW",
+        GranularityEnum.month: "YYYY-MM",
+        GranularityEnum.year: "YYYY",
+    }
+    fmt = fmt_map[granularity]
+    # date_trunc поддерживает все, кроме квартала
+    return func.to_char(func.date_trunc(granularity.value, column), fmt).label(
+        "period"
+    )
+
+
+def _estimates_cte(filters: list, category_filters: list, granularity: GranularityEnum):
+    """
+    One row per filtered estimate with its revenue; ``amount`` is NULL for
+    estimates that do not count towards revenue (no items, or no items of the
+    selected categories), so aggregates over it skip them.
+    """
+    revenue_expr, revenue_from, revenue_filters = _revenue_source(category_filters)
+    columns = [
+        Estimate.id.label("id"),
+        Estimate.client_id.label("client_id"),
+        Estimate.responsible.label("responsible"),
+        Estimate.use_internal_price.label("use_internal_price"),
+        _make_period_expr(granularity),
+    ]
+    if not category_filters:
+        amount = case((and_(*revenue_filters), revenue_expr), else_=null())
+        query = select(*columns, amount.label("amount")).where(*filters)
+    else:
+        per_estimate = (
+            select(
+                Estimate.id.label("estimate_id"),
+                func.sum(revenue_expr).label("amount"),
+            )
+            .select_from(revenue_from)
+            .where(*filters, *revenue_filters)
+            .group_by(Estimate.id)
+            .subquery("category_revenue")
+        )
+        query = (
+            select(*columns, per_estimate.c.amount)
+            .outerjoin(per_estimate, per_estimate.c.estimate_id == Estimate.id)
+            .where(*filters)
+        )
+    return query.cte("filtered_estimates")
+
+
+def _section(name: str, label=None, count=None, amount=None, aux=None):
+    # Одинаковый набор колонок у всех секций — чтобы их можно было склеить UNION ALL
+    return [
+        literal_column(f"'{name}'", String).label("section"),
+        cast(label if label is not None else null(), String).label("label"),
+        cast(count if count is not None else null(), Float).label("count"),
+        (func.coalesce(amount, 0.0) if amount is not None else cast(null(), Float)).label("amount"),
+        (aux if aux is not None else cast(null(), Float)).label("aux"),
+    ]
+
+
+def _raw_sections(est, category_filters: list, top_clients_limit: int | None) -> dict[str, Any]:
+    with_revenue = est.c.amount.is_not(None)
+    # С фильтром категорий сметы без подходящих позиций не считаются вовсе
+    estimates_count = func.count(est.c.amount) if category_filters else func.count()
+
+    sections = {
+        SECTION_SUMMARY: select(
+            *_section(
+                SECTION_SUMMARY,
+                None,
+                estimates_count,
+                func.sum(est.c.amount),
+                func.percentile_cont(0.5).within_group(est.c.amount.asc()),
+            )
+        ).select_from(est),
+        SECTION_TIMESERIES: select(
+            *_section(SECTION_TIMESERIES, est.c.period, amount=func.sum(est.c.amount))
+        )
+        .where(with_revenue)
+        .group_by(est.c.period),
+        SECTION_BY_RESPONSIBLE: select(
+            *_section(
+                SECTION_BY_RESPONSIBLE,
+                est.c.responsible,
+                func.count(),
+                func.sum(est.c.amount),
+            )
+        )
+        .where(with_revenue)
+        .group_by(est.c.responsible),
+    }
+    if top_clients_limit is not None:
+        sections[SECTION_CLIENTS_COUNT] = select(
+            *_section(SECTION_CLIENTS_COUNT, count=func.count(func.distinct(est.c.client_id)))
+        ).select_from(est)
+        sections[SECTION_TOP_CLIENTS] = (
+            select(*_section(SECTION_TOP_CLIENTS, Client.name, amount=func.sum(est.c.amount)))
+            .select_from(est.join(Client, Client.id == est.c.client_id))
+            .where(with_revenue)
+            .group_by(Client.name)
+            .order_by(desc("amount"))
+            .limit(top_clients_limit)
+        )
+    return sections
+
+
+def _rollup_sections(
+    filters: AnalyticsFilters,
+    granularity: GranularityEnum,
+    top_clients_limit: int | None,
+) -> dict[str, Any]:
+    rollup = AnalyticsDailyRollup
+    day_from, day_to = filters.rollup_days()
+    conditions = [rollup.organization_id == filters.organization_id]
+    if filters.client_id is not None:
+        conditions.append(rollup.client_id == filters.client_id)
+    if day_from:
+        conditions.append(rollup.day >= day_from)
+    if day_to:
+        conditions.append(rollup.day <= day_to)
+    if filters.statuses:
+        conditions.append(rollup.status.in_(filters.statuses))
+    if filters.vat_enabled is not None:
+        conditions.append(rollup.vat_enabled == filters.vat_enabled)
+
+    category = filters.categories[0] if filters.categories else ROLLUP_ALL_CATEGORIES
+    scoped = [*conditions, rollup.category == category]
+    priced = [*scoped, rollup.priced_estimates_count > 0]
+    period = _make_period_expr(granularity, cast(rollup.day, DateTime))
+    revenue = func.sum(rollup.revenue)
+
+    sections = {
+        SECTION_SUMMARY: select(
+            *_section(SECTION_SUMMARY, None, func.sum(rollup.estimates_count), revenue)
+        ).where(*scoped),
+        # Группировка по имени колонки: выражение с параметрами формата
+        # в GROUP BY не совпало бы с выражением в SELECT
+        SECTION_TIMESERIES: select(*_section(SECTION_TIMESERIES, period, amount=revenue))
+        .where(*priced)
+        .group_by("label"),
+        SECTION_BY_RESPONSIBLE: select(
+            *_section(
+                SECTION_BY_RESPONSIBLE,
+                rollup.responsible,
+                func.sum(rollup.priced_estimates_count),
+                revenue,
+            )
+        )
+        .where(*priced)
+        .group_by(rollup.responsible),
+    }
+    if top_clients_limit is not None:
+        # Клиенты считаются по всем сметам, независимо от фильтра категорий
+        sections[SECTION_CLIENTS_COUNT] = select(
+            *_section(SECTION_CLIENTS_COUNT, count=func.count(func.distinct(rollup.client_id)))
+        ).where(*conditions, rollup.category == ROLLUP_ALL_CATEGORIES)
+        sections[SECTION_TOP_CLIENTS] = (
+            select(*_section(SECTION_TOP_CLIENTS, Client.name, amount=revenue))
+            .select_from(rollup)
+            .join(Client, Client.id == rollup.client_id)
+            .where(*priced)
+            .group_by(Client.name)
+            .order_by(desc("amount"))
+            .limit(top_clients_limit)
+        )
+    return sections
+
+
+def analytics_sections(
+    filters: AnalyticsFilters,
+    granularity: GranularityEnum,
+    *,
+    top_clients_limit: int | None = 10,
+    top_services_limit: int = 10,
+    use_rollups: bool | None = None,
+) -> dict[str, Any]:
+    """
+    Every analytics section as a SELECT returning (section, label, count,
+    amount, aux) rows. Totals, time series and rankings come from the daily
+    rollups when they cover the filters; the median and the top services need
+    individual estimates and items, so they always read the filtered-estimates CTE.
+    """
+    category_filters = _category_filters(filters.categories)
+    est = _estimates_cte(filters.estimate_conditions(), category_filters, granularity)
+    if use_rollups is None:
+        use_rollups = rollups_cover(filters)
+
+    if use_rollups:
+        sections = _rollup_sections(filters, granularity, top_clients_limit)
+        sections[SECTION_MEDIAN] = select(
+            *_section(SECTION_MEDIAN, aux=func.percentile_cont(0.5).within_group(est.c.amount.asc()))
+        ).select_from(est)
+    else:
+        sections = _raw_sections(est, category_filters, top_clients_limit)
+
+    service_revenue = func.sum(
+        EstimateItem.quantity
+        * case(
+            (est.c.use_internal_price, EstimateItem.external_price - EstimateItem.internal_price),
+            else_=EstimateItem.external_price,
+        )
+    )
+    sections[SECTION_TOP_SERVICES] = (
+        select(*_section(SECTION_TOP_SERVICES, EstimateItem.name, amount=service_revenue))
+        .select_from(est.join(EstimateItem, EstimateItem.estimate_id == est.c.id))
+        .where(*category_filters)
+        .group_by(EstimateItem.name)
+        .order_by(desc("amount"))
+        .limit(top_services_limit)
+    )
+    return sections
+
+
+def single_pass_query(sections: dict[str, Any]):
+    """All sections in one statement: the CTE is planned once, rows are tagged by section."""
+    return union_all(*(select(query.subquery()) for query in sections.values()))
+
+
+def collect_sections(rows) -> dict[str, Any]:
+    result: dict[str, Any] = {
+        "total_estimates": 0,
+        "total_amount": 0.0,
+        "median_amount": 0.0,
+        "clients_count": 0,
+        SECTION_TIMESERIES: [],
+        SECTION_TOP_CLIENTS: [],
+        SECTION_BY_RESPONSIBLE: [],
+        SECTION_TOP_SERVICES: [],
+    }
+    for row in rows:
+        if row.section == SECTION_SUMMARY:
+            result["total_estimates"] = int(row.count or 0)
+            result["total_amount"] = float(row.amount or 0.0)
+            if row.aux is not None:
+                result["median_amount"] = float(row.aux)
+        elif row.section == SECTION_MEDIAN:
+            result["median_amount"] = float(row.aux or 0.0)
+        elif row.section == SECTION_CLIENTS_COUNT:
+            result["clients_count"] = int(row.count or 0)
+        elif row.section == SECTION_BY_RESPONSIBLE:
+            result[row.section].append((row.label, int(row.count), float(row.amount)))
+        else:
+            result[row.section].append((row.label, float(row.amount)))
+
+    # UNION ALL не сохраняет порядок веток
+    result[SECTION_TIMESERIES].sort(key=lambda row: row[0])
+    result[SECTION_TOP_CLIENTS].sort(key=lambda row: row[1], reverse=True)
+    result[SECTION_TOP_SERVICES].sort(key=lambda row: row[1], reverse=True)
+    return result
+
+
+class SectionLatency:
+    """Running latency counters per analytics section, for /api/health/stats."""
+
+    def __init__(self):
+        self._sections: dict[str, dict[str, float]] = {}
+
+    def record(self, name: str, elapsed_ms: float) -> None:
+        counters = self._sections.setdefault(
+            name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        )
+        counters["count"] += 1
+        counters["total_ms"] += elapsed_ms
+        counters["max_ms"] = max(counters["max_ms"], elapsed_ms)
+        counters["last_ms"] = elapsed_ms
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "count": int(counters["count"]),
+                "avg_ms": round(counters["total_ms"] / counters["count"], 2),
+                "max_ms": round(counters["max_ms"], 2),
+                "last_ms": round(counters["last_ms"], 2),
+            }
+            for name, counters in sorted(self._sections.items())
+        }
+
+
+section_latency = SectionLatency()
+
+
+def _elapsed_ms(started: float) -> float:
+    return (perf_counter() - started) * 1000
+
+
+async def _execute_single_pass(db: AsyncSession, sections: dict[str, Any]):
+    started = perf_counter()
+    result = await db.execute(single_pass_query(sections))
+    rows = result.all()
+    timings = {TIMING_SINGLE_PASS: _elapsed_ms(started)}
+    return rows, timings
+
+
+async def execute_sections_concurrently(sections: dict[str, Any], limit: int):
+    """
+    Each section as its own statement on a connection of the dedicated
+    section pool, at most ``limit`` at a time. Sections read separate
+    snapshots, so a write committed mid-request may be visible to some of
+    them only.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+    timings: dict[str, float] = {}
+
+    async def run(name: str, query) -> list:
+        async with semaphore:
+            async with AnalyticsSessionLocal() as session:
+                started = perf_counter()
+                result = await session.execute(query)
+                rows = result.all()
+                timings[name] = _elapsed_ms(started)
+                return rows
+
+    chunks = await asyncio.gather(*(run(name, query) for name, query in sections.items()))
+    return [row for rows in chunks for row in rows], timings
+
+
+async def compute_analytics(
+    db: AsyncSession,
+    filters: AnalyticsFilters,
+    granularity: GranularityEnum,
+    *,
+    top_clients_limit: int | None = 10,
+    top_services_limit: int = 10,
+) -> dict[str, Any]:
+    use_rollups = rollups_cover(filters)
+    sections = analytics_sections(
+        filters,
+        granularity,
+        top_clients_limit=top_clients_limit,
+        top_services_limit=top_services_limit,
+        use_rollups=use_rollups,
+    )
+    if settings.ANALYTICS_CONCURRENT_SECTIONS and len(sections) > 1:
+        rows, timings = await execute_sections_concurrently(
+            sections, settings.ANALYTICS_SECTION_CONCURRENCY
+        )
+    else:
+        rows, timings = await _execute_single_pass(db, sections)
+    for name, elapsed_ms in timings.items():
+        section_latency.record(name, elapsed_ms)
+
+    data = collect_sections(rows)
+    data["source"] = SOURCE_ROLLUPS if use_rollups else SOURCE_RAW
+    data["timings"] = {name: round(elapsed_ms, 2) for name, elapsed_ms in timings.items()}
+    return data
@@ -0,0 +1,306 @@
+# backend/app/services/analytics_reports.py
+
+import asyncio
+import csv
+import io
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.estimate import EstimateStatus
+from app.schemas.analytics import (
+    GlobalAnalytics,
+    GranularityEnum,
+    ResponsibleMetric,
+    ServiceMetric,
+    TimeSeriesItem,
+)
+from app.services.analytics_cache import analytics_cache
+from app.services.analytics_engine import (
+    SECTION_BY_RESPONSIBLE,
+    SECTION_TIMESERIES,
+    SECTION_TOP_CLIENTS,
+    SECTION_TOP_SERVICES,
+    AnalyticsFilters,
+    compute_analytics,
+)
+from app.utils.analytics_excel import generate_analytics_excel
+from app.utils.pdf import pdf_render_pool
+
+
+def compute_growth(
+    ts: List[TimeSeriesItem],
+    granularity: GranularityEnum,
+) -> tuple[float | None, float | None]:
+    # без двух точек роста не посчитать
+    if len(ts) < 2:
+        return None, None
+
+    last = ts[-1]
+    lookup = {item.period: item.value for item in ts}
+
+    # разбор последнего периода и вычисление ключей “предыдущего” MoM и YoY
+    if granularity == GranularityEnum.day:
+        # формат YYYY-MM-DD
+        dt = datetime.strptime(last.period, "%Y-%m-%d")
+        prev_dt = dt - relativedelta(days=1)
+        prev_key = prev_dt.strftime("%Y-%m-%d")
+        yoy_dt = dt - relativedelta(years=1)
+        yoy_key = yoy_dt.strftime("%Y-%m-%d")
+
+    elif granularity == GranularityEnum.week:
+        # формат IYYY-IW, например "2025-05" (ISO-год-неделя)
+        year_str, week_str = last.period.split("-")
+        iso_year, iso_week = int(year_str), int(week_str)
+        # понедельник той недели
+        dt = datetime.fromisocalendar(iso_year, iso_week, 1)
+        prev_dt = dt - relativedelta(weeks=1)
+        py_year, py_week, _ = prev_dt.isocalendar()
+        prev_key = f"{py_year}-{py_week:02d}"
+        yoy_dt = dt - relativedelta(years=1)
+        yy_year, yy_week, _ = yoy_dt.isocalendar()
+        yoy_key = f"{yy_year}-{yy_week:02d}"
+
+    elif granularity == GranularityEnum.month:
+        # формат YYYY-MM
+        dt = datetime.strptime(last.period, "%Y-%m")
+        prev_dt = dt - relativedelta(months=1)
+        prev_key = prev_dt.strftime("%Y-%m")
+        yoy_dt = dt - relativedelta(years=1)
+        yoy_key = yoy_dt.strftime("%Y-%m")
+
+    elif granularity == GranularityEnum.quarter:
+        # формат YYYY-Qn, например "2025-Q2"
+        year_str, q_str = last.period.split("-Q")
+        year, quarter = int(year_str), int(q_str)
+        # первая дата квартала
+        month = (quarter - 1) * 3 + 1
+        dt = datetime(year, month, 1)
+        prev_dt = dt - relativedelta(months=3)
+        py_year = prev_dt.year
+        py_quarter = (prev_dt.month - 1) // 3 + 1
+        prev_key = f"{py_year}-Q{py_quarter}"
+        yoy_dt = dt - relativedelta(years=1)
+        yy_year = yoy_dt.year
+        # тот же квартал год назад
+        yoy_key = f"{yy_year}-Q{quarter}"
+
+    elif granularity == GranularityEnum.year:
+        # формат YYYY
+        dt = datetime.strptime(last.period, "%Y")
+        prev_dt = dt - relativedelta(years=1)
+        prev_key = prev_dt.strftime("%Y")
+        # для YoY та же дата
+        yoy_key = prev_key
+
+    else:
+        return None, None
+
+    prev_val = lookup.get(prev_key)
+    yoy_val = lookup.get(yoy_key)
+
+    mom = ((last.value - prev_val) / prev_val * 100) if prev_val else None
+    yoy = ((last.value - yoy_val) / yoy_val * 100) if yoy_val else None
+
+    return mom, yoy
+
+
+async def build_global_analytics(
+    db: AsyncSession,
+    organization_id: int,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    status: Optional[List[EstimateStatus]] = None,
+    vat_enabled: Optional[bool] = None,
+    granularity: GranularityEnum = GranularityEnum.month,
+    categories: Optional[List[str]] = None,
+) -> GlobalAnalytics:
+    # общий фильтр
+    filters = AnalyticsFilters.build(
+        organization_id,
+        start_date=start_date,
+        end_date=end_date,
+        status=status,
+        vat_enabled=vat_enabled,
+        categories=categories,
+    )
+    generation = await analytics_cache.generation(db, organization_id)
+    cache_key = ("global", filters, granularity)
+    cached = analytics_cache.get(cache_key, generation)
+    if cached is not None:
+        return cached
+
+    # все секции — одним запросом: из дневных агрегатов, если фильтры позволяют,
+    # иначе поверх общего CTE отфильтрованных смет
+    data = await compute_analytics(db, filters, granularity)
+    total_estimates = data["total_estimates"]
+    if total_estimates == 0:
+        raise HTTPException(404, "Смет по данным фильтрам не найдено")
+
+    total_amount = data["total_amount"]
+    average_amount = total_amount / total_estimates if total_estimates else 0.0
+    median_amount = data["median_amount"]
+
+    timeseries = [
+        TimeSeriesItem(period=period, value=value)
+        for period, value in data[SECTION_TIMESERIES]
+    ]
+    mom, yoy = compute_growth(timeseries, granularity)
+
+    top_clients = [
+        ServiceMetric(name=name, total_amount=amount)
+        for name, amount in data[SECTION_TOP_CLIENTS]
+    ]
+    by_responsible = [
+        ResponsibleMetric(name=name, estimates_count=count, total_amount=amount)
+        for name, count, amount in data[SECTION_BY_RESPONSIBLE]
+    ]
+    top_services = [
+        ServiceMetric(name=name, total_amount=amount)
+        for name, amount in data[SECTION_TOP_SERVICES]
+    ]
+
+    clients_count = data["clients_count"]
+    arpu = total_amount / clients_count if clients_count else 0
+
+    result = GlobalAnalytics(
+        total_estimates=total_estimates,
+        total_amount=total_amount,
+        average_amount=average_amount,
+        timeseries=timeseries,
+        top_clients=top_clients,
+        by_responsible=by_responsible,
+        top_services=top_services,
+        granularity=granularity,
+        arpu=arpu,
+        median_amount=median_amount,
+        mom_growth=mom,
+        yoy_growth=yoy,
+    )
+    analytics_cache.put(cache_key, generation, result)
+    return result
+
+
+ANALYTICS_EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+ANALYTICS_EXPORT_FILENAMES = {
+    "csv": "analytics.csv",
+    "excel": "analytics.xlsx",
+    "pdf": "analytics.pdf",
+}
+
+
+def _render_analytics_csv(ga: GlobalAnalytics) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+
+    # -- ключевые метрики --
+    w.writerow(["Метрика", "Значение"])
+    w.writerow(["Всего смет", ga.total_estimates])
+    w.writerow(["Общая сумма", ga.total_amount])
+    w.writerow(["Средняя сумма", ga.average_amount])
+    w.writerow(["Медиана по сметам", ga.median_amount])
+    w.writerow(["ARPU", ga.arpu])
+    w.writerow(["MoM рост (%)", ga.mom_growth or 0])
+    w.writerow(["YoY рост (%)", ga.yoy_growth or 0])
+    w.writerow([])
+
+    # -- динамика --
+    w.writerow(["Период", "Сумма"])
+    for row in ga.timeseries:
+        w.writerow([row.period, row.value])
+    w.writerow([])
+
+    # -- топ-10 клиентов --
+    w.writerow(["Top-10 клиентов", "Выручка"])
+    for cli in ga.top_clients:
+        w.writerow([cli.name, cli.total_amount])
+    w.writerow([])
+
+    # -- разбивка по ответственным --
+    w.writerow(["Ответственный", "Число смет", "Выручка"])
+    for resp in ga.by_responsible:
+        w.writerow([resp.name, resp.estimates_count, resp.total_amount])
+    w.writerow([])
+
+    # -- топ-10 услуг --
+    w.writerow(["Top-10 услуг", "Выручка"])
+    for srv in ga.top_services:
+        w.writerow([srv.name, srv.total_amount])
+
+    return buf.getvalue()
+
+
+def _render_analytics_html(ga: GlobalAnalytics, granularity: GranularityEnum) -> str:
+    html = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        "<style>table{border-collapse:collapse;}td,th{border:1px solid #333;padding:4px;}</style>",
+        f"<title>Аналитика {granularity.value}</title></head><body>",
+        f"<h1>Глобальная аналитика ({granularity.value})</h1>",
+        "<h2>Ключевые метрики</h2><ul>",
+        f"<li>Всего смет: {ga.total_estimates}</li>",
+        f"<li>Общая сумма: {ga.total_amount}</li>",
+        f"<li>Средняя сумма: {ga.average_amount}</li>",
+        f"<li>Медиана: {ga.median_amount}</li>",
+        f"<li>ARPU: {ga.arpu}</li>",
+        f"<li>MoM рост: {ga.mom_growth or 0:.2f}%</li>",
+        f"<li>YoY рост: {ga.yoy_growth or 0:.2f}%</li>",
+        "</ul>",
+        "<h2>Динамика по периодам</h2>",
+        "<table><tr><th>Период</th><th>Сумма</th></tr>",
+    ]
+    for row in ga.timeseries:
+        html.append(f"<tr><td>{row.period}</td><td>{row.value}</td></tr>")
+    html.append("</table>")
+
+    html.append("<h2>Top-10 клиентов</h2>")
+    html.append("<table><tr><th>Клиент</th><th>Выручка</th></tr>")
+    for cli in ga.top_clients:
+        html.append(f"<tr><td>{cli.name}</td><td>{cli.total_amount}</td></tr>")
+    html.append("</table>")
+
+    html.append("<h2>По ответственным</h2>")
+    html.append(
+        "<table><tr><th>Ответственный</th><th>Число смет</th><th>Выручка</th></tr>"
+    )
+    for resp in ga.by_responsible:
+        html.append(
+            f"<tr><td>{resp.name}</td><td>{resp.estimates_count}</td><td>{resp.total_amount}</td></tr>"
+        )
+    html.append("</table>")
+
+    html.append("<h2>Top-10 услуг</h2>")
+    html.append("<table><tr><th>Услуга</th><th>Выручка</th></tr>")
+    for srv in ga.top_services:
+        html.append(f"<tr><td>{srv.name}</td><td>{srv.total_amount}</td></tr>")
+    html.append("</table>")
+
+    html.append("</body></html>")
+    return "\n".join(html)
+
+
+async def build_analytics_export(
+    format: Literal["csv", "pdf", "excel"],
+    ga: GlobalAnalytics,
+    granularity: GranularityEnum,
+) -> bytes:
+    if format == "csv":
+        return _render_analytics_csv(ga).encode("utf-8")
+
+    if format == "excel":
+        excel_file = await asyncio.to_thread(generate_analytics_excel, ga)
+        return excel_file.getvalue()
+
+    # wkhtmltopdf: HTML → PDF через общий пул рендереров
+    try:
+        return await pdf_render_pool.render(_render_analytics_html(ga, granularity))
+    except (OSError, BrokenProcessPool) as exc:
+        raise HTTPException(500, detail=f"PDF generation failed: {exc}")
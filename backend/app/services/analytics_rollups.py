@@ -0,0 +1,53 @@
+# backend/app/services/analytics_rollups.py
+
+from datetime import date
+
+from sqlalchemy import Date, cast, func, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analytics_rollup import AnalyticsDailyRollup
+from app.models.estimate import Estimate
+
+# Пока параметр включён в транзакции, триггеры не пересчитывают агрегаты
+ROLLUPS_DEFERRED_SETTING = "analytics.rollups_deferred"
+
+
+async def defer_rollup_refresh(db: AsyncSession) -> None:
+    """
+    Switch off trigger refreshes until the end of the current transaction,
+    for bulk loads; call rebuild_organization_rollups before committing.
+    """
+    await db.execute(select(func.set_config(ROLLUPS_DEFERRED_SETTING, "on", True)))
+
+
+async def rebuild_organization_rollups(db: AsyncSession, organization_id: int) -> None:
+    """Recompute every day of an organization in one statement, without day locks."""
+    await db.execute(
+        select(func.refresh_analytics_daily_rollups(organization_id, None, None))
+    )
+
+
+async def organization_rollup_days(db: AsyncSession, organization_id: int) -> list[date]:
+    """Days that have estimates or (possibly stale) rollup rows."""
+    estimate_days = (
+        select(cast(func.timezone("UTC", Estimate.date), Date).label("day"))
+        .where(Estimate.organization_id == organization_id, Estimate.date.is_not(None))
+    )
+    rollup_days = select(AnalyticsDailyRollup.day).where(
+        AnalyticsDailyRollup.organization_id == organization_id
+    )
+    days = union(estimate_days, rollup_days).subquery()
+    result = await db.execute(select(days.c.day).order_by(days.c.day))
+    return list(result.scalars().all())
+
+
+async def refresh_rollup_days(db: AsyncSession, organization_id: int, days: list[date]) -> None:
+    """
+    Recompute the given days the same way the triggers do, holding the
+    per-day locks, so it is safe next to concurrent estimate writes.
+    """
+    if not days:
+        return
+    await db.execute(
+        select(func.analytics_rollups_touch([organization_id] * len(days), days))
+    )
@@ -2,6 +2,7 @@ import hashlib
 import json
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from time import perf_counter
 from typing import Any, Sequence
 
 from fastapi import Request
@@ -9,10 +10,16 @@ from fastapi.encoders import jsonable_encoder
 from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.metrics import registry
 from app.models.audit_ledger import AuditLedgerEntry
 
 GENESIS_HASH = "0" * 64
 
+AUDIT_APPEND_SECONDS = registry.histogram(
+    "audit_ledger_append_duration_seconds",
+    "Audit ledger append time, waiting for the ledger lock included.",
+)
+
 
 @dataclass
 class AuditChainVerification:
@@ -109,6 +116,7 @@ async def append_audit_ledger_entry(
     details: Any = None,
     request: Request | None = None,
 ) -> AuditLedgerEntry:
+    started = perf_counter()
     await _lock_ledger_for_append(db)
 
     last_entry_result = await db.execute(
@@ -151,6 +159,7 @@ async def append_audit_ledger_entry(
     )
     db.add(entry)
     await db.flush()
+    AUDIT_APPEND_SECONDS.observe(perf_counter() - started)
     return entry
 
 
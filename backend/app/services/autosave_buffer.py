@@ -0,0 +1,287 @@
+# backend/app/services/autosave_buffer.py
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.autosave_draft import EstimateAutosaveDraft
+from app.models.client import Client
+from app.models.estimate import Estimate
+from app.models.estimate_approval import EstimateApprovalWorkflow
+from app.models.item import EstimateItem
+from app.schemas.estimate import EstimateAutosave
+from app.services.approval_workflow import WORKFLOW_STATUS_IN_REVIEW
+from app.services.estimate_totals import apply_estimate_totals
+from app.utils.pdf import invalidate_estimate_pdfs
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL_SECONDS = 5
+SWEEP_BATCH_SIZE = 100
+
+AUTOSAVE_FIELDS = (
+    "name",
+    "responsible",
+    "event_datetime",
+    "event_place",
+    "status",
+    "vat_enabled",
+    "vat_rate",
+    "use_internal_price",
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def apply_autosave_patch(db: AsyncSession, estimate: Estimate, data: dict) -> None:
+    """Write an autosave patch (EstimateAutosave fields that were set) into the estimate."""
+    if "client_id" in data:
+        client_id = data["client_id"]
+        if client_id is not None:
+            client = await db.get(Client, client_id)
+            if client is None or client.organization_id != estimate.organization_id:
+                # Клиента удалили, пока правка ждала в буфере
+                client_id = estimate.client_id
+        estimate.client_id = client_id
+
+    for field in AUTOSAVE_FIELDS:
+        if field in data:
+            setattr(estimate, field, data[field])
+
+    if "items" in data:
+        await db.execute(delete(EstimateItem).where(EstimateItem.estimate_id == estimate.id))
+        for item in data["items"] or []:
+            item_data = item if isinstance(item, dict) else item.dict()
+            db.add(
+                EstimateItem(
+                    estimate_id=estimate.id,
+                    name=item_data.get("name", ""),
+                    description=item_data.get("description", ""),
+                    quantity=item_data.get("quantity", 0),
+                    unit=item_data.get("unit", "шт"),
+                    internal_price=item_data.get("internal_price", 0),
+                    external_price=item_data.get("external_price", 0),
+                    category=item_data.get("category", ""),
+                )
+            )
+    # Без items пересчитываются только НДС и маржа от сохранённых сумм
+    apply_estimate_totals(estimate, (data["items"] or []) if "items" in data else None)
+
+
+async def stage_autosave_patch(
+    db: AsyncSession,
+    estimate: Estimate,
+    user_id: int,
+    payload: EstimateAutosave,
+) -> tuple[int, datetime]:
+    """
+    Merge the patch into the estimate's pending draft with a single upsert.
+    JSONB ``||`` keeps the latest value per field; ``items`` is always sent
+    as the full list, so the latest list wins as a whole.
+    Returns the number of writes merged so far and the first write time.
+    """
+    now = _utcnow()
+    stmt = insert(EstimateAutosaveDraft).values(
+        estimate_id=estimate.id,
+        organization_id=estimate.organization_id,
+        user_id=user_id,
+        patch=payload.model_dump(mode="json", exclude_unset=True),
+        writes=1,
+        first_write_at=now,
+        last_write_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EstimateAutosaveDraft.estimate_id],
+        set_={
+            "patch": EstimateAutosaveDraft.patch.op("||")(stmt.excluded.patch),
+            "writes": EstimateAutosaveDraft.writes + 1,
+            "user_id": stmt.excluded.user_id,
+            "last_write_at": stmt.excluded.last_write_at,
+        },
+    ).returning(EstimateAutosaveDraft.writes, EstimateAutosaveDraft.first_write_at)
+    row = (await db.execute(stmt)).one()
+    return row.writes, row.first_write_at
+
+
+def autosave_flush_due(writes: int, first_write_at: datetime) -> bool:
+    max_writes = max(1, settings.AUTOSAVE_FLUSH_AFTER_WRITES)
+    max_age = timedelta(seconds=max(0, settings.AUTOSAVE_FLUSH_AFTER_SECONDS))
+    return writes >= max_writes or _utcnow() - first_write_at >= max_age
+
+
+async def _claim_drafts(db: AsyncSession, *criteria) -> list:
+    # DELETE ... RETURNING атомарно забирает черновик: из нескольких
+    # воркеров применит его ровно один
+    result = await db.execute(
+        delete(EstimateAutosaveDraft)
+        .where(*criteria)
+        .returning(
+            EstimateAutosaveDraft.estimate_id,
+            EstimateAutosaveDraft.patch,
+            EstimateAutosaveDraft.writes,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def _apply_drafts(db: AsyncSession, drafts: list, reason: str) -> int:
+    if not drafts:
+        return 0
+    result = await db.execute(
+        select(Estimate, EstimateApprovalWorkflow.status)
+        .outerjoin(
+            EstimateApprovalWorkflow,
+            EstimateApprovalWorkflow.estimate_id == Estimate.id,
+        )
+        .where(Estimate.id.in_([draft.estimate_id for draft in drafts]))
+    )
+    estimates = {estimate.id: (estimate, status) for estimate, status in result.all()}
+    flushed, discarded = [], []
+    for draft in drafts:
+        estimate, workflow_status = estimates.get(draft.estimate_id, (None, None))
+        if workflow_status == WORKFLOW_STATUS_IN_REVIEW:
+            # Смета ушла на согласование: правки в обход проверки не применяются
+            logger.warning(
+                "Autosave draft of estimate %s discarded: approval is in progress",
+                draft.estimate_id,
+            )
+            discarded.append(draft.writes)
+            continue
+        flushed.append(draft.writes)
+        if estimate is None:
+            continue
+        data = EstimateAutosave.model_validate(draft.patch).model_dump(exclude_unset=True)
+        await apply_autosave_patch(db, estimate, data)
+        invalidate_estimate_pdfs(estimate.id)
+    if discarded:
+        autosave_coalescer.record_discard(discarded)
+    autosave_coalescer.record_flush(reason, flushed)
+    return len(flushed)
+
+
+async def flush_estimate_autosave(
+    db: AsyncSession,
+    estimate_id: int,
+    *,
+    reason: str = "read",
+) -> bool:
+    """Apply the pending draft of one estimate, if any. The caller commits."""
+    drafts = await _claim_drafts(db, EstimateAutosaveDraft.estimate_id == estimate_id)
+    return bool(await _apply_drafts(db, drafts, reason))
+
+
+async def flush_organization_autosaves(
+    db: AsyncSession,
+    organization_id: int,
+    *,
+    reason: str = "read",
+) -> int:
+    """Apply all pending drafts of a workspace before it is listed or exported."""
+    drafts = await _claim_drafts(
+        db, EstimateAutosaveDraft.organization_id == organization_id
+    )
+    return await _apply_drafts(db, drafts, reason)
+
+
+async def discard_estimate_autosave(db: AsyncSession, estimate_id: int) -> None:
+    """An explicit save or restore supersedes whatever autosave still holds."""
+    drafts = await _claim_drafts(db, EstimateAutosaveDraft.estimate_id == estimate_id)
+    if drafts:
+        autosave_coalescer.record_discard([draft.writes for draft in drafts])
+
+
+async def flush_due_autosaves(db: AsyncSession, *, limit: int = SWEEP_BATCH_SIZE) -> int:
+    cutoff = _utcnow() - timedelta(seconds=max(0, settings.AUTOSAVE_FLUSH_AFTER_SECONDS))
+    due = (
+        select(EstimateAutosaveDraft.estimate_id)
+        .where(EstimateAutosaveDraft.first_write_at <= cutoff)
+        .order_by(EstimateAutosaveDraft.first_write_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    drafts = await _claim_drafts(db, EstimateAutosaveDraft.estimate_id.in_(due))
+    return await _apply_drafts(db, drafts, "sweep")
+
+
+class AutosaveCoalescer:
+    """
+    Counters for autosave coalescing plus the sweeper that flushes drafts
+    nobody touched for ``flush_after_seconds``. Drafts live in the database,
+    so any backend process may stage, flush or sweep them.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._received = 0
+        self._staged = 0
+        self._direct = 0
+        self._flushes: Counter[str] = Counter()
+        self._flushed_writes = 0
+        self._discarded_writes = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep_loop(), name="autosave-sweeper")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    flushed = await flush_due_autosaves(db)
+                    await db.commit()
+                if flushed >= SWEEP_BATCH_SIZE:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Autosave sweep failed")
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+    def record_write(self, *, staged: bool) -> None:
+        self._received += 1
+        if staged:
+            self._staged += 1
+        else:
+            self._direct += 1
+
+    def record_flush(self, reason: str, writes: list[int]) -> None:
+        self._flushes[reason] += len(writes)
+        self._flushed_writes += sum(writes)
+
+    def record_discard(self, writes: list[int]) -> None:
+        self._discarded_writes += sum(writes)
+
+    def stats(self) -> dict:
+        flushes = sum(self._flushes.values())
+        return {
+            "enabled": bool(settings.AUTOSAVE_COALESCE_ENABLED),
+            "sweeper_running": self._task is not None,
+            "received": self._received,
+            "staged": self._staged,
+            "direct": self._direct,
+            "flushes": flushes,
+            "flushes_by_reason": dict(self._flushes),
+            "flushed_writes": self._flushed_writes,
+            "discarded_writes": self._discarded_writes,
+            # Записи, которые не стоили отдельной транзакции над сметой
+            "absorbed_writes": self._flushed_writes - flushes + self._discarded_writes,
+        }
+
+
+autosave_coalescer = AutosaveCoalescer()
@@ -0,0 +1,40 @@
+from typing import Any, Iterable, Mapping
+
+from app.models.estimate import Estimate
+
+
+def _item_value(item: Any, field: str) -> float:
+    if isinstance(item, Mapping):
+        value = item.get(field)
+    else:
+        value = getattr(item, field, None)
+    return float(value or 0)
+
+
+def apply_estimate_totals(estimate: Estimate, items: Iterable[Any] | None = None) -> None:
+    """
+    Refresh the stored totals of an estimate.
+
+    ``items`` may be ORM items, pydantic payload items or plain dicts; pass
+    them whenever the item set changed. Without ``items`` only the values
+    derived from the stored sums (margin, VAT) are recomputed, which is enough
+    when just the VAT or internal-price flags changed.
+    """
+    if items is not None:
+        items_count = 0
+        total_internal = 0.0
+        total_external = 0.0
+        for item in items:
+            quantity = _item_value(item, "quantity")
+            total_internal += quantity * _item_value(item, "internal_price")
+            total_external += quantity * _item_value(item, "external_price")
+            items_count += 1
+        estimate.items_count = items_count
+        estimate.total_internal = total_internal
+        estimate.total_external = total_external
+
+    total_external = float(estimate.total_external or 0)
+    total_internal = float(estimate.total_internal or 0)
+    estimate.margin = total_external - total_internal if estimate.use_internal_price else 0.0
+    vat = total_external * ((estimate.vat_rate or 0) / 100) if estimate.vat_enabled else 0.0
+    estimate.total_with_vat = total_external + vat
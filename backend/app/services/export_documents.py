@@ -0,0 +1,178 @@
+# backend/app/services/export_documents.py
+
+import asyncio
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.estimate import Estimate, EstimateStatus
+from app.services.autosave_buffer import flush_estimate_autosave
+from app.utils.excel import generate_excel
+from app.utils.pdf import render_pdf_async
+
+
+def ensure_financial_documents_allowed(estimate: Estimate):
+    allowed_statuses = {EstimateStatus.APPROVED, EstimateStatus.PAID}
+    if estimate.status not in allowed_statuses:
+        raise HTTPException(
+            status_code=409,
+            detail="Счет и акт доступны только для согласованных или оплаченных смет",
+        )
+
+
+def build_financial_document_number(
+    prefix: str,
+    estimate_id: int,
+    issued_at: datetime,
+) -> str:
+    return f"{prefix}-{issued_at.strftime('%Y%m%d')}-{estimate_id:06d}"
+
+
+def calculate_estimate_totals(estimate: Estimate) -> dict[str, float]:
+    total_internal = (
+        sum(
+            (item.internal_price or 0) * (item.quantity or 0) for item in estimate.items
+        )
+        if estimate.use_internal_price
+        else 0
+    )
+    total_external = sum(
+        (item.external_price or 0) * (item.quantity or 0) for item in estimate.items
+    )
+    total_diff = total_external - total_internal if estimate.use_internal_price else 0
+    vat = total_external * (estimate.vat_rate / 100) if estimate.vat_enabled else 0
+    total_with_vat = total_external + vat
+    return {
+        "total_internal": total_internal,
+        "total_external": total_external,
+        "total_diff": total_diff,
+        "vat": vat,
+        "total_with_vat": total_with_vat,
+    }
+
+
+async def load_estimate_with_relations(
+    db: AsyncSession,
+    estimate_id: int,
+    organization_id: int,
+) -> Estimate:
+    await flush_estimate_autosave(db, estimate_id, reason="export")
+    result = await db.execute(
+        select(Estimate)
+        .options(
+            selectinload(Estimate.items),
+            selectinload(Estimate.client),
+            selectinload(Estimate.notes),
+            selectinload(Estimate.user),
+        )
+        .where(Estimate.id == estimate_id)
+    )
+    estimate = result.scalar_one_or_none()
+    if not estimate or estimate.organization_id != organization_id:
+        raise HTTPException(status_code=404, detail="Смета не найдена или нет доступа")
+    return estimate
+
+
+async def build_estimate_pdf_document(
+    db: AsyncSession,
+    estimate_id: int,
+    organization_id: int,
+) -> tuple[bytes, str, dict]:
+    estimate = await load_estimate_with_relations(db, estimate_id, organization_id)
+    totals = calculate_estimate_totals(estimate)
+
+    pdf_bytes = await render_pdf_async(
+        "estimate_pdf.html",
+        {
+            "estimate": estimate,
+            **totals,
+        },
+        estimate_id=estimate.id,
+    )
+    return pdf_bytes, f"estimate_{estimate.id}.pdf", {"estimate_name": estimate.name}
+
+
+async def build_estimate_invoice_document(
+    db: AsyncSession,
+    estimate_id: int,
+    organization_id: int,
+) -> tuple[bytes, str, dict]:
+    estimate = await load_estimate_with_relations(db, estimate_id, organization_id)
+    ensure_financial_documents_allowed(estimate)
+    totals = calculate_estimate_totals(estimate)
+    issued_at = datetime.now(timezone.utc)
+    invoice_number = build_financial_document_number("INV", estimate.id, issued_at)
+
+    pdf_bytes = await render_pdf_async(
+        "invoice_pdf.html",
+        {
+            "estimate": estimate,
+            "invoice_number": invoice_number,
+            "issue_date": issued_at,
+            **totals,
+        },
+        estimate_id=estimate.id,
+    )
+    return (
+        pdf_bytes,
+        f"invoice_{estimate.id}.pdf",
+        {
+            "estimate_name": estimate.name,
+            "invoice_number": invoice_number,
+        },
+    )
+
+
+async def build_estimate_act_document(
+    db: AsyncSession,
+    estimate_id: int,
+    organization_id: int,
+) -> tuple[bytes, str, dict]:
+    estimate = await load_estimate_with_relations(db, estimate_id, organization_id)
+    ensure_financial_documents_allowed(estimate)
+    totals = calculate_estimate_totals(estimate)
+    issued_at = datetime.now(timezone.utc)
+    act_number = build_financial_document_number("ACT", estimate.id, issued_at)
+
+    pdf_bytes = await render_pdf_async(
+        "act_pdf.html",
+        {
+            "estimate": estimate,
+            "act_number": act_number,
+            "issue_date": issued_at,
+            **totals,
+        },
+        estimate_id=estimate.id,
+    )
+    return (
+        pdf_bytes,
+        f"act_{estimate.id}.pdf",
+        {
+            "estimate_name": estimate.name,
+            "act_number": act_number,
+        },
+    )
+
+
+async def build_estimate_excel_document(
+    db: AsyncSession,
+    estimate_id: int,
+    organization_id: int,
+) -> tuple[bytes, str, dict]:
+    estimate = await load_estimate_with_relations(db, estimate_id, organization_id)
+
+    filename = f"{estimate.name}.xlsx"
+    with await asyncio.to_thread(generate_excel, estimate) as excel_file:
+        content = excel_file.read()
+    return content, filename, {"estimate_name": estimate.name, "filename": filename}
+
+
+ESTIMATE_DOCUMENT_BUILDERS = {
+    "estimate_pdf": (build_estimate_pdf_document, "estimate.export.pdf"),
+    "invoice_pdf": (build_estimate_invoice_document, "estimate.export.invoice_pdf"),
+    "act_pdf": (build_estimate_act_document, "estimate.export.act_pdf"),
+    "estimate_excel": (build_estimate_excel_document, "estimate.export.excel"),
+}
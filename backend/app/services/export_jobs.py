@@ -0,0 +1,429 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.export_job import ExportJob, ExportJobStatus
+from app.models.organization import WORKSPACE_ROLE_GUEST, OrganizationMembership
+from app.models.user import User
+from app.schemas.export_job import (
+    ANALYTICS_EXPORT_JOB_KINDS,
+    AnalyticsExportParams,
+    ExportJobOut,
+)
+from app.services.analytics_reports import (
+    ANALYTICS_EXPORT_FILENAMES,
+    ANALYTICS_EXPORT_MEDIA_TYPES,
+    build_analytics_export,
+    build_global_analytics,
+)
+from app.services.audit_ledger import append_audit_ledger_entry
+from app.services.export_documents import ESTIMATE_DOCUMENT_BUILDERS
+from app.utils.pdf import PdfRenderQueueFull
+from app.utils.workspace import (
+    WORKSPACE_PERMISSION_DATA_VIEW,
+    WorkspaceContext,
+    has_workspace_permission,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 2
+HEARTBEAT_INTERVAL_SECONDS = 15
+# Задача в статусе running без heartbeat дольше этого срока считается
+# осиротевшей (воркер перезапущен или упал) и возвращается в очередь.
+STALE_AFTER_SECONDS = 120
+CLEANUP_INTERVAL_SECONDS = 300
+MAX_ATTEMPTS = 3
+# Пауза перед повтором задачи, которой не хватило места в очереди PDF-рендера
+BACKPRESSURE_RETRY_SECONDS = 30
+
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expires_at(now: datetime) -> datetime:
+    return now + timedelta(hours=max(1, settings.EXPORTS_JOBS_TTL_HOURS))
+
+
+def to_export_job_out(job: ExportJob) -> ExportJobOut:
+    return ExportJobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress or 0,
+        error=job.error,
+        file_name=job.file_name,
+        file_size=job.file_size,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+        download_url=(
+            f"/api/exports/{job.id}/download"
+            if job.status == ExportJobStatus.SUCCEEDED
+            else None
+        ),
+    )
+
+
+async def enqueue_export_job(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    organization_id: int,
+    kind: str,
+    params: dict,
+) -> ExportJob:
+    job = ExportJob(
+        user_id=user_id,
+        organization_id=organization_id,
+        kind=kind,
+        params=params,
+        status=ExportJobStatus.QUEUED,
+        progress=0,
+        attempts=0,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    export_job_worker.notify()
+    return job
+
+
+async def claim_next_export_job(db: AsyncSession) -> ExportJob | None:
+    now = _utcnow()
+    while True:
+        result = await db.execute(
+            select(ExportJob)
+            .where(
+                or_(
+                    and_(
+                        ExportJob.status == ExportJobStatus.QUEUED,
+                        or_(ExportJob.run_after.is_(None), ExportJob.run_after <= now),
+                    ),
+                    and_(
+                        ExportJob.status == ExportJobStatus.RUNNING,
+                        ExportJob.heartbeat_at
+                        < now - timedelta(seconds=STALE_AFTER_SECONDS),
+                    ),
+                )
+            )
+            .order_by(ExportJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalar_one_or_none()
+        if job is None:
+            await db.commit()
+            return None
+
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = ExportJobStatus.FAILED
+            job.error = "Выгрузка прервана: превышено число попыток"
+            job.finished_at = now
+            job.expires_at = _expires_at(now)
+            await db.commit()
+            continue
+
+        job.status = ExportJobStatus.RUNNING
+        job.attempts += 1
+        job.progress = 5
+        job.error = None
+        job.started_at = now
+        job.heartbeat_at = now
+        job.run_after = None
+        await db.commit()
+        return job
+
+
+async def _load_job_context(db: AsyncSession, job: ExportJob) -> WorkspaceContext:
+    # Права перепроверяются в момент выполнения: за время ожидания в очереди
+    # пользователя могли исключить из рабочего пространства.
+    user = await db.get(User, job.user_id)
+    membership_result = await db.execute(
+        select(OrganizationMembership).where(
+            OrganizationMembership.user_id == job.user_id,
+            OrganizationMembership.organization_id == job.organization_id,
+        )
+    )
+    membership = membership_result.scalar_one_or_none()
+    role = ((membership.role if membership else None) or WORKSPACE_ROLE_GUEST).lower()
+    if not user or not membership or not has_workspace_permission(
+        role, WORKSPACE_PERMISSION_DATA_VIEW
+    ):
+        raise HTTPException(status_code=403, detail="Недостаточно прав для выполнения действия")
+    return WorkspaceContext(user=user, organization_id=job.organization_id, role=role)
+
+
+async def build_export_job_document(
+    db: AsyncSession,
+    job: ExportJob,
+) -> tuple[bytes, str, str]:
+    context = await _load_job_context(db, job)
+
+    if job.kind in ANALYTICS_EXPORT_JOB_KINDS:
+        export_format = job.kind.removeprefix("analytics_")
+        params = AnalyticsExportParams.model_validate(job.params or {})
+        ga = await build_global_analytics(
+            db,
+            context.organization_id,
+            start_date=params.start_date,
+            end_date=params.end_date,
+            status=params.status,
+            vat_enabled=params.vat_enabled,
+            granularity=params.granularity,
+            categories=params.categories,
+        )
+        content = await build_analytics_export(export_format, ga, params.granularity)
+        return (
+            content,
+            ANALYTICS_EXPORT_FILENAMES[export_format],
+            ANALYTICS_EXPORT_MEDIA_TYPES[export_format],
+        )
+
+    builder, audit_action = ESTIMATE_DOCUMENT_BUILDERS[job.kind]
+    estimate_id = int(job.params["estimate_id"])
+    content, filename, details = await builder(db, estimate_id, job.organization_id)
+    await append_audit_ledger_entry(
+        db,
+        actor_user_id=job.user_id,
+        action=audit_action,
+        entity_type="estimate",
+        entity_id=str(estimate_id),
+        details={**details, "export_job_id": job.id},
+    )
+    media_type = EXCEL_MEDIA_TYPE if job.kind == "estimate_excel" else "application/pdf"
+    return content, filename, media_type
+
+
+def _job_directory(job_id: int) -> Path:
+    return Path(settings.EXPORTS_JOBS_DIR) / str(int(job_id))
+
+
+def store_export_file(job_id: int, filename: str, content: bytes) -> Path:
+    directory = _job_directory(job_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_name = filename.replace("/", "_").replace("\\", "_") or "export"
+    path = directory / safe_name
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file_obj:
+            file_obj.write(content)
+        os.replace(tmp_name, path)
+    except OSError:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def remove_export_files(job_id: int) -> None:
+    shutil.rmtree(_job_directory(job_id), ignore_errors=True)
+
+
+async def _heartbeat(job_id: int) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            async with SessionLocal() as session:
+                await session.execute(
+                    update(ExportJob)
+                    .where(
+                        ExportJob.id == job_id,
+                        ExportJob.status == ExportJobStatus.RUNNING,
+                    )
+                    .values(heartbeat_at=_utcnow())
+                )
+                await session.commit()
+        except Exception:
+            logger.warning("Export job %s heartbeat failed", job_id, exc_info=True)
+
+
+async def _requeue_export_job(db: AsyncSession, job_id: int) -> None:
+    await db.rollback()
+    job = await db.get(ExportJob, job_id)
+    # Переполненная очередь рендера — не сбой выгрузки: попытка не засчитывается
+    job.status = ExportJobStatus.QUEUED
+    job.attempts = max(0, job.attempts - 1)
+    job.progress = 0
+    job.started_at = None
+    job.heartbeat_at = None
+    job.run_after = _utcnow() + timedelta(seconds=BACKPRESSURE_RETRY_SECONDS)
+    await db.commit()
+
+
+async def run_export_job(job_id: int) -> str | None:
+    """Build and store the document of a claimed job; returns the job's new status."""
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        async with SessionLocal() as db:
+            job = await db.get(ExportJob, job_id)
+            if job is None:
+                return None
+            try:
+                content, filename, media_type = await build_export_job_document(db, job)
+                job.progress = 80
+                await db.commit()
+                path = await asyncio.to_thread(store_export_file, job.id, filename, content)
+            except PdfRenderQueueFull:
+                logger.info("Export job %s requeued: PDF render queue is full", job_id)
+                await _requeue_export_job(db, job_id)
+                return ExportJobStatus.QUEUED
+            except Exception as exc:
+                if isinstance(exc, HTTPException):
+                    error = str(exc.detail)
+                else:
+                    logger.exception("Export job %s failed", job_id)
+                    error = str(exc) or type(exc).__name__
+                await db.rollback()
+                job = await db.get(ExportJob, job_id)
+                now = _utcnow()
+                job.status = ExportJobStatus.FAILED
+                job.error = error[:2000]
+                job.finished_at = now
+                job.expires_at = _expires_at(now)
+                await db.commit()
+                return ExportJobStatus.FAILED
+
+            now = _utcnow()
+            job.status = ExportJobStatus.SUCCEEDED
+            job.progress = 100
+            job.file_path = str(path)
+            job.file_name = filename
+            job.media_type = media_type
+            job.file_size = len(content)
+            job.finished_at = now
+            job.expires_at = _expires_at(now)
+            await db.commit()
+            return ExportJobStatus.SUCCEEDED
+    finally:
+        heartbeat.cancel()
+
+
+async def cleanup_expired_export_jobs(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(ExportJob)
+        .where(
+            ExportJob.expires_at < _utcnow(),
+            ExportJob.status.in_([ExportJobStatus.SUCCEEDED, ExportJobStatus.FAILED]),
+        )
+        .with_for_update(skip_locked=True)
+    )
+    jobs = result.scalars().all()
+    for job in jobs:
+        await asyncio.to_thread(remove_export_files, job.id)
+        job.status = ExportJobStatus.EXPIRED
+        job.file_path = None
+    await db.commit()
+    return len(jobs)
+
+
+class ExportJobWorker:
+    """
+    Background runner for export jobs living in every backend process.
+    Jobs are claimed from the database with SKIP LOCKED, so several processes
+    can poll the same queue; a job whose runner died is picked up again once
+    its heartbeat goes stale.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, int(concurrency))
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._running = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._requeued = 0
+        self._expired = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_loop(), name=f"export-job-runner-{index}")
+            for index in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop(), name="export-job-cleanup"))
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    job = await claim_next_export_job(db)
+                    job_id = job.id if job else None
+                if job_id is None:
+                    await self._wait_for_work()
+                    continue
+
+                self._running += 1
+                try:
+                    status = await run_export_job(job_id)
+                finally:
+                    self._running -= 1
+                if status == ExportJobStatus.SUCCEEDED:
+                    self._succeeded += 1
+                elif status == ExportJobStatus.QUEUED:
+                    self._requeued += 1
+                else:
+                    self._failed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Export job runner iteration failed")
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    self._expired += await cleanup_expired_export_jobs(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Export job cleanup failed")
+            await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "enabled": bool(self._tasks),
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "requeued": self._requeued,
+            "expired": self._expired,
+        }
+
+
+export_job_worker = ExportJobWorker(concurrency=settings.EXPORTS_JOBS_CONCURRENCY)
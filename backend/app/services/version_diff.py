@@ -0,0 +1,100 @@
+# backend/app/services/version_diff.py
+
+from types import SimpleNamespace
+from typing import Any
+
+from app.services.estimate_totals import apply_estimate_totals
+
+# Поля, которые не описывают содержимое сметы. Метки времени меняются при
+# каждом сохранении; итоги есть не во всех снимках (старые версии их не
+# хранят) и сравниваются отдельно в totals_from/totals_to
+IGNORED_FIELDS = {
+    "items",
+    "is_favorite",
+    "created_at",
+    "updated_at",
+    "items_count",
+    "total_internal",
+    "total_external",
+    "margin",
+    "vat_amount",
+    "total_with_vat",
+}
+ITEM_IGNORED_FIELDS = {"id", "estimate_id"}
+
+
+def _field_changes(old: dict, new: dict, ignored: set[str]) -> list[dict[str, Any]]:
+    changes = []
+    for field in list(old) + [key for key in new if key not in old]:
+        if field in ignored:
+            continue
+        old_value, new_value = old.get(field), new.get(field)
+        if old_value != new_value:
+            changes.append({"field": field, "old": old_value, "new": new_value})
+    return changes
+
+
+def _match_items(old_items: list[dict], new_items: list[dict]) -> tuple[list, list, list]:
+    """Pair items by id; the rest by name and category (restoring a version re-creates item rows)."""
+    new_by_id = {item["id"]: item for item in new_items if item.get("id") is not None}
+    pairs, old_rest = [], []
+    for item in old_items:
+        match = new_by_id.pop(item.get("id"), None) if item.get("id") is not None else None
+        if match is not None:
+            pairs.append((item, match))
+        else:
+            old_rest.append(item)
+    matched_new = {id(new) for _old, new in pairs}
+    new_rest = [item for item in new_items if id(item) not in matched_new]
+
+    removed = []
+    for item in old_rest:
+        key = (item.get("name"), item.get("category"))
+        match = next(
+            (new for new in new_rest if (new.get("name"), new.get("category")) == key),
+            None,
+        )
+        if match is None:
+            removed.append(item)
+        else:
+            new_rest.remove(match)
+            pairs.append((item, match))
+    return pairs, removed, new_rest
+
+
+def payload_totals(payload: dict) -> dict[str, Any]:
+    totals = SimpleNamespace(
+        vat_enabled=payload.get("vat_enabled", True),
+        vat_rate=payload.get("vat_rate") or 0,
+        use_internal_price=payload.get("use_internal_price", True),
+    )
+    apply_estimate_totals(totals, payload.get("items") or [])
+    return {
+        "items_count": totals.items_count,
+        "total_internal": totals.total_internal,
+        "total_external": totals.total_external,
+        "margin": totals.margin,
+        "total_with_vat": totals.total_with_vat,
+    }
+
+
+def compare_snapshots(old: dict, new: dict) -> dict[str, Any]:
+    """Field, per-item and totals difference between two EstimateOut snapshots."""
+    pairs, removed, added = _match_items(old.get("items") or [], new.get("items") or [])
+    changed = []
+    for old_item, new_item in pairs:
+        changes = _field_changes(old_item, new_item, ITEM_IGNORED_FIELDS)
+        if changes:
+            changed.append(
+                {
+                    "id": new_item.get("id"),
+                    "name": new_item.get("name") or old_item.get("name") or "",
+                    "changes": changes,
+                }
+            )
+    return {
+        "fields": _field_changes(old, new, IGNORED_FIELDS),
+        "items": {"added": added, "removed": removed, "changed": changed},
+        "totals_from": payload_totals(old),
+        "totals_to": payload_totals(new),
+    }
@@ -0,0 +1,279 @@
+# backend/app/services/version_retention.py
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, case, exists, func, select, union_all
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.estimate_approval import EstimateApprovalWorkflow
+from app.models.version import EstimateVersion
+from app.services.version_store import VERSION_KIND_KEYFRAME, delete_estimate_versions
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock: компактор работает на каждой реплике, проход
+# выполняет только та, что взяла блокировку
+COMPACTION_LOCK_KEY = 7_312_650_415
+
+
+def _estimate_range(column, from_estimate_id: int, to_estimate_id: int | None) -> list:
+    conditions = [column >= from_estimate_id]
+    if to_estimate_id is not None:
+        conditions.append(column <= to_estimate_id)
+    return conditions
+
+
+def _keep_all_before(now: datetime) -> datetime:
+    return now - timedelta(days=max(0, settings.VERSIONS_KEEP_ALL_DAYS))
+
+
+def _approval_snapshot_versions(marker, from_estimate_id: int, to_estimate_id: int | None):
+    # Первая версия после отметки хранит состояние сметы на момент
+    # отправки на согласование (started_at) или его завершения (completed_at)
+    version = aliased(EstimateVersion)
+    return (
+        select(
+            EstimateApprovalWorkflow.estimate_id.label("estimate_id"),
+            func.min(version.version).label("version"),
+        )
+        .join(
+            version,
+            and_(
+                version.estimate_id == EstimateApprovalWorkflow.estimate_id,
+                version.created_at >= marker,
+            ),
+        )
+        .where(
+            marker.is_not(None),
+            *_estimate_range(EstimateApprovalWorkflow.estimate_id, from_estimate_id, to_estimate_id),
+        )
+        .group_by(EstimateApprovalWorkflow.estimate_id)
+    )
+
+
+def retention_range_end_query(now: datetime, from_estimate_id: int, batch_size: int):
+    """
+    Last estimate id of the next compaction range: the estimate holding the
+    ``batch_size``-th version older than ``keep_all_days`` from
+    ``from_estimate_id`` on, or no row when fewer such versions remain.
+    """
+    return (
+        select(EstimateVersion.estimate_id)
+        .where(
+            EstimateVersion.estimate_id >= from_estimate_id,
+            EstimateVersion.created_at < _keep_all_before(now),
+        )
+        .order_by(EstimateVersion.estimate_id)
+        .offset(max(1, batch_size) - 1)
+        .limit(1)
+    )
+
+
+def retention_candidates_query(
+    now: datetime, from_estimate_id: int = 0, to_estimate_id: int | None = None
+):
+    """
+    Versions of estimates ``from_estimate_id..to_estimate_id`` (inclusive,
+    ``None`` - no upper bound) the retention policy allows to drop:
+    everything newer than ``keep_all_days`` stays; older versions keep the
+    latest one per day up to ``keep_daily_days`` and the latest one per week
+    beyond that. The latest keyframe of an estimate (new deltas are written
+    against it) and versions referenced by approval workflows are never dropped.
+    """
+    keep_all_before = _keep_all_before(now)
+    daily_before = now - timedelta(
+        days=max(settings.VERSIONS_KEEP_ALL_DAYS, settings.VERSIONS_KEEP_DAILY_DAYS, 0)
+    )
+    bucket = case(
+        (
+            EstimateVersion.created_at >= daily_before,
+            func.date_trunc("day", EstimateVersion.created_at),
+        ),
+        else_=func.date_trunc("week", EstimateVersion.created_at),
+    )
+    ranked = (
+        select(
+            EstimateVersion.estimate_id,
+            EstimateVersion.version,
+            EstimateVersion.size_bytes,
+            func.row_number()
+            .over(
+                partition_by=(EstimateVersion.estimate_id, bucket),
+                order_by=EstimateVersion.version.desc(),
+            )
+            .label("bucket_rank"),
+        )
+        .where(
+            EstimateVersion.created_at < keep_all_before,
+            # estimate_id — ключ партиции окна: диапазон сужается до оконной
+            # функции и читается по индексу, а не весь журнал версий на пачку
+            *_estimate_range(EstimateVersion.estimate_id, from_estimate_id, to_estimate_id),
+        )
+        .subquery()
+    )
+
+    keyframe = aliased(EstimateVersion)
+    latest_keyframe = (
+        select(func.max(keyframe.version))
+        .where(
+            keyframe.estimate_id == ranked.c.estimate_id,
+            keyframe.kind == VERSION_KIND_KEYFRAME,
+        )
+        .scalar_subquery()
+    )
+    protected = union_all(
+        *(
+            _approval_snapshot_versions(marker, from_estimate_id, to_estimate_id)
+            for marker in (EstimateApprovalWorkflow.started_at, EstimateApprovalWorkflow.completed_at)
+        ),
+    ).subquery()
+
+    return (
+        select(ranked.c.estimate_id, ranked.c.version, ranked.c.size_bytes)
+        .where(
+            ranked.c.bucket_rank > 1,
+            ranked.c.version != func.coalesce(latest_keyframe, 0),
+            ~exists().where(
+                protected.c.estimate_id == ranked.c.estimate_id,
+                protected.c.version == ranked.c.version,
+            ),
+        )
+        .order_by(ranked.c.estimate_id, ranked.c.version)
+    )
+
+
+async def compact_estimate_versions(*, dry_run: bool = False, now: datetime | None = None) -> dict:
+    """
+    Enforce the retention policy. Estimates are walked in id ranges holding
+    about ``compact_batch_size`` old versions each, and every estimate is compacted in its own
+    short transaction, so edits of other estimates are never blocked. Only
+    one process compacts at a time; the others skip the run.
+    """
+    now = now or datetime.now(timezone.utc)
+    report = {"estimates": 0, "rows": 0, "bytes": 0, "dry_run": dry_run, "skipped": False}
+    started = time.perf_counter()
+    async with SessionLocal() as lock_db:
+        # Сессионная блокировка на отдельном соединении в autocommit:
+        # держится весь проход, не оставляя открытой транзакции
+        lock_conn = await lock_db.connection(
+            execution_options={"isolation_level": "AUTOCOMMIT"}
+        )
+        if await lock_conn.scalar(select(func.pg_try_advisory_lock(COMPACTION_LOCK_KEY))):
+            try:
+                await _compact(report, now, dry_run)
+            finally:
+                await lock_conn.execute(select(func.pg_advisory_unlock(COMPACTION_LOCK_KEY)))
+        else:
+            report["skipped"] = True
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return report
+
+
+async def _compact(report: dict, now: datetime, dry_run: bool) -> None:
+    batch_size = max(1, settings.VERSIONS_COMPACT_BATCH_SIZE)
+    from_estimate_id = 0
+    while True:
+        async with SessionLocal() as db:
+            to_estimate_id = await db.scalar(
+                retention_range_end_query(now, from_estimate_id, batch_size)
+            )
+            result = await db.execute(
+                retention_candidates_query(now, from_estimate_id, to_estimate_id)
+            )
+            candidates = result.all()
+
+        by_estimate = defaultdict(list)
+        for row in candidates:
+            by_estimate[row.estimate_id].append(row)
+        for estimate_id, rows in by_estimate.items():
+            report["estimates"] += 1
+            report["rows"] += len(rows)
+            if dry_run:
+                report["bytes"] += sum(row.size_bytes or 0 for row in rows)
+                continue
+            async with SessionLocal() as db:
+                report["bytes"] += await delete_estimate_versions(
+                    db, estimate_id, [row.version for row in rows]
+                )
+                await db.commit()
+            await asyncio.sleep(0)
+
+        # Следующий диапазон, а не повтор запроса: в dry run кандидаты остаются на месте
+        if to_estimate_id is None:
+            break
+        from_estimate_id = to_estimate_id + 1
+
+
+class VersionCompactor:
+    """Runs compact_estimate_versions every ``compact_interval_minutes``."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._skipped = 0
+        self._failed = 0
+        self._rows = 0
+        self._bytes = 0
+        self._last_run: dict | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_loop(), name="version-compactor")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def run_once(self) -> dict:
+        report = await compact_estimate_versions()
+        if report.get("skipped"):
+            self._skipped += 1
+            logger.debug("Version compaction skipped: another process holds the lock")
+            return report
+        self._runs += 1
+        self._rows += report["rows"]
+        self._bytes += report["bytes"]
+        self._last_run = report
+        logger.info(
+            "Version compaction: %s rows, %s bytes reclaimed in %s estimates (%s ms)",
+            report["rows"],
+            report["bytes"],
+            report["estimates"],
+            report["duration_ms"],
+        )
+        return report
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._failed += 1
+                logger.exception("Version compaction failed")
+            await asyncio.sleep(max(1, settings.VERSIONS_COMPACT_INTERVAL_MINUTES) * 60)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "runs": self._runs,
+            "skipped": self._skipped,
+            "failed": self._failed,
+            "rows_reclaimed": self._rows,
+            "bytes_reclaimed": self._bytes,
+            "last_run": self._last_run,
+        }
+
+
+version_compactor = VersionCompactor()
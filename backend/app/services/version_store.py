@@ -0,0 +1,291 @@
+# backend/app/services/version_store.py
+
+import json
+import zlib
+from typing import Any, Iterable
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.models.version import EstimateVersion
+
+VERSION_KIND_KEYFRAME = "keyframe"
+VERSION_KIND_DELTA = "delta"
+
+ENCODING_JSON = "json"
+ENCODING_ZLIB = "zlib"
+
+_MISSING = object()
+
+
+def pack_document(document: Any, compression: str | None = None) -> tuple[bytes, str]:
+    raw = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    compression = settings.VERSIONS_COMPRESSION if compression is None else compression
+    if compression == ENCODING_ZLIB:
+        return zlib.compress(raw, 6), ENCODING_ZLIB
+    return raw, ENCODING_JSON
+
+
+def unpack_document(data: bytes, encoding: str | None) -> Any:
+    if encoding == ENCODING_ZLIB:
+        data = zlib.decompress(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _index_items(items: list) -> dict[str, dict] | None:
+    indexed = {}
+    for item in items:
+        item_id = item.get("id") if isinstance(item, dict) else None
+        if item_id is None or str(item_id) in indexed:
+            return None
+        indexed[str(item_id)] = item
+    return indexed
+
+
+def _diff_items(base_items: list, target_items: list) -> dict:
+    base_by_id = _index_items(base_items)
+    target_by_id = _index_items(target_items)
+    if base_by_id is None or target_by_id is None:
+        # Позиции без id или с повторами сопоставить нельзя — храним список целиком
+        return {"replace": target_items}
+
+    changed = {}
+    for item_id, item in target_by_id.items():
+        old = base_by_id.get(item_id)
+        if old is None or any(key not in item for key in old):
+            changed[item_id] = {"full": item}
+        elif old != item:
+            changed[item_id] = {
+                "patch": {key: value for key, value in item.items() if old.get(key, _MISSING) != value}
+            }
+    return {"order": list(target_by_id), "changed": changed}
+
+
+def diff_payloads(base: dict, target: dict) -> dict:
+    """
+    Structural delta between two EstimateOut snapshots: changed and removed
+    top-level fields plus per-item changes matched by item id.
+    """
+    delta: dict[str, Any] = {}
+    changed = {
+        key: value
+        for key, value in target.items()
+        if key != "items" and base.get(key, _MISSING) != value
+    }
+    removed = [key for key in base if key != "items" and key not in target]
+    if changed:
+        delta["set"] = changed
+    if removed:
+        delta["unset"] = removed
+    base_items = base.get("items") or []
+    target_items = target.get("items") or []
+    if base_items != target_items or ("items" in base) != ("items" in target):
+        delta["items"] = _diff_items(base_items, target_items)
+    return delta
+
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    unset = set(delta.get("unset", ()))
+    result = {key: value for key, value in base.items() if key not in unset}
+    result.update(delta.get("set", {}))
+    items_delta = delta.get("items")
+    if items_delta is not None:
+        if "replace" in items_delta:
+            result["items"] = items_delta["replace"]
+        else:
+            base_by_id = _index_items(base.get("items") or []) or {}
+            items = []
+            for item_id in items_delta["order"]:
+                change = items_delta["changed"].get(item_id)
+                if change is None:
+                    items.append(base_by_id[item_id])
+                elif "full" in change:
+                    items.append(change["full"])
+                else:
+                    items.append({**base_by_id[item_id], **change["patch"]})
+            result["items"] = items
+    return result
+
+
+def version_payload(row: EstimateVersion, base: dict | None = None) -> dict:
+    """Full snapshot of a version; a delta needs the payload of its keyframe."""
+    if row.data is None:
+        return row.payload
+    document = unpack_document(row.data, row.encoding)
+    if row.kind == VERSION_KIND_DELTA:
+        if base is None:
+            raise ValueError(f"Keyframe v{row.base_version} is required to decode v{row.version}")
+        return apply_delta(base, document)
+    return document
+
+
+def encode_version(
+    version: int,
+    payload: dict,
+    base: EstimateVersion | None = None,
+    base_payload: dict | None = None,
+) -> dict[str, Any]:
+    """
+    Column values for a new version row. ``base`` is the latest keyframe of
+    the estimate: a delta is stored against it until the keyframe interval is
+    reached or the delta stops being smaller than a full snapshot.
+    """
+    data, encoding = pack_document(payload)
+    values = {
+        "payload": None,
+        "kind": VERSION_KIND_KEYFRAME,
+        "base_version": None,
+        "encoding": encoding,
+        "data": data,
+        "size_bytes": len(data),
+    }
+    interval = max(1, settings.VERSIONS_KEYFRAME_INTERVAL)
+    if base is None or version - base.version >= interval:
+        return values
+
+    if base_payload is None:
+        base_payload = version_payload(base)
+    delta_data, delta_encoding = pack_document(diff_payloads(base_payload, payload))
+    if len(delta_data) >= len(data):
+        return values
+    values.update(
+        kind=VERSION_KIND_DELTA,
+        base_version=base.version,
+        encoding=delta_encoding,
+        data=delta_data,
+        size_bytes=len(delta_data),
+    )
+    return values
+
+
+def build_estimate_version(
+    estimate_id: int,
+    version: int,
+    user_id: int,
+    payload: dict,
+    base: EstimateVersion | None = None,
+) -> EstimateVersion:
+    return EstimateVersion(
+        estimate_id=estimate_id,
+        version=version,
+        user_id=user_id,
+        **encode_version(version, payload, base),
+    )
+
+
+def latest_keyframe_join(estimate_id_column):
+    """
+    Aliased EstimateVersion and the ON clause that picks the latest keyframe
+    of an estimate, for loading it together with the estimate row.
+    """
+    keyframe = aliased(EstimateVersion, name="base_version_row")
+    latest = aliased(EstimateVersion)
+    latest_version = (
+        select(func.max(latest.version))
+        .where(
+            latest.estimate_id == estimate_id_column,
+            latest.kind == VERSION_KIND_KEYFRAME,
+        )
+        .scalar_subquery()
+    )
+    return keyframe, and_(
+        keyframe.estimate_id == estimate_id_column,
+        keyframe.version == latest_version,
+    )
+
+
+async def load_version_payloads(
+    db: AsyncSession,
+    estimate_id: int,
+    rows: Iterable[EstimateVersion],
+) -> dict[int, dict]:
+    """Decode versions of one estimate; missing keyframes are fetched in one query."""
+    rows = list(rows)
+    loaded = {row.version: row for row in rows}
+    missing = {
+        row.base_version
+        for row in rows
+        if row.kind == VERSION_KIND_DELTA and row.base_version not in loaded
+    }
+    if missing:
+        result = await db.execute(
+            select(EstimateVersion).where(
+                EstimateVersion.estimate_id == estimate_id,
+                EstimateVersion.version.in_(missing),
+            )
+        )
+        for row in result.scalars().all():
+            loaded.setdefault(row.version, row)
+
+    keyframes: dict[int, dict] = {}
+    payloads = {}
+    for row in rows:
+        base = None
+        if row.kind == VERSION_KIND_DELTA:
+            if row.base_version not in keyframes:
+                keyframes[row.base_version] = version_payload(loaded[row.base_version])
+            base = keyframes[row.base_version]
+        payloads[row.version] = version_payload(row, base)
+    return payloads
+
+
+def reencode_versions(rows: list[EstimateVersion], payloads: dict[int, dict]) -> None:
+    """Rewrite rows (ascending by version) as a fresh keyframe/delta chain."""
+    keyframe = None
+    keyframe_payload = None
+    for row in rows:
+        payload = payloads[row.version]
+        for column, value in encode_version(row.version, payload, keyframe, keyframe_payload).items():
+            setattr(row, column, value)
+        if row.kind == VERSION_KIND_KEYFRAME:
+            keyframe, keyframe_payload = row, payload
+
+
+async def delete_estimate_versions(
+    db: AsyncSession,
+    estimate_id: int,
+    versions: Iterable[int],
+) -> int:
+    """
+    Delete versions of one estimate. Deltas that depend on a deleted keyframe
+    are rebuilt first, the earliest of them becomes the new keyframe.
+    Returns the number of stored bytes reclaimed, net of rebuilt deltas.
+    """
+    versions = set(versions)
+    if not versions:
+        return 0
+    result = await db.execute(
+        select(EstimateVersion).where(
+            EstimateVersion.estimate_id == estimate_id,
+            EstimateVersion.version.in_(versions)
+            | (
+                (EstimateVersion.kind == VERSION_KIND_DELTA)
+                & EstimateVersion.base_version.in_(versions)
+            ),
+        )
+    )
+    rows = result.scalars().all()
+    victims = [row for row in rows if row.version in versions]
+    orphans = sorted(
+        (row for row in rows if row.version not in versions),
+        key=lambda row: row.version,
+    )
+    freed = sum(row.size_bytes or 0 for row in victims)
+    if orphans:
+        freed += sum(row.size_bytes or 0 for row in orphans)
+        payloads = await load_version_payloads(db, estimate_id, orphans)
+        reencode_versions(orphans, payloads)
+        freed -= sum(row.size_bytes or 0 for row in orphans)
+        await db.flush()
+
+    await db.execute(
+        delete(EstimateVersion)
+        .where(
+            EstimateVersion.estimate_id == estimate_id,
+            EstimateVersion.version.in_(versions),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return freed
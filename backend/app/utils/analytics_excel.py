@@ -1,9 +1,13 @@
 from io import BytesIO
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
+from app.core.instrumentation import timed
+from app.utils.excel import EXCEL_GENERATION_SECONDS
 from app.schemas.analytics import GlobalAnalytics
 
 
+@timed("render")
+@EXCEL_GENERATION_SECONDS.time("analytics")
 def generate_analytics_excel(ga: GlobalAnalytics) -> BytesIO:
     wb = Workbook()
     ws = wb.active
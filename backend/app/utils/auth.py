@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.core.config import settings
+from app.core.instrumentation import timed
 from app.core.database import get_db
 from app.models.user import User
 from app.utils.secret_key import load_or_create_secret_key
@@ -88,6 +89,11 @@ def decode_jwt_token(token: str) -> dict[str, Any]:
 async def get_current_user(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ) -> User:
+    with timed("auth"):
+        return await _load_token_user(token, db)
+
+
+async def _load_token_user(token: str, db: AsyncSession) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить токен",
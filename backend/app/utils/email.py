@@ -2,12 +2,24 @@ import logging
 
 import aiosmtplib
 from email.message import EmailMessage
+from time import perf_counter
 from typing import Iterable, TypedDict
 
 from app.core.config import settings
+from app.core.metrics import SLOW_BUCKETS, registry
 
 logger = logging.getLogger(__name__)
 
+EMAIL_SEND_SECONDS = registry.histogram(
+    "email_send_duration_seconds",
+    "SMTP send time, failed attempts included.",
+    buckets=SLOW_BUCKETS,
+)
+EMAIL_SEND_FAILURES = registry.counter(
+    "email_send_failures_total",
+    "Emails the SMTP server did not accept.",
+)
+
 
 class EmailAttachment(TypedDict):
     filename: str
@@ -42,6 +54,7 @@ async def send_email(
             filename=attachment["filename"],
         )
 
+    started = perf_counter()
     try:
         await aiosmtplib.send(
             message,
@@ -54,8 +67,11 @@ async def send_email(
             timeout=settings.SMTP_TIMEOUT_SECONDS,
         )
     except Exception as exc:
+        EMAIL_SEND_FAILURES.inc()
         logger.exception("SMTP send failed")
         raise RuntimeError("Не удалось отправить email") from exc
+    finally:
+        EMAIL_SEND_SECONDS.observe(perf_counter() - started)
 
 
 async def send_verification_code(email: str, code: str):
@@ -1,50 +1,157 @@
 ## backend/app/utils/excel.py
 
+import re
+from collections import defaultdict
+from copy import copy
+from tempfile import SpooledTemporaryFile
+from time import perf_counter
+
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
-from io import BytesIO
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from app.core.instrumentation import timed
+from app.core.metrics import SLOW_BUCKETS, registry
 from app.models.estimate import Estimate
-from collections import defaultdict
 
+EXCEL_GENERATION_SECONDS = registry.histogram(
+    "excel_generation_duration_seconds",
+    "Excel workbook generation time by kind (estimate, workbook, analytics).",
+    ("kind",),
+    buckets=SLOW_BUCKETS,
+)
 
-def generate_excel(estimate: Estimate) -> BytesIO:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = estimate.name[:31].replace(":", "-")
+# До этого размера файл живёт в памяти, дальше SpooledTemporaryFile уходит на диск
+EXCEL_SPOOL_MAX_BYTES = 8 * 1024 * 1024
 
-    status_map = {
-        "draft": "Черновик",
-        "sent": "Отправлена",
-        "approved": "Согласована",
-        "paid": "Оплачена",
-        "cancelled": "Отменена",
-    }
-    currency_format = "₽#,##0.00"
-    bold_font = Font(bold=True)
-    title_font = Font(size=14, bold=True)
-    header_fill = PatternFill(
-        start_color="E0E7FF", end_color="E0E7FF", fill_type="solid"
-    )
-    total_fill = PatternFill(
-        start_color="D1FAE5", end_color="D1FAE5", fill_type="solid"
-    )
-    cat_total_fill = PatternFill(
-        start_color="FEF9C3", end_color="FEF9C3", fill_type="solid"
-    )
-    center_align = Alignment(horizontal="center", vertical="center")
-    left_align = Alignment(horizontal="left", vertical="top", wrap_text=True)
-    border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
-
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=9)
-    title_cell = ws.cell(row=1, column=1, value=estimate.name)
-    title_cell.font = title_font
-    title_cell.alignment = center_align
+STATUS_MAP = {
+    "draft": "Черновик",
+    "sent": "Отправлена",
+    "approved": "Согласована",
+    "paid": "Оплачена",
+    "cancelled": "Отменена",
+}
+CURRENCY_FORMAT = "₽#,##0.00"
+
+BOLD_FONT = Font(bold=True)
+TITLE_FONT = Font(size=14, bold=True)
+SECTION_FONT = Font(size=12, bold=True)
+HEADER_FILL = PatternFill(start_color="E0E7FF", end_color="E0E7FF", fill_type="solid")
+TOTAL_FILL = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
+CAT_TOTAL_FILL = PatternFill(start_color="FEF9C3", end_color="FEF9C3", fill_type="solid")
+CENTER_ALIGN = Alignment(horizontal="center", vertical="center")
+LEFT_ALIGN = Alignment(horizontal="left", vertical="top", wrap_text=True)
+WRAP_TOP_ALIGN = Alignment(wrap_text=True, vertical="top")
+THIN_BORDER = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+
+# Набор стилей ячеек: font, fill, alignment, border, number_format
+CELL_STYLES = {
+    "title": dict(font=TITLE_FONT, alignment=CENTER_ALIGN),
+    "label": dict(font=BOLD_FONT),
+    "field_value": dict(alignment=WRAP_TOP_ALIGN),
+    "section": dict(font=SECTION_FONT),
+    "header": dict(font=BOLD_FONT, alignment=CENTER_ALIGN, border=THIN_BORDER, fill=HEADER_FILL),
+    "item": dict(alignment=CENTER_ALIGN, border=THIN_BORDER),
+    "item_text": dict(alignment=LEFT_ALIGN, border=THIN_BORDER),
+    "item_money": dict(alignment=CENTER_ALIGN, border=THIN_BORDER, number_format=CURRENCY_FORMAT),
+    "category_label": dict(font=BOLD_FONT, fill=CAT_TOTAL_FILL),
+    "category_money": dict(font=BOLD_FONT, fill=CAT_TOTAL_FILL, number_format=CURRENCY_FORMAT),
+    "total_caption": dict(font=BOLD_FONT, fill=TOTAL_FILL, alignment=WRAP_TOP_ALIGN),
+    "total_label": dict(font=BOLD_FONT, fill=TOTAL_FILL),
+    "total_money": dict(font=BOLD_FONT, fill=TOTAL_FILL, number_format=CURRENCY_FORMAT),
+    "bold": dict(font=BOLD_FONT),
+}
+# Для жирного текста при автоподборе ширины оставляем запас
+BOLD_STYLES = {name for name, style in CELL_STYLES.items() if "font" in style}
+
+
+class _SheetLayout:
+    """
+    Collects cell values and style names for a write-only sheet and measures
+    column widths as cells are placed, so no second walk over the sheet is
+    needed. Write-only sheets need widths before the first row is written.
+    """
+
+    def __init__(self):
+        self.rows: dict[int, list[tuple[int, object, str | None]]] = defaultdict(list)
+        self.merged: list[str] = []
+        # Ячейки с итогами — на них ссылается сводный лист книги из нескольких смет
+        self.totals: dict[str, str] = {}
+        self.max_row = 0
+        self.max_col = 0
+        self._lengths: dict[int, int] = defaultdict(int)
+
+    def set(self, row: int, col: int, value, style: str | None = None) -> None:
+        self.rows[row].append((col, value, style))
+        self.max_row = max(self.max_row, row)
+        self.max_col = max(self.max_col, col)
+        if value:
+            # если многострочный текст, разбиваем
+            longest = max(len(line) for line in str(value).split("\n"))
+            if style in BOLD_STYLES:
+                longest = int(longest * 1.15)
+            self._lengths[col] = max(self._lengths[col], longest)
+
+    def merge(self, start_row: int, start_col: int, end_row: int, end_col: int) -> None:
+        self.merged.append(
+            f"{get_column_letter(start_col)}{start_row}:{get_column_letter(end_col)}{end_row}"
+        )
+        self.max_row = max(self.max_row, end_row)
+        self.max_col = max(self.max_col, end_col)
+
+    def column_widths(self) -> dict[str, float]:
+        return {
+            get_column_letter(col): max(min(self._lengths[col] + 3, 33), 10)
+            for col in range(1, self.max_col + 1)
+        }
+
+
+def _style_templates(ws) -> dict[str, object]:
+    # Стили регистрируются в книге один раз; ячейкам копируется готовый StyleArray
+    templates = {}
+    for name, style in CELL_STYLES.items():
+        cell = WriteOnlyCell(ws)
+        for attribute, value in style.items():
+            setattr(cell, attribute, value)
+        templates[name] = cell._style
+    return templates
+
+
+def _write_layout(ws, layout: _SheetLayout) -> None:
+    for letter, width in layout.column_widths().items():
+        ws.column_dimensions[letter].width = width
+    for cell_range in layout.merged:
+        ws.merged_cells.add(cell_range)
+
+    templates = _style_templates(ws)
+    for row_idx in range(1, layout.max_row + 1):
+        cells = sorted(layout.rows.get(row_idx, ()), key=lambda entry: entry[0])
+        values = []
+        for col, value, style in cells:
+            values.extend([None] * (col - 1 - len(values)))
+            if style is None:
+                values.append(value)
+                continue
+            cell = WriteOnlyCell(ws)
+            cell._style = copy(templates[style])
+            # значение после стиля: даты сами выставляют свой number_format
+            cell.value = value
+            values.append(cell)
+        ws.append(values)
+
+
+def _build_estimate_layout(estimate: Estimate) -> _SheetLayout:
+    layout = _SheetLayout()
+
+    layout.merge(start_row=1, start_col=1, end_row=1, end_col=9)
+    layout.set(1, 1, estimate.name, "title")
 
     fields = [
         ("Клиент", estimate.client.name if estimate.client else "—"),
@@ -60,11 +167,16 @@ def generate_excel(estimate: Estimate) -> BytesIO:
             "Контакт",
             estimate.client.email if estimate.client and estimate.client.email else "—",
         ),
-        ("Статус", status_map.get(estimate.status.value, estimate.status.value)),
+        ("Статус", STATUS_MAP.get(estimate.status.value, estimate.status.value)),
         ("Ответственный", estimate.responsible),
         (
             "Дата и время проведения мероприятия",
-            estimate.event_datetime if estimate.event_datetime else "—",
+            # Excel не хранит часовой пояс: пишем время как есть, без tzinfo
+            (
+                estimate.event_datetime.replace(tzinfo=None)
+                if estimate.event_datetime
+                else "—"
+            ),
         ),
         (
             "Место проведения мероприятия",
@@ -79,16 +191,13 @@ def generate_excel(estimate: Estimate) -> BytesIO:
 
     row = 3
     for label, value in fields:
-        ws[f"A{row}"] = label
-        ws[f"B{row}"] = value
-        ws[f"B{row}"].alignment = Alignment(wrap_text=True, vertical="top")
-        ws[f"A{row}"].font = bold_font
+        layout.set(row, 1, label, "label")
+        layout.set(row, 2, value, "field_value")
         row += 1
 
     row += 1  # Отступ перед услугами
 
-    ws[f"A{row}"] = "Услуги"
-    ws[f"A{row}"].font = Font(size=12, bold=True)
+    layout.set(row, 1, "Услуги", "section")
     row += 1
 
     if estimate.use_internal_price:
@@ -114,247 +223,266 @@ def generate_excel(estimate: Estimate) -> BytesIO:
             "Итог (внеш.)",
         ]
     for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = bold_font
-        cell.alignment = center_align
-        cell.border = border
-        cell.fill = header_fill
+        layout.set(row, col, header, "header")
 
     row += 1
     grouped = defaultdict(list)
     for item in estimate.items:
         grouped[item.category or "Без категории"].append(item)
 
-    # Для финального автоподбора ширины — храним все строки по столбцам:
-    all_col_values = [[] for _ in headers]
-
     internal_service_rows = []
     external_service_rows = []
 
     for category, items in grouped.items():
-
         cat_internal_rows = []
         cat_external_rows = []
 
         for item in items:
+            layout.set(row, 1, category, "item")
+            layout.set(row, 2, item.name, "item_text")
+            layout.set(row, 3, item.description, "item_text")
+            layout.set(row, 4, item.quantity, "item")
+            layout.set(row, 5, item.unit, "item")
             if estimate.use_internal_price:
-                values = [
-                    category,
-                    item.name,
-                    item.description,
-                    item.quantity,
-                    item.unit,
-                    item.internal_price,
-                    None,
-                    item.external_price,
-                    None,
-                ]
+                layout.set(row, 6, item.internal_price, "item_money")
+                layout.set(row, 7, f"=F{row}*D{row}", "item_money")
+                layout.set(row, 8, item.external_price, "item_money")
+                layout.set(row, 9, f"=H{row}*D{row}", "item_money")
+                cat_internal_rows.append(row)
+                internal_service_rows.append(row)
             else:
-                values = [
-                    category,
-                    item.name,
-                    item.description,
-                    item.quantity,
-                    item.unit,
-                    item.external_price,
-                    None,
-                ]
-
-            for col, val in enumerate(values, start=1):
-                cell = ws.cell(row=row, column=col, value=val)
-                cell.border = border
-                cell.alignment = center_align if col not in (2, 3) else left_align
-                if estimate.use_internal_price:
-                    if col in (6, 8):
-                        cell.number_format = currency_format
-                    if col == 7:
-                        cell.value = f"=F{row}*D{row}"
-                        cell.number_format = currency_format
-                        cat_internal_rows.append(row)
-                        internal_service_rows.append(row)
-                    if col == 9:
-                        cell.value = f"=H{row}*D{row}"
-                        cell.number_format = currency_format
-                        cat_external_rows.append(row)
-                        external_service_rows.append(row)
-                else:
-                    if col == 6:
-                        cell.number_format = currency_format
-                    if col == 7:
-                        cell.value = f"=F{row}*D{row}"
-                        cell.number_format = currency_format
-                        cat_external_rows.append(row)
-                        external_service_rows.append(row)
-
-                s = str(val) if val is not None else ""
-                if col - 1 < len(all_col_values):
-                    all_col_values[col - 1].append(s)
+                layout.set(row, 6, item.external_price, "item_money")
+                layout.set(row, 7, f"=F{row}*D{row}", "item_money")
+            cat_external_rows.append(row)
+            external_service_rows.append(row)
             row += 1
 
         # Итоги по категории
-        ws.cell(row=row, column=1, value=f"Итог по категории: {category}").font = (
-            bold_font
-        )
-        ws.cell(row=row, column=1).fill = cat_total_fill
+        layout.set(row, 1, f"Итог по категории: {category}", "category_label")
         if estimate.use_internal_price:
-            ws.cell(row=row, column=6, value="Внутр.").font = bold_font
-            ws.cell(
-                row=row,
-                column=7,
-                value=f"=SUM(G{cat_internal_rows[0]}:G{cat_internal_rows[-1]})",
-            ).font = bold_font
-            ws.cell(row=row, column=7).number_format = currency_format
-            ws.cell(row=row, column=7).fill = cat_total_fill
-            ws.cell(row=row, column=8, value="Внешн.").font = bold_font
-            ws.cell(
-                row=row,
-                column=9,
-                value=f"=SUM(I{cat_external_rows[0]}:I{cat_external_rows[-1]})",
-            ).font = bold_font
-            ws.cell(row=row, column=9).number_format = currency_format
-            ws.cell(row=row, column=9).fill = cat_total_fill
-            row += 2
+            layout.set(row, 6, "Внутр.", "bold")
+            layout.set(
+                row,
+                7,
+                f"=SUM(G{cat_internal_rows[0]}:G{cat_internal_rows[-1]})",
+                "category_money",
+            )
+            layout.set(row, 8, "Внешн.", "bold")
+            layout.set(
+                row,
+                9,
+                f"=SUM(I{cat_external_rows[0]}:I{cat_external_rows[-1]})",
+                "category_money",
+            )
         else:
-            ws.cell(row=row, column=6, value="Итог").font = bold_font
-            ws.cell(
-                row=row,
-                column=7,
-                value=f"=SUM(G{cat_external_rows[0]}:G{cat_external_rows[-1]})",
-            ).font = bold_font
-            ws.cell(row=row, column=7).number_format = currency_format
-            ws.cell(row=row, column=7).fill = cat_total_fill
-            row += 2
+            layout.set(row, 6, "Итог", "bold")
+            layout.set(
+                row,
+                7,
+                f"=SUM(G{cat_external_rows[0]}:G{cat_external_rows[-1]})",
+                "category_money",
+            )
+        row += 2
         # Отступ после категории
         row += 1
 
     # Финальные итоги
     row += 1
-    ws[f"E{row}"] = "Итого по всем категориям:"
-    ws[f"E{row}"].font = bold_font
-    ws[f"E{row}"].fill = total_fill
-    ws[f"E{row}"].alignment = Alignment(wrap_text=True, vertical="top")
+    layout.set(row, 5, "Итого по всем категориям:", "total_caption")
 
-    internal_sum_cell = ""
-    external_sum_cell = ""
     if estimate.use_internal_price:
-        ws[f"F{row}"] = "Себестоимость"
-        ws[f"G{row}"] = (
-            f"=SUM({','.join([f'G{r}' for r in internal_service_rows])})"
-            if internal_service_rows
-            else 0
+        layout.set(row, 6, "Себестоимость")
+        layout.set(
+            row,
+            7,
+            (
+                f"=SUM({','.join([f'G{r}' for r in internal_service_rows])})"
+                if internal_service_rows
+                else 0
+            ),
+            "total_money",
         )
-        ws[f"G{row}"].number_format = currency_format
-        ws[f"G{row}"].font = bold_font
-        ws[f"G{row}"].fill = total_fill
         internal_sum_cell = f"G{row}"
 
-        ws[f"H{row}"] = "Продажная стоимость"
-        ws[f"I{row}"] = (
-            f"=SUM({','.join([f'I{r}' for r in external_service_rows])})"
-            if external_service_rows
-            else 0
+        layout.set(row, 8, "Продажная стоимость")
+        layout.set(
+            row,
+            9,
+            (
+                f"=SUM({','.join([f'I{r}' for r in external_service_rows])})"
+                if external_service_rows
+                else 0
+            ),
+            "total_money",
         )
-        ws[f"I{row}"].number_format = currency_format
-        ws[f"I{row}"].font = bold_font
-        ws[f"I{row}"].fill = total_fill
         external_sum_cell = f"I{row}"
 
         # Маржа
         row += 1
-        ws[f"E{row}"] = "Маржа:"
-        ws[f"E{row}"].font = bold_font
-        ws[f"E{row}"].fill = total_fill
-        ws[f"I{row}"] = f"={external_sum_cell}-{internal_sum_cell}"
-        ws[f"I{row}"].number_format = currency_format
-        ws[f"I{row}"].font = bold_font
-        ws[f"I{row}"].fill = total_fill
-
-        # НДС и итоговая сумма
-        if estimate.vat_enabled:
-            row += 1
-            ws[f"E{row}"] = f"НДС ({estimate.vat_rate}%)"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"I{row}"] = f"={external_sum_cell}*{estimate.vat_rate/100}"
-            ws[f"I{row}"].number_format = currency_format
-            ws[f"I{row}"].font = bold_font
-            ws[f"I{row}"].fill = total_fill
-
-            row += 1
-            ws[f"E{row}"] = "Итого с НДС"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"I{row}"] = f"={external_sum_cell}+I{row-1}"
-            ws[f"I{row}"].number_format = currency_format
-            ws[f"I{row}"].font = bold_font
-            ws[f"I{row}"].fill = total_fill
-        else:
-            row += 1
-            ws[f"E{row}"] = "Итого"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"I{row}"] = f"={external_sum_cell}"
-            ws[f"I{row}"].number_format = currency_format
-            ws[f"I{row}"].font = bold_font
-            ws[f"I{row}"].fill = total_fill
-
+        layout.set(row, 5, "Маржа:", "total_label")
+        layout.set(row, 9, f"={external_sum_cell}-{internal_sum_cell}", "total_money")
+        total_column = "I"
     else:
-        ws[f"F{row}"] = "Внешн."
-        ws[f"G{row}"] = (
-            f"=SUM({','.join([f'G{r}' for r in external_service_rows])})"
-            if external_service_rows
-            else 0
+        layout.set(row, 6, "Внешн.")
+        layout.set(
+            row,
+            7,
+            (
+                f"=SUM({','.join([f'G{r}' for r in external_service_rows])})"
+                if external_service_rows
+                else 0
+            ),
+            "total_money",
         )
-        ws[f"G{row}"].number_format = currency_format
-        ws[f"G{row}"].font = bold_font
-        ws[f"G{row}"].fill = total_fill
         external_sum_cell = f"G{row}"
+        total_column = "G"
 
-        # НДС и итоговая сумма
-        if estimate.vat_enabled:
-            row += 1
-            ws[f"E{row}"] = f"НДС ({estimate.vat_rate}%)"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"G{row}"] = f"={external_sum_cell}*{estimate.vat_rate/100}"
-            ws[f"G{row}"].number_format = currency_format
-            ws[f"G{row}"].font = bold_font
-            ws[f"G{row}"].fill = total_fill
+    total_col_idx = 9 if total_column == "I" else 7
 
-            row += 1
-            ws[f"E{row}"] = "Итого с НДС"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"G{row}"] = f"={external_sum_cell}+G{row-1}"
-            ws[f"G{row}"].number_format = currency_format
-            ws[f"G{row}"].font = bold_font
-            ws[f"G{row}"].fill = total_fill
-        else:
-            row += 1
-            ws[f"E{row}"] = "Итого"
-            ws[f"E{row}"].font = bold_font
-            ws[f"E{row}"].fill = total_fill
-            ws[f"G{row}"] = f"={external_sum_cell}"
-            ws[f"G{row}"].number_format = currency_format
-            ws[f"G{row}"].font = bold_font
-            ws[f"G{row}"].fill = total_fill
-
-    # Автоподбор ширины по max длине текста по всему документу
-    for col in ws.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            if cell.value:
-                # если многострочный текст, разбиваем
-                lines = str(cell.value).split("\n")
-                longest = max(len(line) for line in lines)
-                # можно чуть увеличить запас для чисел и bold текста
-                if cell.font and cell.font.bold:
-                    longest = int(longest * 1.15)
-                max_length = max(max_length, longest)
-        ws.column_dimensions[col_letter].width = max(min(max_length + 3, 33), 10)
-
-    output = BytesIO()
+    # НДС и итоговая сумма
+    if estimate.vat_enabled:
+        row += 1
+        layout.set(row, 5, f"НДС ({estimate.vat_rate}%)", "total_label")
+        layout.set(
+            row,
+            total_col_idx,
+            f"={external_sum_cell}*{estimate.vat_rate/100}",
+            "total_money",
+        )
+
+        row += 1
+        layout.set(row, 5, "Итого с НДС", "total_label")
+        layout.set(
+            row,
+            total_col_idx,
+            f"={external_sum_cell}+{total_column}{row-1}",
+            "total_money",
+        )
+    else:
+        row += 1
+        layout.set(row, 5, "Итого", "total_label")
+        layout.set(row, total_col_idx, f"={external_sum_cell}", "total_money")
+
+    layout.totals = {
+        "external": external_sum_cell,
+        "grand": f"{total_column}{row}",
+    }
+    return layout
+
+
+def _save_workbook(wb: Workbook) -> SpooledTemporaryFile:
+    output = SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_BYTES, suffix=".xlsx")
     wb.save(output)
     output.seek(0)
     return output
+
+
+@timed("render")
+@EXCEL_GENERATION_SECONDS.time("estimate")
+def generate_excel(estimate: Estimate) -> SpooledTemporaryFile:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=estimate.name[:31].replace(":", "-"))
+
+    _write_layout(ws, _build_estimate_layout(estimate))
+
+    return _save_workbook(wb)
+
+
+SUMMARY_HEADERS = [
+    "ID",
+    "Смета",
+    "Клиент",
+    "Статус",
+    "Дата",
+    "Ответственный",
+    "Сумма (внеш.)",
+    "Итого",
+]
+SUMMARY_WIDTHS = [8, 33, 28, 14, 12, 20, 16, 16]
+SHEET_TITLE_FORBIDDEN = re.compile(r"[\\/*?:\[\]]")
+
+
+class EstimatesWorkbookWriter:
+    """
+    Builds one workbook with a summary sheet and a sheet per estimate using
+    the same layout as generate_excel. Every write-only sheet is spooled to
+    its own temporary file by openpyxl, so estimates can be added batch by
+    batch without keeping earlier ones in memory. Summary totals are formulas
+    pointing at the estimate sheets.
+    """
+
+    def __init__(self):
+        self._wb = Workbook(write_only=True)
+        self._summary = self._wb.create_sheet(title="Сводка")
+        for col, width in enumerate(SUMMARY_WIDTHS, start=1):
+            self._summary.column_dimensions[get_column_letter(col)].width = width
+        self._templates = _style_templates(self._summary)
+        self._summary.append([self._styled(header, "header") for header in SUMMARY_HEADERS])
+        self._summary_rows = 0
+        self._elapsed = 0.0
+
+    def _styled(self, value, style: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(self._summary)
+        cell._style = copy(self._templates[style])
+        cell.value = value
+        return cell
+
+    @staticmethod
+    def sheet_title(estimate: Estimate) -> str:
+        title = SHEET_TITLE_FORBIDDEN.sub("-", f"{estimate.id} {estimate.name}")
+        return title[:31]
+
+    def add_estimate(self, estimate: Estimate) -> None:
+        title = self.sheet_title(estimate)
+        ws = self._wb.create_sheet(title=title)
+        layout = _build_estimate_layout(estimate)
+        _write_layout(ws, layout)
+
+        sheet_ref = "'" + title.replace("'", "''") + "'"
+        name_cell = self._styled(estimate.name, "item_text")
+        name_cell.hyperlink = Hyperlink(ref="", location=f"{sheet_ref}!A1")
+        self._summary.append(
+            [
+                self._styled(estimate.id, "item"),
+                name_cell,
+                self._styled(estimate.client.name if estimate.client else "—", "item_text"),
+                self._styled(
+                    STATUS_MAP.get(estimate.status.value, estimate.status.value), "item"
+                ),
+                self._styled(estimate.date.strftime("%d.%m.%Y"), "item"),
+                self._styled(estimate.responsible, "item_text"),
+                self._styled(f"={sheet_ref}!{layout.totals['external']}", "item_money"),
+                self._styled(f"={sheet_ref}!{layout.totals['grand']}", "item_money"),
+            ]
+        )
+        self._summary_rows += 1
+
+    @timed("render")
+    def add_estimates(self, estimates) -> None:
+        started = perf_counter()
+        for estimate in estimates:
+            self.add_estimate(estimate)
+        self._elapsed += perf_counter() - started
+
+    @timed("render")
+    def close(self) -> SpooledTemporaryFile:
+        started = perf_counter()
+        if self._summary_rows:
+            last_row = self._summary_rows + 1
+            self._summary.append([])
+            self._summary.append(
+                [
+                    None,
+                    self._styled("Итого", "total_label"),
+                    None,
+                    None,
+                    None,
+                    None,
+                    self._styled(f"=SUM(G2:G{last_row})", "total_money"),
+                    self._styled(f"=SUM(H2:H{last_row})", "total_money"),
+                ]
+            )
+        output = _save_workbook(self._wb)
+        # Время всех листов, без загрузки пачек смет между ними
+        EXCEL_GENERATION_SECONDS.observe(self._elapsed + perf_counter() - started, "workbook")
+        return output
@@ -0,0 +1,32 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Return the id the next page must start below; 400 for a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = data["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+    return last_id
+
+
+def next_cursor_for(rows: list, limit: int) -> Optional[str]:
+    """Rows are fetched with limit + 1: the extra row only signals that a next page exists."""
+    if len(rows) <= limit:
+        return None
+    del rows[limit:]
+    return encode_cursor(rows[-1].id)
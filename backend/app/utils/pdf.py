@@ -1,13 +1,255 @@
-import pdfkit
-from jinja2 import Environment, FileSystemLoader
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from time import perf_counter
+
+from jinja2 import Environment, FileSystemLoader
+
+from app.core.config import settings
+from app.core.instrumentation import timed
+from app.core.metrics import SLOW_BUCKETS, registry
+from app.utils import pdf_worker
+from app.utils.pdf_cache import PdfCache
 
 templates_dir = Path(__file__).parent.parent / "templates"
 env = Environment(loader=FileSystemLoader(templates_dir))
+logger = logging.getLogger(__name__)
 
+PDF_RENDER_SECONDS = registry.histogram(
+    "pdf_render_duration_seconds",
+    "wkhtmltopdf render time, without the queue wait.",
+    buckets=SLOW_BUCKETS,
+)
+PDF_RENDER_WAIT_SECONDS = registry.histogram(
+    "pdf_render_queue_wait_seconds",
+    "Time a render waited for a free worker.",
+    buckets=SLOW_BUCKETS,
+)
 
-def render_pdf(template_name: str, context: dict) -> bytes:
+
+class PdfRenderQueueFull(RuntimeError):
+    """Raised when every render worker is busy and the wait queue is full."""
+
+
+@timed("render")
+def render_html(template_name: str, context: dict) -> str:
     template = env.get_template(template_name)
-    html = template.render(context)
-    pdf = pdfkit.from_string(html, False)  # False → вернуть как bytes
+    return template.render(context)
+
+
+def html_to_pdf(html: str) -> bytes:
+    return pdf_worker.render(html)
+
+
+def render_pdf(template_name: str, context: dict) -> bytes:
+    return html_to_pdf(render_html(template_name, context))
+
+
+class PdfRenderPool:
+    """
+    Runs blocking wkhtmltopdf renders off the event loop. At most ``workers``
+    renders run at once and at most ``queue_depth`` more wait for a free
+    worker; anything beyond that is rejected with PdfRenderQueueFull.
+
+    With ``processes=True`` every worker thread owns a resident
+    ``wkhtmltopdf --read-args-from-stdin`` process instead of starting the
+    binary per render; the process is recycled after ``max_jobs_per_worker``
+    jobs and replaced transparently if it exits or hangs.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_depth: int,
+        *,
+        processes: bool = False,
+        max_jobs_per_worker: int = 0,
+    ):
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(0, int(queue_depth))
+        self.processes = bool(processes)
+        self.max_jobs_per_worker = max(0, int(max_jobs_per_worker))
+        self._renderer_factory = pdf_worker.ResidentRenderer
+        self._executor: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+        self._renderers: list[pdf_worker.ResidentRenderer] = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._worker_restarts = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="pdf-render",
+                )
+            return self._executor
+
+    def _thread_renderer(self) -> pdf_worker.ResidentRenderer:
+        renderer = getattr(self._local, "renderer", None)
+        if renderer is None:
+            renderer = self._renderer_factory(max_jobs=self.max_jobs_per_worker)
+            self._local.renderer = renderer
+            with self._lock:
+                self._renderers.append(renderer)
+        return renderer
+
+    def _render_resident(self, html: str) -> bytes:
+        # Упавший или зависший wkhtmltopdf перезапускается, а задача
+        # повторяется один раз — рендер идемпотентен.
+        renderer = self._thread_renderer()
+        try:
+            return renderer.render(html)
+        except pdf_worker.ResidentRendererError:
+            with self._lock:
+                self._worker_restarts += 1
+            return renderer.render(html)
+
+    def _run(self, html: str, submitted_at: float | None = None) -> bytes:
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        started = perf_counter()
+        if submitted_at is not None:
+            PDF_RENDER_WAIT_SECONDS.observe(started - submitted_at)
+        try:
+            if self.processes:
+                pdf = self._render_resident(html)
+            else:
+                pdf = html_to_pdf(html)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        finally:
+            PDF_RENDER_SECONDS.observe(perf_counter() - started)
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        return pdf
+
+    async def render(self, html: str) -> bytes:
+        with self._lock:
+            if self._in_flight + self._queued >= self.workers + self.queue_depth:
+                self._rejected += 1
+                raise PdfRenderQueueFull("Очередь генерации PDF переполнена")
+            self._queued += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._get_executor(), self._run, html, perf_counter())
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        with timed("render"):
+            return await future
+
+    def stats(self) -> dict[str, int | bool]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "processes": self.processes,
+                "max_jobs_per_worker": self.max_jobs_per_worker,
+                "worker_restarts": self._worker_restarts,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            renderers, self._renderers = self._renderers, []
+            self._local = threading.local()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for renderer in renderers:
+            renderer.stop()
+
+
+pdf_render_pool = PdfRenderPool(
+    workers=settings.EXPORTS_PDF_WORKERS,
+    queue_depth=settings.EXPORTS_PDF_QUEUE_DEPTH,
+    processes=settings.EXPORTS_PDF_WORKER_PROCESSES,
+    max_jobs_per_worker=settings.EXPORTS_PDF_WORKER_MAX_JOBS,
+)
+
+registry.gauge(
+    "pdf_render_workers",
+    "Renders that can run at once.",
+    callback=lambda: pdf_render_pool.workers,
+)
+registry.gauge(
+    "pdf_render_in_flight",
+    "Renders running now.",
+    callback=lambda: pdf_render_pool.stats()["in_flight"],
+)
+registry.gauge(
+    "pdf_render_queue_depth",
+    "Renders waiting for a free worker.",
+    callback=lambda: pdf_render_pool.stats()["queued"],
+)
+registry.counter(
+    "pdf_render_rejected_total",
+    "Renders rejected because the queue was full.",
+    callback=lambda: pdf_render_pool.stats()["rejected"],
+)
+registry.counter(
+    "pdf_render_failed_total",
+    "Renders that raised an error.",
+    callback=lambda: pdf_render_pool.stats()["failed"],
+)
+
+pdf_cache = PdfCache(
+    directory=settings.EXPORTS_PDF_CACHE_DIR,
+    max_bytes=settings.EXPORTS_PDF_CACHE_MAX_MB * 1024 * 1024,
+    templates_dir=templates_dir,
+    enabled=settings.EXPORTS_PDF_CACHE_ENABLED,
+)
+
+
+async def render_pdf_async(
+    template_name: str,
+    context: dict,
+    *,
+    estimate_id: int | None = None,
+) -> bytes:
+    """
+    Render a template to PDF without blocking the event loop.
+
+    When ``estimate_id`` is given the result is looked up in and stored to the
+    on-disk PDF cache, so repeat downloads of unchanged documents skip
+    wkhtmltopdf entirely.
+    """
+    html = await asyncio.to_thread(render_html, template_name, context)
+    if estimate_id is None or not pdf_cache.enabled:
+        return await pdf_render_pool.render(html)
+
+    cache_key = pdf_cache.build_key(template_name, html)
+    cached = await asyncio.to_thread(pdf_cache.get, estimate_id, cache_key)
+    if cached is not None:
+        return cached
+
+    pdf = await pdf_render_pool.render(html)
+    try:
+        await asyncio.to_thread(pdf_cache.put, estimate_id, cache_key, pdf)
+    except OSError:
+        logger.warning("Failed to store PDF in cache", exc_info=True)
     return pdf
+
+
+def invalidate_estimate_pdfs(estimate_id: int) -> None:
+    if pdf_cache.enabled:
+        pdf_cache.invalidate_estimate(estimate_id)
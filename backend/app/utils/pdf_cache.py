@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+
+class PdfCache:
+    """
+    Disk-backed cache of rendered PDFs.
+
+    Entries are content-addressed: the key combines the template name, a
+    checksum of the template source and a hash of the rendered HTML, so an
+    entry can never be served for changed data. Files live under one
+    directory per estimate, which makes invalidation after an edit a single
+    directory removal. Total size is bounded; the least recently used files
+    (by mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int,
+        templates_dir: str | os.PathLike,
+        enabled: bool = True,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max(0, int(max_bytes))
+        self.templates_dir = Path(templates_dir)
+        self.enabled = bool(enabled) and self.max_bytes > 0
+        self._lock = threading.Lock()
+        self._template_checksums: dict[str, tuple[float, str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def template_checksum(self, template_name: str) -> str:
+        path = self.templates_dir / template_name
+        mtime = path.stat().st_mtime
+        cached = self._template_checksums.get(template_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        checksum = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._template_checksums[template_name] = (mtime, checksum)
+        return checksum
+
+    def build_key(self, template_name: str, html: str) -> str:
+        material = "|".join(
+            [
+                template_name,
+                self.template_checksum(template_name),
+                hashlib.sha256(html.encode("utf-8")).hexdigest(),
+            ]
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, estimate_id: int, key: str) -> Path:
+        return self.directory / str(int(estimate_id)) / f"{key}.pdf"
+
+    def get(self, estimate_id: int, key: str) -> bytes | None:
+        path = self._entry_path(estimate_id, key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return data
+
+    def put(self, estimate_id: int, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._entry_path(estimate_id, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file_obj:
+                file_obj.write(data)
+            os.replace(tmp_name, path)
+        except OSError:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def invalidate_estimate(self, estimate_id: int) -> None:
+        shutil.rmtree(self.directory / str(int(estimate_id)), ignore_errors=True)
+
+    def evict(self) -> None:
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        try:
+            estimate_dirs = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for estimate_dir in estimate_dirs:
+            if not estimate_dir.is_dir():
+                continue
+            for entry in os.scandir(estimate_dir.path):
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort(key=lambda entry: entry[0])
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._evictions += 1
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+
+    def stats(self) -> dict[str, int | bool]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
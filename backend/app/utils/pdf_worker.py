@@ -0,0 +1,139 @@
+# Рендер HTML в PDF через wkhtmltopdf: разовым запуском бинарника (pdfkit)
+# или резидентным процессом `wkhtmltopdf --read-args-from-stdin`, который
+# берёт по задаче на строку stdin и не платит за старт Qt/WebKit каждый раз.
+
+import os
+import re
+import selectors
+import shutil
+import subprocess
+import tempfile
+from time import monotonic
+
+import pdfkit
+
+PDF_OPTIONS = {"encoding": "utf-8"}
+# Те же опции для строки задачи резидентного процесса
+JOB_OPTIONS = ("--encoding", "utf-8")
+JOB_TIMEOUT_SECONDS = 120
+# Без --quiet wkhtmltopdf заканчивает каждую задачу строкой "Done" в stderr
+DONE_LINE = b"Done"
+
+
+class ResidentRendererError(RuntimeError):
+    """The resident wkhtmltopdf process exited or stopped answering mid-job."""
+
+
+def render(html: str) -> bytes:
+    return pdfkit.from_string(html, False, options=PDF_OPTIONS)
+
+
+class ResidentRenderer:
+    """
+    One long-lived ``wkhtmltopdf --read-args-from-stdin`` process. Each job
+    writes the HTML to a file in a private directory and sends one line with
+    the input and output paths; the PDF is read back once the process reports
+    ``Done``. The process starts on first use, is restarted after it exits
+    and recycled after ``max_jobs`` jobs (``0`` - never). Not thread-safe:
+    every pool worker owns its own renderer.
+    """
+
+    def __init__(
+        self,
+        *,
+        binary: str | None = None,
+        max_jobs: int = 0,
+        timeout: float = JOB_TIMEOUT_SECONDS,
+    ):
+        self.binary = binary or shutil.which("wkhtmltopdf") or "wkhtmltopdf"
+        self.max_jobs = max(0, int(max_jobs))
+        self.timeout = timeout
+        self.starts = 0
+        self._process: subprocess.Popen | None = None
+        self._workdir: str | None = None
+        self._jobs = 0
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid if self._process is not None else None
+
+    def _start(self) -> None:
+        self.stop()
+        self._workdir = tempfile.mkdtemp(prefix="wkhtmltopdf-")
+        self._process = subprocess.Popen(
+            [self.binary, "--read-args-from-stdin"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._jobs = 0
+        self.starts += 1
+
+    def stop(self, wait: float = 5) -> None:
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                # Конец stdin — сигнал завершиться после текущей задачи
+                process.stdin.close()
+                process.wait(timeout=wait)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+            process.stderr.close()
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+    def _wait_until_done(self) -> None:
+        stderr = self._process.stderr
+        deadline = monotonic() + self.timeout
+        pending = b""
+        output = []
+        with selectors.DefaultSelector() as selector:
+            selector.register(stderr, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise ResidentRendererError(f"wkhtmltopdf не ответил за {self.timeout} с")
+                if not selector.select(remaining):
+                    continue
+                chunk = os.read(stderr.fileno(), 65536)
+                if not chunk:
+                    tail = b"\n".join(output[-5:]).decode("utf-8", "replace")
+                    raise ResidentRendererError(f"wkhtmltopdf завершился во время рендера: {tail}")
+                # Прогресс-бар перерисовывается через \r
+                *lines, pending = re.split(rb"[\r\n]", pending + chunk)
+                for line in lines:
+                    if line.strip() == DONE_LINE:
+                        return
+                    if line.strip():
+                        output.append(line.strip())
+
+    def render(self, html: str) -> bytes:
+        if (
+            self._process is None
+            or self._process.poll() is not None
+            or (self.max_jobs and self._jobs >= self.max_jobs)
+        ):
+            self._start()
+        source = os.path.join(self._workdir, "job.html")
+        target = os.path.join(self._workdir, "job.pdf")
+        try:
+            with open(source, "w", encoding="utf-8") as file:
+                file.write(html)
+            if os.path.exists(target):
+                os.remove(target)
+            line = " ".join((*JOB_OPTIONS, source, target)) + "\n"
+            self._process.stdin.write(line.encode("utf-8"))
+            self._process.stdin.flush()
+            self._wait_until_done()
+            with open(target, "rb") as file:
+                pdf = file.read()
+        except OSError as exc:
+            self.stop(wait=0)
+            raise ResidentRendererError(f"wkhtmltopdf не отрендерил задачу: {exc}") from exc
+        except ResidentRendererError:
+            self.stop(wait=0)
+            raise
+        self._jobs += 1
+        return pdf
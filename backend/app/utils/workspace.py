@@ -6,6 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.core.instrumentation import timed
 from app.models.organization import (
     OrganizationMembership,
     WORKSPACE_ROLE_ADMIN,
@@ -81,6 +82,11 @@ async def get_workspace_context(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> WorkspaceContext:
+    with timed("auth"):
+        return await _load_workspace_context(db, current_user)
+
+
+async def _load_workspace_context(db: AsyncSession, current_user: User) -> WorkspaceContext:
     if current_user.current_organization_id is None:
         raise HTTPException(
             status_code=409,
@@ -0,0 +1,44 @@
+## backend/app/utils/zip_stream.py
+
+import io
+import zipfile
+from typing import AsyncIterable, AsyncIterator
+
+
+class _ZipChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink: ZipFile falls back to data descriptors."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(entries: AsyncIterable[tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """
+    Build a ZIP archive on the fly. Each entry is emitted as soon as it arrives,
+    so only the entry currently being written is ever held in memory.
+    """
+    buffer = _ZipChunkBuffer()
+    # PDF и xlsx уже сжаты — повторное сжатие только тратит CPU.
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, data in entries:
+            archive.writestr(name, data)
+            yield buffer.drain()
+    yield buffer.drain()
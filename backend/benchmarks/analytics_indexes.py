@@ -0,0 +1,204 @@
+# backend/benchmarks/analytics_indexes.py
+"""
+Query plans of the analytics and estimate list access paths with and
+without the filter indexes (migration e8f9a0b1c2d3).
+
+    python -m benchmarks.analytics_indexes --items 1000000 --runs 3
+    python -m benchmarks.analytics_indexes --plans > plans.json
+
+Uses the dataset of ``benchmarks.analytics_single_pass`` (seeded on first
+run with the same ``--seed``). Every query is run under
+``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``: first inside a transaction
+that drops the indexes and is rolled back afterwards ("before"), then with
+the indexes in place ("after"). The drop takes exclusive locks on
+estimates and estimate_items — run it against a benchmark database only.
+Prints a JSON report; ``--plans`` adds the full plans.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.api.estimates import append_estimate_list_filters, estimate_summary_query
+from app.cli import load_models
+from app.core.database import engine
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.schemas.analytics import GranularityEnum
+from app.services.analytics_engine import AnalyticsFilters, analytics_sections, single_pass_query
+from benchmarks.analytics_single_pass import CATEGORIES, seed_dataset
+
+INDEXES = (
+    "ix_estimate_items_estimate_id",
+    "ix_estimate_items_template_id",
+    "ix_estimate_items_lower_category_estimate_id",
+    "ix_estimates_organization_id_status_date",
+    "ix_estimates_organization_id_client_id_date",
+)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _index_names(node: dict) -> set[str]:
+    names = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+async def _explain(conn, statement, runs: int, keep_plan: bool) -> dict:
+    plans = []
+    for _ in range(runs):
+        raw = await conn.scalar(Explain(statement))
+        plans.append((json.loads(raw) if isinstance(raw, str) else raw)[0])
+    root = plans[-1]["Plan"]
+    report = {
+        "execution_ms": round(statistics.median(plan["Execution Time"] for plan in plans), 2),
+        "planning_ms": round(statistics.median(plan["Planning Time"] for plan in plans), 2),
+        "total_cost": root["Total Cost"],
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+        "indexes": sorted(_index_names(root)),
+    }
+    if keep_plan:
+        report["plan"] = root
+    return report
+
+
+async def _queries(conn, organization_id: int) -> dict:
+    client_id, user_id = (
+        await conn.execute(
+            select(Estimate.client_id, func.min(Estimate.user_id))
+            .where(Estimate.organization_id == organization_id, Estimate.client_id.is_not(None))
+            .group_by(Estimate.client_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+    ).one()
+    estimate_id = await conn.scalar(
+        select(func.max(Estimate.id)).where(Estimate.organization_id == organization_id)
+    )
+    recent = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def analytics(**filters):
+        top_clients_limit = None if "client_id" in filters else 10
+        sections = analytics_sections(
+            AnalyticsFilters.build(organization_id, **filters),
+            GranularityEnum.month,
+            top_clients_limit=top_clients_limit,
+            use_rollups=False,
+        )
+        return single_pass_query(sections)
+
+    list_filters = append_estimate_list_filters(
+        [Estimate.organization_id == organization_id], status=EstimateStatus.APPROVED.value
+    )
+    return {
+        "analytics": analytics(),
+        "analytics_category": analytics(categories=[CATEGORIES[0]]),
+        "analytics_status_90_days": analytics(
+            status=[EstimateStatus.APPROVED], start_date=recent - timedelta(days=90)
+        ),
+        "client_analytics": analytics(client_id=client_id),
+        "estimate_items": select(EstimateItem).where(EstimateItem.estimate_id == estimate_id),
+        "estimate_list_status": estimate_summary_query(user_id)
+        .where(*list_filters)
+        .order_by(Estimate.id.desc())
+        .limit(21),
+        "estimate_list_client_period": estimate_summary_query(user_id)
+        .where(
+            Estimate.organization_id == organization_id,
+            Estimate.client_id == client_id,
+            Estimate.date >= recent - timedelta(days=365),
+        )
+        .order_by(Estimate.id.desc())
+        .limit(21),
+    }
+
+
+async def _explain_all(conn, queries: dict, args) -> dict:
+    return {
+        name: await _explain(conn, statement, args.runs, args.plans)
+        for name, statement in queries.items()
+    }
+
+
+async def run(args) -> dict:
+    load_models()
+    try:
+        async with engine.begin() as conn:
+            organization_id = await seed_dataset(conn, args)
+
+        async with engine.connect() as conn:
+            existing = set(
+                (
+                    await conn.execute(
+                        text("SELECT indexname FROM pg_indexes WHERE indexname = ANY(:names)"),
+                        {"names": list(INDEXES)},
+                    )
+                ).scalars()
+            )
+            missing = sorted(set(INDEXES) - existing)
+            if missing:
+                raise SystemExit(f"Indexes not found, run the migrations first: {', '.join(missing)}")
+            await conn.execute(text("ANALYZE estimates"))
+            await conn.execute(text("ANALYZE estimate_items"))
+            queries = await _queries(conn, organization_id)
+            await conn.commit()
+
+            # DROP INDEX транзакционен: откат возвращает индексы без пересоздания
+            transaction = await conn.begin()
+            for name in INDEXES:
+                await conn.execute(text(f"DROP INDEX {name}"))
+            before = await _explain_all(conn, queries, args)
+            await transaction.rollback()
+
+            async with conn.begin():
+                after = await _explain_all(conn, queries, args)
+
+        report = {"items": args.items, "runs": args.runs, "queries": {}}
+        for name in queries:
+            report["queries"][name] = {
+                "before": before[name],
+                "after": after[name],
+                "speedup": round(
+                    before[name]["execution_ms"] / max(after[name]["execution_ms"], 0.001), 2
+                ),
+            }
+        return report
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Analytics index EXPLAIN benchmark")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--items-per-estimate", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--plans", action="store_true", help="include the full JSON plans")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# backend/benchmarks/analytics_single_pass.py
+"""
+Round trips and latency of the global analytics: one query per section
+(how the endpoint used to work) versus the single CTE + UNION ALL statement,
+over raw estimates/items and over the daily rollups, and the sections run
+concurrently on separate pooled connections.
+
+    python -m benchmarks.analytics_single_pass --items 1000000 --runs 5 --concurrency 3
+
+Needs a migrated PostgreSQL database at DATABASE_URL. The dataset is seeded
+once into a dedicated "bench-analytics" organization and reused by later
+runs (``--reseed`` drops and recreates it). Prints a JSON report.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, insert, select
+
+from app.cli import load_models
+from app.core.config import settings
+from app.core.database import analytics_sections_engine, engine
+from app.models.client import Client
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.models.organization import Organization
+from app.models.user import User
+from app.schemas.analytics import GranularityEnum
+from app.services.analytics_engine import (
+    AnalyticsFilters,
+    analytics_sections,
+    collect_sections,
+    execute_sections_concurrently,
+    single_pass_query,
+)
+from app.services.analytics_rollups import defer_rollup_refresh, rebuild_organization_rollups
+
+BENCH_SLUG = "bench-analytics"
+CATEGORIES = ["Звук", "Свет", "Сцена", "Персонал", "Логистика", "Видео"]
+RESPONSIBLE = ["Анна", "Иван", "Олег", "Мария", "Павел"]
+BATCH_SIZE = 2000
+
+
+async def _drop_dataset(conn, organization_id: int) -> None:
+    estimate_ids = select(Estimate.id).where(Estimate.organization_id == organization_id)
+    await conn.execute(delete(EstimateItem).where(EstimateItem.estimate_id.in_(estimate_ids)))
+    await conn.execute(delete(Estimate).where(Estimate.organization_id == organization_id))
+    await conn.execute(delete(Client).where(Client.organization_id == organization_id))
+
+
+def _estimate_rows(rng: random.Random, count: int, items_per_estimate: int, context: dict):
+    estimates, items = [], []
+    for _ in range(count):
+        use_internal_price = rng.random() < 0.5
+        vat_enabled = rng.random() < 0.7
+        estimate_items = []
+        for _ in range(items_per_estimate):
+            internal_price = rng.randint(10, 500) * 100.0
+            estimate_items.append(
+                {
+                    "name": f"Услуга {rng.randint(1, 400)}",
+                    "quantity": rng.randint(1, 10),
+                    "internal_price": internal_price,
+                    "external_price": internal_price + rng.randint(0, 300) * 100.0,
+                    "category": rng.choice(CATEGORIES),
+                }
+            )
+        # Итоги — как в apply_estimate_totals, чтобы аналитика читала их из сметы
+        total_internal = sum(i["quantity"] * i["internal_price"] for i in estimate_items)
+        total_external = sum(i["quantity"] * i["external_price"] for i in estimate_items)
+        estimates.append(
+            {
+                "name": "Смета",
+                "date": context["since"] + timedelta(minutes=rng.randint(0, context["span_minutes"])),
+                "client_id": rng.choice(context["client_ids"]),
+                "responsible": rng.choice(RESPONSIBLE),
+                "status": rng.choice(list(EstimateStatus)),
+                "vat_enabled": vat_enabled,
+                "vat_rate": 20,
+                "use_internal_price": use_internal_price,
+                "items_count": len(estimate_items),
+                "total_internal": total_internal,
+                "total_external": total_external,
+                "margin": total_external - total_internal,
+                "total_with_vat": total_external * (1.2 if vat_enabled else 1),
+                "user_id": context["user_id"],
+                "organization_id": context["organization_id"],
+            }
+        )
+        items.append(estimate_items)
+    return estimates, items
+
+
+async def seed_dataset(conn, args) -> int:
+    # Дневные агрегаты пересчитываются одним запросом в конце, а не триггерами на каждую пачку
+    await defer_rollup_refresh(conn)
+    organization_id = await conn.scalar(
+        select(Organization.id).where(Organization.slug == BENCH_SLUG)
+    )
+    if organization_id is not None:
+        if not args.reseed:
+            return organization_id
+        await _drop_dataset(conn, organization_id)
+    else:
+        organization_id = await conn.scalar(
+            insert(Organization).values(name="Benchmark", slug=BENCH_SLUG).returning(Organization.id)
+        )
+
+    user_id = await conn.scalar(select(User.id).where(User.login == BENCH_SLUG))
+    if user_id is None:
+        user_id = await conn.scalar(
+            insert(User)
+            .values(email=f"{BENCH_SLUG}@example.com", login=BENCH_SLUG, hashed_password="-")
+            .returning(User.id)
+        )
+
+    client_rows = [
+        {"name": f"Клиент {index}", "user_id": user_id, "organization_id": organization_id}
+        for index in range(args.clients)
+    ]
+    result = await conn.execute(
+        insert(Client).returning(Client.id, sort_by_parameter_order=True), client_rows
+    )
+    context = {
+        "client_ids": result.scalars().all(),
+        "user_id": user_id,
+        "organization_id": organization_id,
+        "since": datetime.now(timezone.utc) - timedelta(days=3 * 365),
+        "span_minutes": 3 * 365 * 24 * 60,
+    }
+
+    rng = random.Random(args.seed)
+    total = max(1, args.items // args.items_per_estimate)
+    for offset in range(0, total, BATCH_SIZE):
+        estimates, items = _estimate_rows(
+            rng, min(BATCH_SIZE, total - offset), args.items_per_estimate, context
+        )
+        result = await conn.execute(
+            insert(Estimate).returning(Estimate.id, sort_by_parameter_order=True), estimates
+        )
+        item_rows = [
+            {**item, "estimate_id": estimate_id}
+            for estimate_id, estimate_items in zip(result.scalars().all(), items)
+            for item in estimate_items
+        ]
+        await conn.execute(insert(EstimateItem), item_rows)
+    await rebuild_organization_rollups(conn, organization_id)
+    await conn.exec_driver_sql("ANALYZE estimates")
+    await conn.exec_driver_sql("ANALYZE estimate_items")
+    return organization_id
+
+
+async def _measure(conn, statements: list, runs: int, counter: dict) -> dict:
+    timings = []
+    round_trips = 0
+    rows = []
+    for _ in range(runs):
+        counter["queries"] = 0
+        started = time.perf_counter()
+        rows = []
+        for statement in statements:
+            rows.extend((await conn.execute(statement)).all())
+        timings.append((time.perf_counter() - started) * 1000)
+        round_trips = counter["queries"]
+    return {
+        "round_trips": round_trips,
+        "latency_ms": {
+            "min": round(min(timings), 1),
+            "median": round(statistics.median(timings), 1),
+            "max": round(max(timings), 1),
+        },
+        "result": collect_sections(rows),
+    }
+
+
+async def _measure_concurrent(sections: dict, runs: int, limit: int, counter: dict) -> dict:
+    timings = []
+    section_timings = {}
+    round_trips = 0
+    rows = []
+    for _ in range(runs):
+        counter["queries"] = 0
+        started = time.perf_counter()
+        rows, section_timings = await execute_sections_concurrently(sections, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+        round_trips = counter["queries"]
+    return {
+        "round_trips": round_trips,
+        "concurrency": limit,
+        "latency_ms": {
+            "min": round(min(timings), 1),
+            "median": round(statistics.median(timings), 1),
+            "max": round(max(timings), 1),
+        },
+        "section_ms": {name: round(value, 1) for name, value in sorted(section_timings.items())},
+        "result": collect_sections(rows),
+    }
+
+
+async def run(args) -> dict:
+    load_models()
+    counter = {"queries": 0}
+
+    def _count(*_args, **_kwargs):
+        counter["queries"] += 1
+
+    for counted in (engine, analytics_sections_engine):
+        event.listen(counted.sync_engine, "before_cursor_execute", _count)
+    try:
+        async with engine.begin() as conn:
+            organization_id = await seed_dataset(conn, args)
+
+        report = {"items": args.items, "runs": args.runs, "categories": args.categories}
+        filters = AnalyticsFilters.build(organization_id, categories=args.categories)
+        async with engine.connect() as conn:
+            for granularity in (GranularityEnum.month, GranularityEnum.week):
+                # Сначала по сметам и позициям, затем из дневных агрегатов
+                sections = analytics_sections(filters, granularity, use_rollups=False)
+                rollup_sections = analytics_sections(filters, granularity, use_rollups=True)
+                per_section = await _measure(conn, list(sections.values()), args.runs, counter)
+                single_pass = await _measure(conn, [single_pass_query(sections)], args.runs, counter)
+                rollups = await _measure(conn, [single_pass_query(rollup_sections)], args.runs, counter)
+                concurrent = await _measure_concurrent(sections, args.runs, args.concurrency, counter)
+                # Суммы float могут расходиться в последних знаках, счётчики — нет
+                expected = per_section.pop("result")
+                for variant in (single_pass, rollups, concurrent):
+                    actual = variant.pop("result")
+                    assert expected["total_estimates"] == actual["total_estimates"]
+                    assert len(expected["timeseries"]) == len(actual["timeseries"])
+                baseline = per_section["latency_ms"]["median"]
+                report[granularity.value] = {
+                    "per_section": per_section,
+                    "single_pass": single_pass,
+                    "single_pass_rollups": rollups,
+                    "concurrent": concurrent,
+                    "speedup": round(baseline / single_pass["latency_ms"]["median"], 2),
+                    "speedup_rollups": round(baseline / rollups["latency_ms"]["median"], 2),
+                    "speedup_concurrent": round(baseline / concurrent["latency_ms"]["median"], 2),
+                }
+        return report
+    finally:
+        for counted in (engine, analytics_sections_engine):
+            event.remove(counted.sync_engine, "before_cursor_execute", _count)
+            await counted.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Single-pass analytics benchmark")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--items-per-estimate", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--categories", nargs="*", default=None)
+    parser.add_argument("--concurrency", type=int, default=settings.ANALYTICS_SECTION_CONCURRENCY)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reseed", action="store_true")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# backend/benchmarks/api_endpoints.py
+"""
+Latency, throughput and SQL statements of the hot API endpoints, with the
+ASGI app driven in-process through httpx (no server, no network).
+
+    python -m app.cli.dataset generate --slug bench --estimates 20000
+    python -m benchmarks.api_endpoints --slug bench --requests 200 --concurrency 8
+    python -m benchmarks.api_endpoints --slug bench --output after.json --baseline before.json
+
+Needs a migrated PostgreSQL database at DATABASE_URL with a dataset from
+``app.cli.dataset`` (requests are made as its owner, ``<slug>-user-0``).
+Endpoints are measured one after another, each after a few warm-up
+requests. The report (p50/p95/p99/mean latency, requests per second,
+statements per request, error count per endpoint, plus the commit and
+settings) is printed and written to --output; with --baseline the p95
+change against an earlier report is added. Write endpoints modify the
+dataset: each update and autosave adds versions or drafts.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event, select
+
+from app.core.config import settings
+from app.core.database import SessionLocal, analytics_sections_engine, engine
+from app.main import app
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.user import User
+from app.services.analytics_cache import analytics_cache
+from app.utils.auth import create_access_token
+
+# Счётчик запросов к БД текущего HTTP-запроса; ASGITransport выполняет
+# приложение в задаче клиента, так что контекст доходит до событий движка
+_request_stats: ContextVar[dict | None] = ContextVar("bench_request_stats", default=None)
+
+
+def _count_statement(*_args, **_kwargs) -> None:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    rank = math.ceil(percent / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _fixtures(slug: str, estimates: int, seed: int) -> dict:
+    async with SessionLocal() as db:
+        user = await db.scalar(select(User).where(User.login == f"{slug}-user-0"))
+        if user is None or user.current_organization_id is None:
+            raise SystemExit(f"No dataset for {slug!r}: run python -m app.cli.dataset generate --slug {slug}")
+        result = await db.execute(
+            select(Estimate.id)
+            .where(
+                Estimate.organization_id == user.current_organization_id,
+                Estimate.status == EstimateStatus.DRAFT,
+                Estimate.read_only.is_(False),
+            )
+            .order_by(Estimate.id)
+        )
+        estimate_ids = list(result.scalars().all())
+    if not estimate_ids:
+        raise SystemExit("The dataset has no editable draft estimates")
+    rng = random.Random(seed)
+    return {
+        "token": create_access_token({"sub": str(user.id)}),
+        "estimate_ids": rng.sample(estimate_ids, k=min(estimates, len(estimate_ids))),
+        "bodies": {},
+    }
+
+
+UPDATE_FIELDS = (
+    "name",
+    "client_id",
+    "responsible",
+    "event_datetime",
+    "event_place",
+    "status",
+    "vat_enabled",
+    "vat_rate",
+    "use_internal_price",
+    "read_only",
+)
+
+
+def _update_body(estimate: dict, step: int) -> dict:
+    body = {key: estimate[key] for key in UPDATE_FIELDS}
+    body["items"] = [dict(item) for item in estimate["items"]]
+    body["items"][0]["quantity"] = 1 + step % 10
+    return body
+
+
+def _scenarios(fixtures: dict) -> dict:
+    """Endpoint name -> coroutine function making one request with the client."""
+    ids = fixtures["estimate_ids"]
+    bodies = fixtures["bodies"]
+
+    def estimate_id(step: int) -> int:
+        return ids[step % len(ids)]
+
+    def update(client: httpx.AsyncClient, step: int):
+        target = estimate_id(step)
+        return client.put(f"/api/estimates/{target}", json=_update_body(bodies[target], step))
+
+    return {
+        "estimates_list": lambda client, step: client.get("/api/estimates/", params={"limit": 20}),
+        "estimates_summary": lambda client, step: client.get("/api/estimates/summary", params={"limit": 20}),
+        "estimate_get": lambda client, step: client.get(f"/api/estimates/{estimate_id(step)}"),
+        "estimate_update": update,
+        "estimate_autosave": lambda client, step: client.patch(
+            f"/api/estimates/{estimate_id(step)}/autosave", json={"event_place": f"Зал {step % 7}"}
+        ),
+        "analytics_dashboard": lambda client, step: client.get(
+            "/api/analytics/", params={"granularity": ("month", "week", "quarter")[step % 3]}
+        ),
+        "clients_pipeline": lambda client, step: client.get("/api/clients/pipeline"),
+        "approvals_inbox": lambda client, step: client.get("/api/approvals/my"),
+        "export_estimate_excel": lambda client, step: client.get(
+            f"/api/estimates/{estimate_id(step)}/export/excel"
+        ),
+        "export_analytics_csv": lambda client, step: client.get(
+            "/api/analytics/export", params={"format": "csv"}
+        ),
+    }
+
+
+async def _measure(client, request, requests: int, concurrency: int, warmup: int) -> dict:
+    for step in range(warmup):
+        await request(client, step)
+
+    latencies: list[float] = []
+    queries: list[int] = []
+    errors = 0
+    steps = iter(range(warmup, warmup + requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for step in steps:
+            stats = {"queries": 0}
+            token = _request_stats.set(stats)
+            started = time.perf_counter()
+            try:
+                response = await request(client, step)
+            finally:
+                _request_stats.reset(token)
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(stats["queries"])
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "queries_per_request": {
+            "mean": round(sum(queries) / len(queries), 2),
+            "max": max(queries),
+        },
+    }
+
+
+def _compare(report: dict, baseline: dict) -> None:
+    for name, result in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        before = previous["latency_ms"]["p95"]
+        result["baseline"] = {
+            "commit": baseline.get("commit"),
+            "p95_ms": before,
+            "p95_change_pct": round((result["latency_ms"]["p95"] - before) / before * 100, 1) if before else None,
+            "queries_change": round(
+                result["queries_per_request"]["mean"] - previous["queries_per_request"]["mean"], 2
+            ),
+        }
+
+
+async def run(args) -> dict:
+    if args.cold_analytics:
+        analytics_cache.enabled = False
+    # Секции аналитики идут через отдельный пул — считаем запросы и там
+    for counted in (engine, analytics_sections_engine):
+        event.listen(counted.sync_engine, "before_cursor_execute", _count_statement)
+    try:
+        fixtures = await _fixtures(args.slug, args.estimates, args.seed)
+        scenarios = _scenarios(fixtures)
+        selected = args.endpoint or list(scenarios)
+        unknown = sorted(set(selected) - set(scenarios))
+        if unknown:
+            raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}; known: {', '.join(scenarios)}")
+        report = {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "slug": args.slug,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "settings": {
+                "analytics_cache": analytics_cache.enabled,
+                "analytics_rollups": settings.ANALYTICS_ROLLUPS_ENABLED,
+                "analytics_concurrent_sections": settings.ANALYTICS_CONCURRENT_SECTIONS,
+                "autosave_coalesce": settings.AUTOSAVE_COALESCE_ENABLED,
+                "pdf_cache": settings.EXPORTS_PDF_CACHE_ENABLED,
+            },
+            "endpoints": {},
+        }
+        # Исключения приложения превращаются в 500 и попадают в errors,
+        # а не обрывают весь прогон без отчёта
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        headers = {"Authorization": f"Bearer {fixtures['token']}"}
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", headers=headers, timeout=None
+        ) as client:
+            if "estimate_update" in selected:
+                # Тела PUT — из текущих смет, до замеров
+                for target in fixtures["estimate_ids"]:
+                    fixtures["bodies"][target] = (await client.get(f"/api/estimates/{target}")).json()
+            for name in selected:
+                report["endpoints"][name] = await _measure(
+                    client, scenarios[name], args.requests, args.concurrency, args.warmup
+                )
+        return report
+    finally:
+        for counted in (engine, analytics_sections_engine):
+            event.remove(counted.sync_engine, "before_cursor_execute", _count_statement)
+            await counted.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="In-process API endpoint benchmark")
+    parser.add_argument("--slug", default="dataset", help="organization generated by app.cli.dataset")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--estimates", type=int, default=100, help="distinct estimates to read and write")
+    parser.add_argument("--endpoint", action="append", help="only this endpoint (repeatable)")
+    parser.add_argument("--cold-analytics", action="store_true", help="disable the analytics result cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier report to compare p95 and statements with")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        _compare(report, json.loads(args.baseline.read_text(encoding="utf-8")))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# backend/benchmarks/pdf_render_pool.py
+"""
+Latency and throughput of PDF renders on threads versus renderer processes.
+
+    python -m benchmarks.pdf_render_pool --renders 60 --concurrency 4 --items 40
+
+Renders the estimate PDF template for a synthetic estimate through
+``PdfRenderPool`` in both modes with the same worker count: one wkhtmltopdf
+run per render (``pdf_worker_processes = false``) and resident
+``wkhtmltopdf --read-args-from-stdin`` processes (``true``). Resident
+processes are started before the measurement, so the numbers show the
+steady-state saving of skipping the binary and Qt/WebKit start-up per
+render. Needs wkhtmltopdf on PATH. Prints a JSON report.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.export_documents import calculate_estimate_totals
+from app.utils.pdf import PdfRenderPool, render_html
+
+
+def _estimate(items: int) -> SimpleNamespace:
+    rows = [
+        SimpleNamespace(
+            name=f"Позиция {index + 1}",
+            description="Аренда оборудования с доставкой и монтажом",
+            quantity=1 + index % 5,
+            unit="шт",
+            internal_price=1000.0 + index * 10,
+            external_price=1500.0 + index * 15,
+            category=("Звук", "Свет", "Сцена", "Персонал")[index % 4],
+        )
+        for index in range(items)
+    ]
+    return SimpleNamespace(
+        id=1,
+        name="Корпоратив",
+        client=SimpleNamespace(name="ООО Ромашка", company="Ромашка", email="info@example.com"),
+        responsible="Иван",
+        event_place="Москва",
+        event_datetime=datetime(2026, 10, 1, 18, tzinfo=timezone.utc),
+        date=datetime(2026, 9, 1, tzinfo=timezone.utc),
+        status=SimpleNamespace(value="draft"),
+        vat_enabled=True,
+        vat_rate=20,
+        use_internal_price=True,
+        items=rows,
+    )
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+async def _measure(pool: PdfRenderPool, html: str, renders: int, concurrency: int) -> dict:
+    # Прогрев: в резидентном режиме — запуск wkhtmltopdf в каждом воркере
+    await asyncio.gather(*(pool.render(html) for _ in range(pool.workers)))
+
+    latencies: list[float] = []
+    remaining = iter(range(renders))
+
+    async def worker() -> None:
+        for _ in remaining:
+            started = time.perf_counter()
+            await pool.render(html)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "renders": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 1),
+            "p95": round(_percentile(latencies, 95), 1),
+            "mean": round(statistics.fmean(latencies), 1),
+        },
+    }
+
+
+async def run(args) -> dict:
+    estimate = _estimate(args.items)
+    html = render_html(
+        "estimate_pdf.html", {"estimate": estimate, **calculate_estimate_totals(estimate)}
+    )
+    report = {
+        "renders": args.renders,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "html_bytes": len(html.encode("utf-8")),
+    }
+    for name, processes in (("per_render", False), ("resident", True)):
+        pool = PdfRenderPool(
+            workers=args.workers,
+            queue_depth=args.renders,
+            processes=processes,
+            max_jobs_per_worker=settings.EXPORTS_PDF_WORKER_MAX_JOBS,
+        )
+        try:
+            report[name] = await _measure(pool, html, args.renders, args.concurrency)
+        finally:
+            pool.shutdown()
+    report["resident_speedup"] = round(
+        report["resident"]["throughput_per_s"] / report["per_render"]["throughput_per_s"], 2
+    )
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="PDF render pool benchmark")
+    parser.add_argument("--renders", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=settings.EXPORTS_PDF_WORKERS)
+    parser.add_argument("--items", type=int, default=40, help="estimate items in the rendered document")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
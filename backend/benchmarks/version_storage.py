@@ -0,0 +1,137 @@
+# backend/benchmarks/version_storage.py
+"""
+Storage size and restore latency of estimate version snapshots.
+
+    python -m benchmarks.version_storage --versions 300 --items 60
+
+Simulates an estimate edited many times (a few items or fields change per
+save) and compares full JSON snapshots with keyframes + deltas, with and
+without compression. Restore latency is the time to rebuild one snapshot
+(keyframe plus at most one delta). Prints a JSON report.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.version_store import encode_version, version_payload, VERSION_KIND_KEYFRAME
+
+
+def _initial_payload(rng: random.Random, items: int) -> dict:
+    return {
+        "id": 1,
+        "name": "Корпоратив",
+        "client_id": 3,
+        "client": {"id": 3, "name": "ООО Ромашка", "company": "Ромашка", "email": "info@example.com"},
+        "responsible": "Иван",
+        "event_place": "Москва",
+        "event_datetime": "2026-10-01T18:00:00+00:00",
+        "status": "draft",
+        "vat_enabled": True,
+        "vat_rate": 20,
+        "use_internal_price": True,
+        "read_only": False,
+        "updated_at": "2026-09-01T10:00:00+00:00",
+        "items": [
+            {
+                "id": index + 1,
+                "name": f"Позиция {index + 1}",
+                "description": "Аренда оборудования с доставкой и монтажом",
+                "quantity": rng.randint(1, 10),
+                "unit": "шт",
+                "internal_price": rng.randint(10, 500) * 100.0,
+                "external_price": rng.randint(10, 700) * 100.0,
+                "category": rng.choice(["Звук", "Свет", "Сцена", "Персонал"]),
+            }
+            for index in range(items)
+        ],
+    }
+
+
+def _edit(rng: random.Random, payload: dict, step: int) -> dict:
+    payload = json.loads(json.dumps(payload))
+    payload["updated_at"] = f"2026-09-{1 + step % 28:02d}T10:{step % 60:02d}:00+00:00"
+    items = payload["items"]
+    for item in rng.sample(items, k=min(len(items), rng.randint(1, 3))):
+        item["quantity"] = rng.randint(1, 10)
+    if rng.random() < 0.2:
+        items.append({**items[-1], "id": max(item["id"] for item in items) + 1, "name": f"Новая {step}"})
+    if rng.random() < 0.1 and len(items) > 1:
+        items.pop(rng.randrange(len(items)))
+    if rng.random() < 0.1:
+        payload["status"] = rng.choice(["draft", "sent", "approved"])
+    return payload
+
+
+def _store(history: list[dict], interval: int, compression: str) -> list:
+    settings.VERSIONS_KEYFRAME_INTERVAL = interval
+    settings.VERSIONS_COMPRESSION = compression
+    rows = []
+    keyframe = None
+    for version, payload in enumerate(history, start=1):
+        row = SimpleNamespace(version=version, **encode_version(version, payload, keyframe))
+        rows.append(row)
+        if row.kind == VERSION_KIND_KEYFRAME:
+            keyframe = row
+    return rows
+
+
+def _restore_latency_ms(rows: list, samples: list[int]) -> dict:
+    by_version = {row.version: row for row in rows}
+    timings = []
+    for version in samples:
+        started = time.perf_counter()
+        row = by_version[version]
+        base = version_payload(by_version[row.base_version]) if row.base_version else None
+        version_payload(row, base)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50": round(statistics.median(timings), 4),
+        "p95": round(timings[int(len(timings) * 0.95) - 1], 4),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Estimate version storage benchmark")
+    parser.add_argument("--versions", type=int, default=300)
+    parser.add_argument("--items", type=int, default=60)
+    parser.add_argument("--interval", type=int, default=settings.VERSIONS_KEYFRAME_INTERVAL)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    history = [_initial_payload(rng, args.items)]
+    for step in range(1, args.versions):
+        history.append(_edit(rng, history[-1], step))
+    samples = [rng.randint(1, args.versions) for _ in range(500)]
+
+    variants = {
+        "full_json": (1, "none"),
+        "full_zlib": (1, "zlib"),
+        "delta_json": (args.interval, "none"),
+        "delta_zlib": (args.interval, "zlib"),
+    }
+    report = {"versions": args.versions, "items": args.items, "keyframe_interval": args.interval}
+    for name, (interval, compression) in variants.items():
+        rows = _store(history, interval, compression)
+        for row in rows:
+            base = next((r for r in rows if r.version == row.base_version), None)
+            assert version_payload(row, version_payload(base) if base else None) == history[row.version - 1]
+        report[name] = {
+            "bytes": sum(row.size_bytes for row in rows),
+            "keyframes": sum(1 for row in rows if row.kind == VERSION_KIND_KEYFRAME),
+            "restore_ms": _restore_latency_ms(rows, samples),
+        }
+    baseline = report["full_json"]["bytes"]
+    for name in variants:
+        report[name]["ratio"] = round(report[name]["bytes"] / baseline, 4)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.cli import load_models
+
+# Все мапперы регистрируются, как в процессе API: иначе связи по имени
+# ("Note" и т.п.) не разрешаются в тестах, импортирующих отдельные модели
+load_models()
+
+# Тесты с фикстурой pg_sessionmaker идут против настоящего Postgres:
+# TEST_DATABASE_URL=postgresql+asyncpg://user@host:port/db (база очищается)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="session")
+def pg_database_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from alembic import command
+    from alembic.config import Config
+
+    # Без файла конфигурации: env.py тогда не трогает настройки логирования
+    config = Config()
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    previous = os.environ.get("ALEMBIC_DATABASE_URL")
+    os.environ["ALEMBIC_DATABASE_URL"] = TEST_DATABASE_URL
+    try:
+        command.upgrade(config, "head")
+    finally:
+        if previous is None:
+            os.environ.pop("ALEMBIC_DATABASE_URL", None)
+        else:
+            os.environ["ALEMBIC_DATABASE_URL"] = previous
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+async def pg_engine(pg_database_url):
+    engine = create_async_engine(pg_database_url, poolclass=NullPool)
+    async with engine.begin() as conn:
+        tables = (
+            await conn.execute(
+                text(
+                    "SELECT tablename FROM pg_tables "
+                    "WHERE schemaname = 'public' AND tablename <> 'alembic_version'"
+                )
+            )
+        ).scalars().all()
+        await conn.execute(
+            text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+        )
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def pg_sessionmaker(pg_engine):
+    return sessionmaker(bind=pg_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def pg_workspace(pg_sessionmaker):
+    """A user who owns one organization."""
+    from app.models.organization import (
+        WORKSPACE_ROLE_OWNER,
+        Organization,
+        OrganizationMembership,
+    )
+    from app.models.user import User
+
+    async with pg_sessionmaker() as session:
+        organization = Organization(name="Тестовая", slug="test")
+        user = User(
+            email="owner@example.com",
+            login="owner",
+            hashed_password="x",
+            is_active=True,
+        )
+        session.add_all([organization, user])
+        await session.flush()
+        user.current_organization_id = organization.id
+        session.add(
+            OrganizationMembership(
+                organization_id=organization.id,
+                user_id=user.id,
+                role=WORKSPACE_ROLE_OWNER,
+            )
+        )
+        await session.commit()
+        return SimpleNamespace(user_id=user.id, organization_id=organization.id)
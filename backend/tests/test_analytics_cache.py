@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.models.analytics_rollup import AnalyticsGeneration
+from app.models.client import Client
+from app.models.estimate import Estimate
+from app.models.item import EstimateItem
+from app.services.analytics_cache import AnalyticsCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = AnalyticsCache(max_entries=10, ttl_seconds=60, clock=clock)
+    cache.put("key", 3, "value")
+
+    clock.now = 59
+    assert cache.get("key", 3) == "value"
+    clock.now = 60
+    assert cache.get("key", 3) is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnalyticsCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    assert cache.get("a", 1) == "A"
+
+    cache.put("c", 1, "C")
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnalyticsCache(max_entries=0, ttl_seconds=60)
+    cache.put("a", 1, "A")
+
+    assert cache.get("a", 1) is None
+    assert cache.stats() == {
+        "enabled": False,
+        "max_entries": 0,
+        "ttl_seconds": 60.0,
+        "size": 0,
+        "hits": 0,
+        "misses": 0,
+        "stale": 0,
+        "expired": 0,
+        "evictions": 0,
+    }
+
+
+def _estimate(workspace, client, day):
+    return Estimate(
+        name="Концерт",
+        responsible="Иван",
+        client=client,
+        date=day,
+        user_id=workspace.user_id,
+        organization_id=workspace.organization_id,
+        items=[
+            EstimateItem(
+                name="Пульт",
+                description="",
+                category="Звук",
+                quantity=1,
+                internal_price=100,
+                external_price=150,
+            )
+        ],
+    )
+
+
+async def _generation(pg_sessionmaker, organization_id):
+    async with pg_sessionmaker() as session:
+        return await AnalyticsCache(max_entries=10, ttl_seconds=60).generation(session, organization_id)
+
+
+@pytest.mark.asyncio
+async def test_generation_moves_once_per_transaction(pg_sessionmaker, pg_workspace):
+    organization_id = pg_workspace.organization_id
+
+    async with pg_sessionmaker() as session:
+        client = Client(name="ООО Ромашка", user_id=pg_workspace.user_id, organization_id=organization_id)
+        estimate = _estimate(pg_workspace, client, datetime(2026, 3, 1, tzinfo=timezone.utc))
+        session.add_all([client, estimate])
+        await session.flush()
+        estimate.responsible = "Анна"
+        estimate.items[0].quantity = 2
+        await session.flush()
+        client.name = "ИП Лютик"
+        await session.flush()
+
+        # До коммита поколение не трогаем
+        assert await _generation(pg_sessionmaker, organization_id) == 0
+        await session.commit()
+
+    assert await _generation(pg_sessionmaker, organization_id) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_do_not_block_on_the_generation(pg_sessionmaker, pg_workspace):
+    organization_id = pg_workspace.organization_id
+    async with pg_sessionmaker() as session:
+        client = Client(name="ООО Ромашка", user_id=pg_workspace.user_id, organization_id=organization_id)
+        session.add(client)
+        await session.commit()
+
+    async with pg_sessionmaker() as first, pg_sessionmaker() as second:
+        first_client = await first.get(Client, client.id)
+        first.add(_estimate(pg_workspace, first_client, datetime(2026, 3, 1, tzinfo=timezone.utc)))
+        await first.flush()
+
+        # Вторая транзакция той же организации (в другой день) проходит, пока первая открыта
+        second_client = await second.get(Client, client.id)
+        second.add(_estimate(pg_workspace, second_client, datetime(2026, 3, 2, tzinfo=timezone.utc)))
+        await asyncio.wait_for(second.commit(), timeout=5)
+        assert await _generation(pg_sessionmaker, organization_id) == 1
+
+        # Строку поколения первая транзакция не держит
+        async with pg_sessionmaker() as probe:
+            await probe.execute(
+                select(AnalyticsGeneration)
+                .where(AnalyticsGeneration.organization_id == organization_id)
+                .with_for_update(nowait=True)
+            )
+        await first.commit()
+
+    assert await _generation(pg_sessionmaker, organization_id) == 2
@@ -0,0 +1,443 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import asyncio
+
+import pytest
+from sqlalchemy import delete, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import selectinload
+
+from app.api.analytics import get_global_analytics
+from app.core.config import settings
+from app.models.client import Client
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.services import analytics_engine
+from app.schemas.analytics import GranularityEnum
+from app.services.analytics_cache import analytics_cache
+from app.services.analytics_engine import (
+    AnalyticsFilters,
+    analytics_sections,
+    collect_sections,
+    compute_analytics,
+    rollups_cover,
+    single_pass_query,
+)
+from app.services.estimate_totals import apply_estimate_totals
+
+
+@pytest.fixture(autouse=True)
+def _empty_analytics_cache():
+    analytics_cache.clear()
+    yield
+    analytics_cache.clear()
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_single_pass_query_shares_one_cte():
+    filters = AnalyticsFilters.build(1, categories=["Звук"])
+    sections = analytics_sections(filters, GranularityEnum.month, use_rollups=False)
+
+    sql = _sql(single_pass_query(sections))
+
+    assert sql.startswith("WITH filtered_estimates AS")
+    assert sql.count("UNION ALL") == len(sections) - 1
+    assert sql.count("FROM estimates") == 2  # CTE и выручка по категориям внутри него
+
+
+def test_client_sections_skip_client_rankings():
+    filters = AnalyticsFilters.build(1, client_id=5)
+    sections = analytics_sections(
+        filters, GranularityEnum.quarter, top_clients_limit=None, use_rollups=False
+    )
+
+    assert set(sections) == {"summary", "timeseries", "by_responsible", "top_services"}
+
+
+def test_filters_are_normalized():
+    first = AnalyticsFilters.build(
+        1,
+        status=[EstimateStatus.SENT, EstimateStatus.DRAFT, EstimateStatus.SENT],
+        categories=["Звук", "свет", "ЗВУК"],
+    )
+    second = AnalyticsFilters.build(
+        1, status=[EstimateStatus.DRAFT, EstimateStatus.SENT], categories=["Свет", "звук"]
+    )
+
+    assert first == second
+    assert first.categories == ("звук", "свет")
+
+
+def test_rollups_cover_whole_days_and_one_category():
+    whole_days = dict(
+        start_date=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        end_date=datetime(2026, 3, 31, 23, 59, 59, tzinfo=timezone.utc),
+    )
+
+    assert rollups_cover(AnalyticsFilters.build(1, categories=["Звук"], **whole_days))
+    assert AnalyticsFilters.build(1, **whole_days).rollup_days() == (
+        datetime(2026, 1, 1).date(),
+        datetime(2026, 3, 31).date(),
+    )
+    assert not rollups_cover(AnalyticsFilters.build(1, categories=["Звук", "Свет"]))
+    assert not rollups_cover(
+        AnalyticsFilters.build(1, start_date=datetime(2026, 1, 1, 12, tzinfo=timezone.utc))
+    )
+
+
+def test_rollup_sections_read_the_rollup_table():
+    filters = AnalyticsFilters.build(1, status=[EstimateStatus.APPROVED], categories=["Звук"])
+    sections = analytics_sections(filters, GranularityEnum.week, use_rollups=True)
+
+    summary = _sql(sections["summary"])
+    assert "analytics_daily_rollups.category = %(category_1)s" in summary
+    assert "estimate_items" not in summary
+    assert "analytics_daily_rollups" in _sql(sections["top_clients"])
+    # медиана и услуги требуют отдельных смет и позиций
+    assert "percentile_cont" in _sql(sections["median"])
+    assert "estimate_items" in _sql(sections["top_services"])
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+async def _global_analytics(db, **filters):
+    params = dict(start_date=None, end_date=None, status=None, vat_enabled=None, categories=None)
+    params.update(filters)
+    return await get_global_analytics(
+        granularity=GranularityEnum.month,
+        context=SimpleNamespace(organization_id=1),
+        db=db,
+        **params,
+    )
+
+
+class _AnalyticsDb:
+    def __init__(self):
+        self.statements = []
+        self.generation = 1
+
+    async def scalar(self, statement):
+        return self.generation
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+        def row(section, label=None, count=None, amount=None, aux=None):
+            return SimpleNamespace(section=section, label=label, count=count, amount=amount, aux=aux)
+
+        return _Rows(
+            [
+                row("top_clients", "Бета", amount=300.0),
+                row("timeseries", "2026-02", amount=600.0),
+                row("summary", count=4.0, amount=1000.0, aux=250.0),
+                row("timeseries", "2026-01", amount=400.0),
+                row("by_responsible", "Анна", count=4.0, amount=1000.0),
+                row("top_clients", "Альфа", amount=700.0),
+                row("clients_count", count=2.0),
+                row("top_services", "Звук", amount=1000.0),
+            ]
+        )
+
+
+@pytest.mark.asyncio
+async def test_global_analytics_is_one_round_trip():
+    db = _AnalyticsDb()
+
+    result = await _global_analytics(db)
+
+    assert len(db.statements) == 1
+    assert result.total_estimates == 4
+    assert result.average_amount == 250.0
+    assert result.median_amount == 250.0
+    assert result.arpu == 500.0
+    assert [item.period for item in result.timeseries] == ["2026-01", "2026-02"]
+    assert result.mom_growth == 50.0
+    assert [client.name for client in result.top_clients] == ["Альфа", "Бета"]
+    assert result.by_responsible[0].estimates_count == 4
+
+
+@pytest.mark.asyncio
+async def test_global_analytics_is_cached_until_generation_changes():
+    db = _AnalyticsDb()
+    before = analytics_cache.stats()
+
+    first = await _global_analytics(db, categories=["Звук", "свет"])
+    second = await _global_analytics(db, categories=["Свет", "звук", "ЗВУК"])
+    assert second is first
+    assert len(db.statements) == 1
+
+    db.generation += 1
+    third = await _global_analytics(db, categories=["звук", "свет"])
+    assert third is not first
+    assert len(db.statements) == 2
+
+    stats = analytics_cache.stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+    assert stats["stale"] - before["stale"] == 1
+
+
+class _SectionSessions:
+    """Session factory whose sessions answer each section after a short wait."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        section = next(
+            name for name in ("summary", "median", "timeseries", "top_services", "by_responsible")
+            if f"'{name}'" in _sql(statement)
+        )
+        return _Rows([SimpleNamespace(section=section, label="2026-01", count=2.0, amount=100.0, aux=None)])
+
+
+@pytest.mark.asyncio
+async def test_sections_run_concurrently_within_the_cap(monkeypatch):
+    sessions = _SectionSessions()
+    monkeypatch.setattr(analytics_engine, "AnalyticsSessionLocal", sessions)
+    monkeypatch.setattr(settings, "ANALYTICS_CONCURRENT_SECTIONS", True)
+    monkeypatch.setattr(settings, "ANALYTICS_SECTION_CONCURRENCY", 2)
+    request_db = _AnalyticsDb()
+
+    data = await compute_analytics(
+        request_db,
+        AnalyticsFilters.build(1, client_id=5, categories=["Звук", "Свет"]),
+        GranularityEnum.month,
+        top_clients_limit=None,
+    )
+
+    assert request_db.statements == []
+    assert len(sessions.statements) == 4
+    assert sessions.max_in_flight == 2
+    assert data["total_estimates"] == 2
+    assert data["timeseries"] == [("2026-01", 100.0)]
+    assert set(data["timings"]) == {"summary", "timeseries", "by_responsible", "top_services"}
+    assert analytics_engine.section_latency.stats()["summary"]["count"] >= 1
+
+
+ROLLUP_SNAPSHOT = text(
+    "SELECT day, client_id, responsible, category, status::text AS status, vat_enabled, "
+    "use_internal_price, estimates_count, priced_estimates_count, items_count, "
+    "round(total_external::numeric, 2) AS total_external, round(margin::numeric, 2) AS margin, "
+    "round(revenue::numeric, 2) AS revenue "
+    "FROM analytics_daily_rollups WHERE organization_id = :organization_id "
+    "ORDER BY day, client_id, responsible, category, status, vat_enabled, use_internal_price"
+)
+
+
+async def _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id):
+    """The rows the triggers left equal a full recomputation of the organization."""
+    params = {"organization_id": organization_id}
+    async with pg_sessionmaker() as session:
+        maintained = (await session.execute(ROLLUP_SNAPSHOT, params)).all()
+        await session.execute(
+            text("SELECT refresh_analytics_daily_rollups(:organization_id, NULL, NULL)"), params
+        )
+        rebuilt = (await session.execute(ROLLUP_SNAPSHOT, params)).all()
+        await session.rollback()
+    assert maintained == rebuilt
+    return maintained
+
+
+def _pg_item(name, category, quantity=1, internal_price=100, external_price=150):
+    return EstimateItem(
+        name=name,
+        description="",
+        category=category,
+        quantity=quantity,
+        internal_price=internal_price,
+        external_price=external_price,
+    )
+
+
+def _pg_estimate(workspace, client, day, items, **fields):
+    estimate = Estimate(
+        name=fields.pop("name", "Концерт"),
+        responsible=fields.pop("responsible", "Иван"),
+        client=client,
+        date=day,
+        user_id=workspace.user_id,
+        organization_id=workspace.organization_id,
+        items=items,
+        **fields,
+    )
+    apply_estimate_totals(estimate, items)
+    return estimate
+
+
+@pytest.mark.asyncio
+async def test_rollup_triggers_follow_every_write(pg_sessionmaker, pg_workspace):
+    organization_id = pg_workspace.organization_id
+    first_day = datetime(2026, 3, 1, 23, 30, tzinfo=timezone.utc)
+    second_day = datetime(2026, 3, 5, 10, tzinfo=timezone.utc)
+
+    async with pg_sessionmaker() as session:
+        client = Client(name="ООО Ромашка", user_id=pg_workspace.user_id, organization_id=organization_id)
+        estimate = _pg_estimate(
+            pg_workspace,
+            client,
+            first_day,
+            [_pg_item("Пульт", "Звук", 2), _pg_item("Прожектор", "Свет")],
+            use_internal_price=True,
+        )
+        empty = _pg_estimate(pg_workspace, client, first_day, [], name="Пустая")
+        session.add_all([client, estimate, empty])
+        await session.commit()
+        estimate_id, empty_id = estimate.id, empty.id
+
+        rows = await _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id)
+        totals = {row.category: row for row in rows}
+        assert {row.day for row in rows} == {first_day.date()}
+        assert totals["*"].estimates_count == 2
+        assert totals["*"].priced_estimates_count == 1
+        assert float(totals["*"].revenue) == 150.0
+        assert float(totals["звук"].revenue) == 100.0
+
+        # Правка позиций: изменённая, удалённая и новая
+        estimate = await session.get(Estimate, estimate_id, options=[selectinload(Estimate.items)])
+        sound, light = sorted(estimate.items, key=lambda item: item.category != "Звук")
+        sound.quantity = 3
+        estimate.items.remove(light)
+        estimate.items.append(_pg_item("Сцена", "Сцена", external_price=400))
+        apply_estimate_totals(estimate, estimate.items)
+        await session.commit()
+
+        rows = await _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id)
+        assert {row.category for row in rows} == {"*", "звук", "сцена"}
+        assert float(next(row.revenue for row in rows if row.category == "*")) == 450.0
+
+        # Перенос сметы на другой день и смена статуса
+        estimate.date = second_day
+        estimate.status = EstimateStatus.APPROVED
+        await session.commit()
+
+        rows = await _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id)
+        moved = [row for row in rows if row.day == second_day.date()]
+        assert {row.category for row in moved} == {"*", "звук", "сцена"}
+        assert all(row.status == EstimateStatus.APPROVED.value for row in moved)
+        assert [row.estimates_count for row in rows if row.day == first_day.date()] == [1]
+
+        # Удаление каскадом ORM: сначала позиции, затем смета
+        await session.delete(estimate)
+        await session.commit()
+        rows = await _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id)
+        assert [(row.day, row.category) for row in rows] == [(first_day.date(), "*")]
+
+        await session.execute(delete(Estimate).where(Estimate.id == empty_id))
+        await session.commit()
+        assert await _assert_rollups_match_a_rebuild(pg_sessionmaker, organization_id) == []
+
+
+async def _seed_analytics(pg_sessionmaker, workspace):
+    async with pg_sessionmaker() as session:
+        clients = [
+            Client(name=name, user_id=workspace.user_id, organization_id=workspace.organization_id)
+            for name in ("ООО Ромашка", "ИП Лютик", "АО Василёк")
+        ]
+        days = [
+            # Около полуночи UTC: в другой TimeZone сессии это соседний день
+            datetime(2025, 12, 31, 23, 30, tzinfo=timezone.utc),
+            datetime(2026, 1, 1, 0, 15, tzinfo=timezone.utc),
+            datetime(2026, 3, 31, 22, 45, tzinfo=timezone.utc),
+            datetime(2026, 4, 1, 1, 0, tzinfo=timezone.utc),
+            datetime(2026, 6, 14, 12, 0, tzinfo=timezone.utc),
+        ]
+        categories = ("Звук", "Свет", "сцена")
+        statuses = (EstimateStatus.DRAFT, EstimateStatus.SENT, EstimateStatus.APPROVED)
+        estimates = []
+        for index in range(12):
+            items = [
+                _pg_item(
+                    f"Услуга {(index + offset) % 5}",
+                    categories[(index + offset) % len(categories)],
+                    quantity=1 + offset,
+                    internal_price=60 + 10 * index,
+                    external_price=100 + 25 * index,
+                )
+                for offset in range(index % 4)
+            ]
+            estimates.append(
+                _pg_estimate(
+                    workspace,
+                    clients[index % len(clients)],
+                    days[index % len(days)],
+                    items,
+                    name=f"Смета {index}",
+                    responsible=("Иван", "Анна")[index % 2],
+                    status=statuses[index % len(statuses)],
+                    vat_enabled=index % 3 != 0,
+                    use_internal_price=index % 2 == 0,
+                )
+            )
+        session.add_all([*clients, *estimates])
+        await session.commit()
+
+
+def _comparable(data):
+    return {
+        "total_estimates": data["total_estimates"],
+        "total_amount": pytest.approx(data["total_amount"]),
+        "clients_count": data["clients_count"],
+        "timeseries": [(label, pytest.approx(amount)) for label, amount in data["timeseries"]],
+        "by_responsible": sorted(
+            (label, count, pytest.approx(amount)) for label, count, amount in data["by_responsible"]
+        ),
+        "top_clients": sorted((name, pytest.approx(amount)) for name, amount in data["top_clients"]),
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("granularity", list(GranularityEnum))
+async def test_rollups_and_raw_estimates_give_the_same_numbers(pg_sessionmaker, pg_workspace, granularity):
+    await _seed_analytics(pg_sessionmaker, pg_workspace)
+    organization_id = pg_workspace.organization_id
+    variants = [
+        {},
+        {"categories": ["ЗВУК"]},
+        {"status": [EstimateStatus.DRAFT, EstimateStatus.APPROVED]},
+        {"vat_enabled": True, "categories": ["сцена"]},
+        {
+            "start_date": datetime(2026, 1, 1, tzinfo=timezone.utc),
+            "end_date": datetime(2026, 3, 31, 23, 59, 59, tzinfo=timezone.utc),
+        },
+    ]
+
+    async with pg_sessionmaker() as session:
+        await session.execute(text("SET TIME ZONE 'Asia/Vladivostok'"))
+        for variant in variants:
+            filters = AnalyticsFilters.build(organization_id, **variant)
+            assert rollups_cover(filters)
+            results = {}
+            for use_rollups in (True, False):
+                sections = analytics_sections(filters, granularity, use_rollups=use_rollups)
+                rows = (await session.execute(single_pass_query(sections))).all()
+                results[use_rollups] = collect_sections(rows)
+
+            assert results[True]["total_estimates"] > 0, variant
+            assert _comparable(results[True]) == _comparable(results[False]), variant
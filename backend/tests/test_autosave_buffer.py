@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Delete, Insert
+
+from app.api.estimates import start_estimate_approval_workflow
+from app.core.config import settings
+from app.models.autosave_draft import EstimateAutosaveDraft
+from app.models.estimate import Estimate
+from app.models.estimate_approval import EstimateApprovalStep, EstimateApprovalWorkflow
+from app.models.item import EstimateItem
+from app.models.user import User
+from app.schemas.estimate import EstimateAutosave
+from app.services import autosave_buffer
+from app.services.approval_workflow import WORKFLOW_STATUS_DRAFT, WORKFLOW_STATUS_IN_REVIEW
+from app.services.autosave_buffer import (
+    AutosaveCoalescer,
+    autosave_flush_due,
+    flush_due_autosaves,
+    flush_estimate_autosave,
+    stage_autosave_patch,
+)
+from app.services.export_documents import build_estimate_excel_document
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class _Result:
+    def __init__(self, rows=(), one=None):
+        self._rows = list(rows)
+        self._one = one
+
+    def one(self):
+        return self._one
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return self
+
+
+class _DraftDb:
+    def __init__(self, drafts=(), estimates=()):
+        self.drafts = list(drafts)
+        self.estimates = list(estimates)
+        self.statements = []
+        self.added = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        if isinstance(statement, Insert):
+            return _Result(one=SimpleNamespace(writes=3, first_write_at=datetime.now(timezone.utc)))
+        if isinstance(statement, Delete):
+            if "estimate_autosave_drafts" in _sql(statement):
+                drafts, self.drafts = self.drafts, []
+                return _Result(drafts)
+            return _Result()
+        return _Result(self.estimates)
+
+    async def get(self, _model, _object_id):
+        return None
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+def _estimate():
+    return SimpleNamespace(
+        id=10,
+        organization_id=1,
+        client_id=None,
+        name="Концерт",
+        status="draft",
+        use_internal_price=True,
+        vat_enabled=False,
+        vat_rate=20,
+        items_count=0,
+        total_internal=0.0,
+        total_external=0.0,
+        margin=0.0,
+        total_with_vat=0.0,
+    )
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    instance = AutosaveCoalescer()
+    monkeypatch.setattr(autosave_buffer, "autosave_coalescer", instance)
+    return instance
+
+
+@pytest.mark.asyncio
+async def test_stage_merges_patch_in_a_single_upsert():
+    db = _DraftDb()
+    payload = EstimateAutosave(name="Концерт 2", vat_rate=10)
+
+    writes, _first_write_at = await stage_autosave_patch(db, _estimate(), 7, payload)
+
+    assert writes == 3
+    sql = _sql(db.statements[0])
+    assert "ON CONFLICT (estimate_id) DO UPDATE" in sql
+    assert "estimate_autosave_drafts.patch || excluded.patch" in sql
+    assert "estimate_autosave_drafts.writes + " in sql
+    assert "RETURNING estimate_autosave_drafts.writes" in sql
+    # только присланные поля, иначе пустые значения перетёрли бы черновик
+    assert db.statements[0].compile().params["patch"] == {"name": "Концерт 2", "vat_rate": 10}
+
+
+def test_flush_is_due_by_writes_or_age(monkeypatch):
+    monkeypatch.setattr(settings, "AUTOSAVE_FLUSH_AFTER_WRITES", 5)
+    monkeypatch.setattr(settings, "AUTOSAVE_FLUSH_AFTER_SECONDS", 30)
+    now = datetime.now(timezone.utc)
+
+    assert not autosave_flush_due(4, now)
+    assert autosave_flush_due(5, now)
+    assert autosave_flush_due(1, now - timedelta(seconds=31))
+
+
+@pytest.mark.asyncio
+async def test_flush_applies_latest_values_and_counts_absorbed_writes(coalescer):
+    estimate = _estimate()
+    draft = SimpleNamespace(
+        estimate_id=10,
+        writes=4,
+        patch={
+            "name": "Концерт 3",
+            "status": "approved",
+            "items": [{"name": "Звук", "quantity": 2, "internal_price": 100, "external_price": 150}],
+        },
+    )
+    db = _DraftDb(drafts=[draft], estimates=[(estimate, None)])
+
+    assert await flush_estimate_autosave(db, 10, reason="read")
+    assert not await flush_estimate_autosave(db, 10, reason="read")
+
+    assert estimate.name == "Концерт 3"
+    assert estimate.status.value == "approved"
+    assert [item.name for item in db.added] == ["Звук"]
+    assert estimate.total_external == 300.0
+    assert estimate.margin == 100.0
+
+    stats = coalescer.stats()
+    assert stats["flushes_by_reason"] == {"read": 1}
+    assert stats["flushed_writes"] == 4
+    assert stats["absorbed_writes"] == 3
+
+
+@pytest.mark.asyncio
+async def test_flush_discards_drafts_of_estimates_in_review(coalescer):
+    estimate = _estimate()
+    draft = SimpleNamespace(estimate_id=10, writes=2, patch={"name": "В обход согласования"})
+    db = _DraftDb(drafts=[draft], estimates=[(estimate, WORKFLOW_STATUS_IN_REVIEW)])
+
+    assert not await flush_estimate_autosave(db, 10, reason="sweep")
+
+    assert estimate.name == "Концерт"
+    assert coalescer.stats()["discarded_writes"] == 2
+    assert coalescer.stats()["flushes"] == 0
+
+
+async def _estimate_with_draft(pg_sessionmaker, workspace, workflow_status=None):
+    async with pg_sessionmaker() as session:
+        estimate = Estimate(
+            name="Концерт",
+            responsible="Иван",
+            user_id=workspace.user_id,
+            organization_id=workspace.organization_id,
+            items=[EstimateItem(name="Звук", quantity=1, internal_price=100, external_price=150)],
+        )
+        session.add(estimate)
+        await session.flush()
+        if workflow_status is not None:
+            session.add(
+                EstimateApprovalWorkflow(
+                    estimate_id=estimate.id,
+                    owner_user_id=workspace.user_id,
+                    status=workflow_status,
+                    steps=[
+                        EstimateApprovalStep(
+                            step_order=1,
+                            stage_key="finance",
+                            stage_label="Финансы",
+                            approver_user_id=workspace.user_id,
+                        )
+                    ],
+                )
+            )
+        await stage_autosave_patch(
+            session, estimate, workspace.user_id, EstimateAutosave(name="Концерт 2")
+        )
+        await session.commit()
+        return estimate.id
+
+
+async def _saved_name_and_drafts(pg_sessionmaker, estimate_id):
+    async with pg_sessionmaker() as session:
+        name = await session.scalar(select(Estimate.name).where(Estimate.id == estimate_id))
+        drafts = await session.scalar(select(func.count()).select_from(EstimateAutosaveDraft))
+        return name, drafts
+
+
+async def test_excel_export_includes_the_pending_draft(pg_sessionmaker, pg_workspace, coalescer):
+    estimate_id = await _estimate_with_draft(pg_sessionmaker, pg_workspace)
+
+    async with pg_sessionmaker() as session:
+        _content, filename, _details = await build_estimate_excel_document(
+            session, estimate_id, pg_workspace.organization_id
+        )
+        await session.commit()
+
+    assert filename == "Концерт 2.xlsx"
+    assert await _saved_name_and_drafts(pg_sessionmaker, estimate_id) == ("Концерт 2", 0)
+    assert coalescer.stats()["flushes_by_reason"] == {"export": 1}
+
+
+async def test_approval_starts_on_the_flushed_content(pg_sessionmaker, pg_workspace, coalescer):
+    estimate_id = await _estimate_with_draft(
+        pg_sessionmaker, pg_workspace, workflow_status=WORKFLOW_STATUS_DRAFT
+    )
+
+    async with pg_sessionmaker() as session:
+        context = SimpleNamespace(
+            user=await session.get(User, pg_workspace.user_id),
+            organization_id=pg_workspace.organization_id,
+        )
+        workflow = await start_estimate_approval_workflow(estimate_id, None, session, context)
+
+    assert workflow.status == WORKFLOW_STATUS_IN_REVIEW
+    assert await _saved_name_and_drafts(pg_sessionmaker, estimate_id) == ("Концерт 2", 0)
+    assert coalescer.stats()["flushes_by_reason"] == {"approval": 1}
+
+
+async def test_sweep_drops_drafts_of_estimates_under_approval(
+    pg_sessionmaker, pg_workspace, coalescer, monkeypatch
+):
+    monkeypatch.setattr(settings, "AUTOSAVE_FLUSH_AFTER_SECONDS", 0)
+    estimate_id = await _estimate_with_draft(
+        pg_sessionmaker, pg_workspace, workflow_status=WORKFLOW_STATUS_IN_REVIEW
+    )
+
+    async with pg_sessionmaker() as session:
+        assert await flush_due_autosaves(session) == 0
+        await session.commit()
+
+    assert await _saved_name_and_drafts(pg_sessionmaker, estimate_id) == ("Концерт", 0)
+    assert coalescer.stats()["discarded_writes"] == 1
@@ -0,0 +1,92 @@
+import io
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import estimates as estimates_module
+from app.cli import load_models
+from app.utils.zip_stream import stream_zip
+
+
+async def _batches(*batches):
+    for batch_ids, estimates in batches:
+        yield batch_ids, estimates
+
+
+@pytest.mark.asyncio
+async def test_stream_zip_emits_entries_incrementally():
+    async def _entries():
+        yield "estimate_1.pdf", b"%PDF-one"
+        yield "estimate_2.pdf", b"%PDF-two"
+
+    chunks = [chunk async for chunk in stream_zip(_entries())]
+
+    assert len(chunks) == 3
+    assert all(chunks[:2])
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["estimate_1.pdf", "estimate_2.pdf"]
+        assert archive.read("estimate_2.pdf") == b"%PDF-two"
+
+
+@pytest.mark.asyncio
+async def test_bulk_export_entries_collect_failures(monkeypatch):
+    async def _fake_render(estimate, export_format):
+        if estimate.id == 2:
+            raise OSError("wkhtmltopdf failed")
+        return f"estimate_{estimate.id}.{export_format}", b"data"
+
+    monkeypatch.setattr(estimates_module, "render_bulk_export_entry", _fake_render)
+    batches = _batches(
+        ([1, 2], [SimpleNamespace(id=1), SimpleNamespace(id=2)]),
+        ([3, 4], [SimpleNamespace(id=4)]),
+    )
+
+    entries = [
+        entry async for entry in estimates_module.iter_bulk_export_entries(batches, "pdf", 2)
+    ]
+    names = [name for name, _data in entries]
+
+    assert sorted(names[:-1]) == ["estimate_1.pdf", "estimate_4.pdf"]
+    assert names[-1] == "errors.txt"
+    errors = entries[-1][1].decode("utf-8")
+    assert "Смета 2: wkhtmltopdf failed" in errors
+    assert "Смета 3: не найдена" in errors
+
+
+@pytest.mark.asyncio
+async def test_bulk_export_batches_release_the_session_before_yielding(monkeypatch):
+    events = []
+
+    class _Result:
+        def __init__(self, ids):
+            self._ids = ids
+
+        def scalars(self):
+            return self
+
+        def all(self):
+            return [SimpleNamespace(id=item_id) for item_id in self._ids]
+
+    class _Session:
+        async def __aenter__(self):
+            events.append("open")
+            return self
+
+        async def __aexit__(self, *_exc):
+            events.append("close")
+
+        async def execute(self, statement):
+            ids = statement.whereclause.clauses[0].right.value
+            return _Result([item_id for item_id in ids if item_id != 3])
+
+    load_models()
+    monkeypatch.setattr(estimates_module, "SessionLocal", _Session)
+
+    batches = []
+    async for batch_ids, estimates in estimates_module.load_bulk_export_batches([1, 2, 3], 7, 2):
+        events.append("yield")
+        batches.append((batch_ids, [estimate.id for estimate in estimates]))
+
+    assert batches == [([1, 2], [1, 2]), ([3], [])]
+    assert events == ["open", "close", "yield", "open", "close", "yield"]
@@ -0,0 +1,166 @@
+import random
+from argparse import Namespace
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from app.cli import dataset
+from app.cli.dataset import _estimate_batch
+from app.models.changelog import EstimateChangeLog
+from app.models.client import Client
+from app.models.estimate import Estimate
+from app.models.item import EstimateItem
+from app.models.note import Note
+from app.models.version import EstimateVersion
+from app.services.audit_ledger import append_audit_ledger_entry, verify_audit_chain
+from app.services.version_store import VERSION_KIND_DELTA, version_payload
+
+
+def _batch(estimate_ids, item_ids, seed=7):
+    args = Namespace(
+        items_per_estimate=4,
+        versions_per_estimate=6,
+        changelogs_per_estimate=2,
+        notes_per_estimate=1,
+    )
+    context = {
+        "organization_id": 1,
+        "user_ids": [10, 11],
+        "client_ids": [5, 6, 7],
+        "estimate_ids": [],
+        "end": datetime(2026, 1, 1, tzinfo=timezone.utc),
+    }
+    return _estimate_batch(random.Random(seed), args, estimate_ids, item_ids, context)
+
+
+def test_same_seed_generates_same_rows_regardless_of_ids():
+    first = _batch([1, 2], range(1, 9))
+    second = _batch([101, 102], range(501, 509))
+
+    def strip_ids(rows, *keys):
+        return [{key: value for key, value in row.items() if key not in keys} for row in rows]
+
+    assert strip_ids(first.estimates, "id") == strip_ids(second.estimates, "id")
+    assert strip_ids(first.items, "id", "estimate_id") == strip_ids(second.items, "id", "estimate_id")
+    assert len(first.versions) == 12
+    assert len(first.changelogs) == 4
+    assert len(first.notes) == 2
+
+
+def _item_sums(items):
+    return (
+        len(items),
+        sum(item["quantity"] * item["internal_price"] for item in items),
+        sum(item["quantity"] * item["external_price"] for item in items),
+    )
+
+
+def test_generated_totals_match_the_items():
+    batch = _batch(list(range(1, 21)), range(1, 81))
+
+    for estimate in batch.estimates:
+        items = [item for item in batch.items if item["estimate_id"] == estimate["id"]]
+        items_count, total_internal, total_external = _item_sums(items)
+        assert estimate["items_count"] == items_count == 4
+        assert estimate["total_internal"] == pytest.approx(total_internal)
+        assert estimate["total_external"] == pytest.approx(total_external)
+        margin = total_external - total_internal if estimate["use_internal_price"] else 0.0
+        assert estimate["margin"] == pytest.approx(margin)
+        vat = total_external * estimate["vat_rate"] / 100 if estimate["vat_enabled"] else 0.0
+        assert estimate["total_with_vat"] == pytest.approx(total_external + vat)
+
+    assert {estimate["use_internal_price"] for estimate in batch.estimates} == {True, False}
+    assert {estimate["vat_enabled"] for estimate in batch.estimates} == {True, False}
+
+
+def test_generated_versions_decode_like_stored_ones():
+    batch = _batch([1], range(1, 5))
+    rows = [SimpleNamespace(**row) for row in batch.versions]
+    keyframes = {}
+
+    for row in rows:
+        if row.kind == VERSION_KIND_DELTA:
+            payload = version_payload(row, keyframes[row.base_version])
+        else:
+            payload = keyframes[row.version] = version_payload(row)
+        assert payload["items_count"] == 4
+        assert len(payload["items"]) == 4
+
+    assert any(row.kind == VERSION_KIND_DELTA for row in rows)
+
+
+async def test_generate_writes_the_dataset_with_copy(monkeypatch, pg_engine, pg_sessionmaker, pg_workspace):
+    monkeypatch.setattr(dataset, "engine", pg_engine)
+    async with pg_sessionmaker() as session:
+        await append_audit_ledger_entry(
+            session, actor_user_id=pg_workspace.user_id, action="estimate.deleted", entity_type="estimate"
+        )
+        await session.commit()
+
+    args = Namespace(
+        slug="bench",
+        reset=False,
+        users=2,
+        clients=3,
+        estimates=7,
+        items_per_estimate=3,
+        versions_per_estimate=2,
+        changelogs_per_estimate=1,
+        notes_per_estimate=1,
+        audit_entries=25,
+        batch_size=3,
+        seed=1,
+        end_date=date(2026, 1, 1),
+    )
+    report = await dataset.generate(args)
+
+    organization_id = report["organization_id"]
+    estimate_ids = select(Estimate.id).where(Estimate.organization_id == organization_id)
+    async with pg_sessionmaker() as session:
+
+        async def count(model, condition):
+            return await session.scalar(select(func.count()).select_from(model).where(condition))
+
+        assert await count(Client, Client.organization_id == organization_id) == report["clients"] == 3
+        assert await count(Estimate, Estimate.organization_id == organization_id) == report["estimates"] == 7
+        assert await count(EstimateItem, EstimateItem.estimate_id.in_(estimate_ids)) == report["items"] == 21
+        assert await count(EstimateVersion, EstimateVersion.estimate_id.in_(estimate_ids)) == report["versions"] == 14
+        assert await count(EstimateChangeLog, EstimateChangeLog.estimate_id.in_(estimate_ids)) == report["changelogs"]
+        assert await count(Note, Note.estimate_id.in_(estimate_ids)) == report["notes"] == 7
+
+        # Суммы, записанные через COPY, сходятся с позициями в базе
+        sums = (
+            select(
+                EstimateItem.estimate_id,
+                func.count().label("items_count"),
+                func.sum(EstimateItem.quantity * EstimateItem.external_price).label("total_external"),
+            )
+            .group_by(EstimateItem.estimate_id)
+            .subquery()
+        )
+        rows = (
+            await session.execute(
+                select(Estimate.items_count, Estimate.total_external, sums.c.items_count, sums.c.total_external)
+                .join(sums, sums.c.estimate_id == Estimate.id)
+                .where(Estimate.organization_id == organization_id)
+            )
+        ).all()
+        assert len(rows) == 7
+        for stored_count, stored_external, items_count, total_external in rows:
+            assert stored_count == items_count
+            assert stored_external == pytest.approx(total_external)
+
+        # Генератор продолжил цепочку аудита, а id зарезервированы в
+        # последовательностях: следующая обычная запись встаёт следом
+        await append_audit_ledger_entry(
+            session, actor_user_id=pg_workspace.user_id, action="estimate.deleted", entity_type="estimate"
+        )
+        session.add(EstimateItem(name="После генерации", estimate_id=None))
+        await session.commit()
+        verification = await verify_audit_chain(session)
+
+    assert report["audit_entries"] == 25
+    assert verification.is_valid, verification.reason
+    assert verification.checked_entries == 27
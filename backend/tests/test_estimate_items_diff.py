@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.sql.dml import Delete, Insert, Update
+
+from app.api.estimates import persist_estimate_items_diff
+from app.schemas.item import EstimateItemUpdate
+
+
+class _InsertedIds:
+    def __init__(self, ids):
+        self._ids = ids
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._ids
+
+
+class _CaptureDb:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        if isinstance(statement, Insert):
+            return _InsertedIds([500 + index for index in range(len(params))])
+
+
+def _stored(item_id, **overrides):
+    values = dict(
+        id=item_id,
+        name=f"Позиция {item_id}",
+        description="",
+        quantity=1.0,
+        unit="шт",
+        internal_price=100.0,
+        external_price=150.0,
+        category="Звук",
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _payload(item_id=None, **overrides):
+    stored = _stored(item_id or 0, **overrides)
+    values = {key: value for key, value in vars(stored).items() if key != "id"}
+    return EstimateItemUpdate(id=item_id, **values)
+
+
+@pytest.mark.asyncio
+async def test_items_diff_touches_only_changed_rows():
+    db = _CaptureDb()
+    old_items = {1: _stored(1), 2: _stored(2), 3: _stored(3)}
+    new_items = [
+        _payload(1),
+        _payload(2, quantity=3.0),
+        _payload(None, name="Свет"),
+        _payload(99, name="Чужая позиция"),
+    ]
+
+    saved_items = await persist_estimate_items_diff(db, 10, old_items, new_items)
+
+    statements = [type(statement) for statement, _ in db.calls]
+    assert statements == [Delete, Update, Insert]
+
+    delete_stmt, _ = db.calls[0]
+    assert delete_stmt.compile().params["id_1"] == [3]
+
+    _, update_params = db.calls[1]
+    assert [row["id"] for row in update_params] == [2]
+    assert update_params[0]["quantity"] == 3.0
+
+    _, insert_params = db.calls[2]
+    assert [row["name"] for row in insert_params] == ["Свет", "Чужая позиция"]
+    assert all("id" not in row and row["estimate_id"] == 10 for row in insert_params)
+    assert [item["id"] for item in saved_items] == [1, 2, 500, 501]
+
+
+@pytest.mark.asyncio
+async def test_items_diff_is_a_no_op_for_unchanged_items():
+    db = _CaptureDb()
+
+    await persist_estimate_items_diff(db, 10, {1: _stored(1)}, [_payload(1)])
+
+    assert db.calls == []
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.estimates import list_estimates
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+class _ExecResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _PagingDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.execute_queries = []
+        self.count_calls = 0
+
+    async def scalar(self, _query):
+        self.count_calls += 1
+        return 42
+
+    async def execute(self, query):
+        if "estimate_favorites" in str(query):
+            return _ExecResult([])
+        self.execute_queries.append(query)
+        return _ExecResult(list(self.rows))
+
+
+def _rows(*ids):
+    return [SimpleNamespace(id=estimate_id) for estimate_id in ids]
+
+
+def test_cursor_roundtrip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(1234)) == 1234
+    for bad in ("not-a-cursor", encode_cursor(1)[:-2] + "!!", "eyJpZCI6ICJ4In0"):
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(bad)
+        assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_page_mode_keeps_total_and_offset():
+    db = _PagingDb(_rows(30, 29, 28))
+    user = SimpleNamespace(id=7)
+
+    result = await list_estimates(page=3, limit=2, db=db, user=user)
+
+    query = db.execute_queries[0]
+    assert query._offset_clause.value == 4
+    assert query._limit_clause.value == 3
+    assert result["total"] == 42
+    assert [row.id for row in result["items"]] == [30, 29]
+    assert decode_cursor(result["next_cursor"]) == 29
+
+
+@pytest.mark.asyncio
+async def test_cursor_mode_seeks_by_id_and_skips_count():
+    db = _PagingDb(_rows(9, 8))
+    user = SimpleNamespace(id=7)
+
+    result = await list_estimates(
+        page=1, limit=2, cursor=encode_cursor(10), db=db, user=user
+    )
+
+    query = db.execute_queries[0]
+    assert query._offset_clause is None
+    assert "estimates.id < :id_1" in str(query.whereclause)
+    assert db.count_calls == 0
+    assert result["total"] is None
+    assert result["next_cursor"] is None
+
+    await list_estimates(
+        page=1, limit=2, cursor=encode_cursor(10), with_total=True, db=db, user=user
+    )
+    assert db.count_calls == 1
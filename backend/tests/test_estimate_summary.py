@@ -0,0 +1,103 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Delete
+
+from app.api.estimates import list_estimate_summaries
+from app.models.estimate import EstimateStatus
+from app.utils.pagination import decode_cursor
+
+
+class _Row:
+    def __init__(self, **values):
+        self._mapping = values
+        self.id = values["id"]
+
+
+class _RowsResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _SummaryDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.execute_queries = []
+
+    async def scalar(self, _query):
+        return len(self.rows)
+
+    async def execute(self, query):
+        if isinstance(query, Delete):
+            # Черновиков автосохранения нет — применять нечего
+            return _RowsResult([])
+        self.execute_queries.append(query)
+        return _RowsResult(list(self.rows))
+
+
+def _summary_row(estimate_id):
+    return _Row(
+        id=estimate_id,
+        name=f"Смета {estimate_id}",
+        date=datetime(2026, 3, 1),
+        updated_at=None,
+        status=EstimateStatus.DRAFT,
+        responsible="Иван",
+        event_datetime=None,
+        client_id=None,
+        client_name=None,
+        vat_enabled=True,
+        vat_rate=20,
+        use_internal_price=True,
+        read_only=False,
+        user_id=7,
+        is_favorite=False,
+        items_count=3,
+        total_internal=100.0,
+        total_external=150.0,
+        margin=50.0,
+        vat_amount=30.0,
+        total_with_vat=180.0,
+    )
+
+
+def _sql(query):
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_summary_reads_stored_totals_without_touching_items():
+    db = _SummaryDb([_summary_row(5), _summary_row(4), _summary_row(3)])
+    context = SimpleNamespace(organization_id=1, user=SimpleNamespace(id=7))
+
+    result = await list_estimate_summaries(
+        name=None,
+        client=None,
+        date_from=None,
+        date_to=None,
+        status=None,
+        favorite=True,
+        page=1,
+        limit=2,
+        cursor=None,
+        with_total=False,
+        db=db,
+        context=context,
+    )
+
+    assert len(db.execute_queries) == 1
+    sql = _sql(db.execute_queries[0])
+    assert "estimates.total_with_vat" in sql
+    assert "LEFT OUTER JOIN clients ON clients.id = estimates.client_id" in sql
+    assert "estimate_favorites.id IS NOT NULL" in sql
+    assert "estimate_items" not in sql
+
+    assert [item["id"] for item in result["items"]] == [5, 4]
+    assert result["items"][0]["total_with_vat"] == 180.0
+    assert result["total"] == 3
+    assert decode_cursor(result["next_cursor"]) == 4
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.analytics_engine import _category_filters, _revenue_source
+from app.services.estimate_totals import apply_estimate_totals
+
+
+def _estimate(**overrides):
+    values = dict(
+        use_internal_price=True,
+        vat_enabled=True,
+        vat_rate=20,
+        items_count=0,
+        total_internal=0.0,
+        total_external=0.0,
+        margin=0.0,
+        total_with_vat=0.0,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_apply_estimate_totals_accepts_orm_like_items_and_dicts():
+    estimate = _estimate()
+    items = [
+        SimpleNamespace(quantity=2, internal_price=100.0, external_price=150.0),
+        {"quantity": 1, "internal_price": 300.0, "external_price": 500.0},
+        {"quantity": None, "internal_price": 10.0, "external_price": 10.0},
+    ]
+
+    apply_estimate_totals(estimate, items)
+
+    assert estimate.items_count == 3
+    assert estimate.total_internal == 500.0
+    assert estimate.total_external == 800.0
+    assert estimate.margin == 300.0
+    assert estimate.total_with_vat == pytest.approx(960.0)
+
+
+def test_apply_estimate_totals_without_items_recomputes_derived_values():
+    estimate = _estimate(items_count=2, total_internal=500.0, total_external=800.0)
+    estimate.vat_enabled = False
+    estimate.use_internal_price = False
+
+    apply_estimate_totals(estimate)
+
+    assert estimate.items_count == 2
+    assert estimate.margin == 0.0
+    assert estimate.total_with_vat == 800.0
+
+
+def test_analytics_reads_stored_totals_unless_filtered_by_category():
+    expr, source, filters = _revenue_source(_category_filters(None))
+    sql = str(expr.compile(dialect=postgresql.dialect()))
+    assert "estimates.margin" in sql and "estimate_items" not in sql
+    assert "estimates.items_count" in str(filters[0])
+
+    expr, source, filters = _revenue_source(_category_filters(["Звук"]))
+    assert "estimate_items.quantity" in str(expr)
+    assert "estimate_items" in str(source)
@@ -0,0 +1,279 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.dml import Insert
+from sqlalchemy.sql.selectable import Select
+
+from app.api.estimates import update_estimate
+from app.models.client import Client, ClientPipelineStage
+from app.models.estimate import Estimate, EstimateStatus
+from app.models.item import EstimateItem
+from app.models.user import User
+from app.schemas.estimate import EstimateOut, EstimateUpdate
+from app.services.version_store import version_payload
+
+
+def _client(client_id, name):
+    return SimpleNamespace(
+        id=client_id,
+        name=name,
+        user_id=7,
+        organization_id=1,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        updated_at=None,
+        pipeline_stage=ClientPipelineStage.LEAD,
+        pipeline_expected_revenue=0,
+        **{
+            field: None
+            for field in (
+                "company",
+                "email",
+                "phone",
+                "legal_address",
+                "actual_address",
+                "inn",
+                "kpp",
+                "bik",
+                "account",
+                "bank",
+                "corr_account",
+            )
+        },
+    )
+
+
+def _item(item_id, name, quantity=1.0):
+    return SimpleNamespace(
+        id=item_id,
+        name=name,
+        description="",
+        quantity=quantity,
+        unit="шт",
+        internal_price=100.0,
+        external_price=150.0,
+        category="Звук",
+    )
+
+
+def _estimate(client):
+    return SimpleNamespace(
+        id=10,
+        name="Концерт",
+        date=datetime(2026, 3, 1, tzinfo=timezone.utc),
+        updated_at=None,
+        event_datetime=None,
+        event_place=None,
+        client_id=client.id,
+        client=client,
+        responsible="Иван",
+        status=EstimateStatus.DRAFT,
+        vat_enabled=True,
+        vat_rate=20,
+        use_internal_price=True,
+        read_only=False,
+        user_id=7,
+        organization_id=1,
+        items=[_item(1, "Микрофон"), _item(2, "Пульт"), _item(3, "Стойка")],
+        items_count=3,
+        total_internal=300.0,
+        total_external=450.0,
+        margin=150.0,
+        total_with_vat=540.0,
+    )
+
+
+class _Result:
+    def __init__(self, row=None, ids=None):
+        self._row = row
+        self._ids = ids or []
+
+    def one_or_none(self):
+        return self._row
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._ids
+
+
+class _RoundTripDb:
+    """Counts awaited calls that reach the database; get() hits an identity map first."""
+
+    def __init__(self, estimate, clients):
+        self.estimate = estimate
+        self.clients = {client.id: client for client in clients}
+        self.identity_map = {estimate.client.id: estimate.client}
+        self.round_trips = []
+        self.added = []
+
+    async def execute(self, statement, params=None):
+        self.round_trips.append(type(statement).__name__)
+        if isinstance(statement, Select):
+            return _Result(row=(self.estimate, None, 4, False, None))
+        if isinstance(statement, Insert):
+            return _Result(ids=[900 + index for index in range(len(params))])
+        return _Result()
+
+    async def scalar(self, statement):
+        self.round_trips.append("scalar")
+
+    async def get(self, model, object_id):
+        assert model is Client
+        if object_id in self.identity_map:
+            return self.identity_map[object_id]
+        self.round_trips.append("get")
+        return self.clients.get(object_id)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.round_trips.append("commit")
+
+
+def _payload(estimate, **overrides):
+    data = EstimateOut.model_validate(estimate).model_dump(
+        include=set(EstimateUpdate.model_fields)
+    )
+    data.update(overrides)
+    return EstimateUpdate(**data)
+
+
+def _context():
+    return SimpleNamespace(organization_id=1, user=SimpleNamespace(id=7))
+
+
+@pytest.mark.asyncio
+async def test_update_without_item_changes_uses_load_and_commit_only():
+    client = _client(5, "ООО Ромашка")
+    estimate = _estimate(client)
+    db = _RoundTripDb(estimate, [client])
+
+    result = await update_estimate(10, _payload(estimate, name="Концерт 2"), db, _context())
+
+    assert db.round_trips == ["Select", "commit"]
+    assert result.name == "Концерт 2"
+    assert [item.id for item in result.items] == [1, 2, 3]
+    version = next(obj for obj in db.added if type(obj).__name__ == "EstimateVersion")
+    assert version.version == 4
+    assert version.kind == "keyframe"
+    assert version_payload(version)["name"] == "Концерт"
+
+
+@pytest.mark.asyncio
+async def test_update_round_trips_are_bounded_for_heavy_changes():
+    old_client = _client(5, "ООО Ромашка")
+    new_client = _client(6, "ИП Лютик")
+    estimate = _estimate(old_client)
+    db = _RoundTripDb(estimate, [old_client, new_client])
+
+    payload = _payload(estimate, client_id=6, vat_enabled=False)
+    payload.items = [
+        payload.items[0],
+        payload.items[1].model_copy(update={"quantity": 5.0}),
+        payload.items[0].model_copy(update={"id": None, "name": "Свет"}),
+    ]
+
+    result = await update_estimate(10, payload, db, _context())
+
+    # загрузка, новый клиент, DELETE/UPDATE/INSERT позиций, commit
+    assert db.round_trips == ["Select", "get", "Delete", "Update", "Insert", "commit"]
+    assert [item.id for item in result.items] == [1, 2, 900]
+    assert result.client.name == "ИП Лютик"
+    assert estimate.total_with_vat == estimate.total_external == 1050.0
+
+    changelog = next(obj for obj in db.added if type(obj).__name__ == "EstimateChangeLog")
+    assert {
+        "label": "Изменен клиент",
+        "old": "ООО Ромашка",
+        "new": "ИП Лютик",
+    } in changelog.details
+
+
+async def _seed_estimate(pg_sessionmaker, workspace, items_count):
+    async with pg_sessionmaker() as session:
+        clients = [
+            Client(name=name, user_id=workspace.user_id, organization_id=workspace.organization_id)
+            for name in ("ООО Ромашка", "ИП Лютик")
+        ]
+        estimate = Estimate(
+            name="Концерт",
+            responsible="Иван",
+            client=clients[0],
+            user_id=workspace.user_id,
+            organization_id=workspace.organization_id,
+            items=[
+                EstimateItem(
+                    name=f"Позиция {index}",
+                    description="",
+                    category="Звук",
+                    quantity=1,
+                    internal_price=100,
+                    external_price=150,
+                )
+                for index in range(items_count)
+            ],
+        )
+        session.add_all([*clients, estimate])
+        await session.commit()
+        return estimate.id, clients[1].id
+
+
+async def _count_update_statements(pg_engine, pg_sessionmaker, workspace, items_count):
+    estimate_id, other_client_id = await _seed_estimate(pg_sessionmaker, workspace, items_count)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        verb, rest = statement.split(None, 1)
+        table = rest.split()[1] if verb in ("INSERT", "DELETE") else rest.split()[0]
+        statements.append(f"{verb} {table}" if verb != "SELECT" else verb)
+
+    async with pg_sessionmaker() as session:
+        user = await session.get(User, workspace.user_id)
+        context = SimpleNamespace(organization_id=workspace.organization_id, user=user)
+        current = await session.get(
+            Estimate,
+            estimate_id,
+            options=[selectinload(Estimate.items), selectinload(Estimate.client)],
+        )
+        payload = _payload(current, client_id=other_client_id, vat_enabled=False)
+        session.expunge_all()
+        # все позиции кроме первой меняются, одна удаляется, одна добавляется
+        payload.items = [
+            item.model_copy(update={"quantity": 5.0}) for item in payload.items[1:]
+        ] + [payload.items[0].model_copy(update={"id": None, "name": "Свет"})]
+
+        event.listen(pg_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            result = await update_estimate(estimate_id, payload, session, context)
+        finally:
+            event.remove(pg_engine.sync_engine, "before_cursor_execute", record)
+
+    assert result.client.name == "ИП Лютик"
+    assert len(result.items) == items_count
+    return statements
+
+
+async def test_update_statement_count_does_not_grow_with_items(pg_engine, pg_sessionmaker, pg_workspace):
+    small = await _count_update_statements(pg_engine, pg_sessionmaker, pg_workspace, 3)
+    large = await _count_update_statements(pg_engine, pg_sessionmaker, pg_workspace, 40)
+
+    # смета (+ selectin позиций), новый клиент; при commit — журналы, смета,
+    # версия и позиции пакетами: DELETE, UPDATE через executemany, INSERT
+    assert small == [
+        "SELECT",
+        "SELECT",
+        "SELECT",
+        "INSERT estimate_change_logs",
+        "INSERT client_change_logs",
+        "UPDATE estimates",
+        "INSERT estimate_versions",
+        "DELETE estimate_items",
+        "UPDATE estimate_items",
+        "INSERT estimate_items",
+    ]
+    assert large == small
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from tempfile import SpooledTemporaryFile
+from types import SimpleNamespace
+
+from openpyxl import load_workbook
+
+from app.models.estimate import EstimateStatus
+from app.utils.excel import EstimatesWorkbookWriter, generate_excel
+
+
+def _estimate(use_internal_price=True, vat_enabled=True):
+    items = [
+        SimpleNamespace(
+            category="Звук",
+            name="Микрофон",
+            description="Радиосистема",
+            quantity=2,
+            unit="шт",
+            internal_price=100.0,
+            external_price=150.0,
+        ),
+        SimpleNamespace(
+            category="Звук",
+            name="Пульт",
+            description=None,
+            quantity=1,
+            unit="шт",
+            internal_price=300.0,
+            external_price=500.0,
+        ),
+        SimpleNamespace(
+            category=None,
+            name="Доставка",
+            description="",
+            quantity=1,
+            unit="усл",
+            internal_price=50.0,
+            external_price=80.0,
+        ),
+    ]
+    return SimpleNamespace(
+        name="Смета: концерт",
+        client=SimpleNamespace(name="ООО Ромашка", company=None, email=None),
+        status=EstimateStatus.DRAFT,
+        responsible="Иван",
+        event_datetime=None,
+        event_place=None,
+        vat_enabled=vat_enabled,
+        vat_rate=20,
+        date=datetime(2026, 3, 13, 12, 0),
+        use_internal_price=use_internal_price,
+        items=items,
+    )
+
+
+def test_generate_excel_writes_formula_totals_to_spooled_file():
+    output = generate_excel(_estimate())
+    assert isinstance(output, SpooledTemporaryFile)
+
+    ws = load_workbook(output).active
+    assert ws.title == "Смета- концерт"
+    assert [str(cell_range) for cell_range in ws.merged_cells.ranges] == ["A1:I1"]
+    assert ws["A1"].value == "Смета: концерт"
+    assert ws["A1"].font.bold
+
+    # Услуги начинаются после шапки: заголовки в 14-й строке
+    assert ws["A14"].value == "Категория"
+    assert ws["G15"].value == "=F15*D15"
+    assert ws["I16"].value == "=H16*D16"
+    assert ws["G15"].number_format == "₽#,##0.00"
+    assert ws["A17"].value == "Итог по категории: Звук"
+    assert ws["G17"].value == "=SUM(G15:G16)"
+    assert ws["G20"].value == "=F20*D20"
+
+    assert ws["E25"].value == "Итого по всем категориям:"
+    assert ws["G25"].value == "=SUM(G15,G16,G20)"
+    assert ws["I25"].value == "=SUM(I15,I16,I20)"
+    assert ws["I26"].value == "=I25-G25"
+    assert ws["I27"].value == "=I25*0.2"
+    assert ws["I28"].value == "=I25+I27"
+
+
+def test_generate_excel_column_widths_follow_longest_value():
+    ws = load_workbook(generate_excel(_estimate(use_internal_price=False, vat_enabled=False))).active
+
+    # "Дата и время проведения мероприятия" (35 символов, жирный) упирается в максимум
+    assert ws.column_dimensions["A"].width == 33
+    # "Итого по всем категориям:" — 25 символов жирным: int(25 * 1.15) + 3
+    assert ws.column_dimensions["E"].width == 31
+    # Колонки без значений получают минимальную ширину
+    assert ws.column_dimensions["H"].width == 10
+    assert ws["G25"].value == "=SUM(G15,G16,G20)"
+    assert ws["G26"].value == "=G25"
+
+
+def test_generate_excel_writes_aware_event_datetime_without_timezone():
+    estimate = _estimate()
+    # Из БД event_datetime приходит с часовым поясом, а Excel его не хранит
+    estimate.event_datetime = datetime(2026, 5, 20, 19, 30, tzinfo=timezone(timedelta(hours=3)))
+
+    ws = load_workbook(generate_excel(estimate)).active
+
+    assert ws["A8"].value == "Дата и время проведения мероприятия"
+    assert ws["B8"].value == datetime(2026, 5, 20, 19, 30)
+
+def test_workbook_writer_links_summary_to_estimate_sheets():
+    first = _estimate()
+    first.id = 7
+    second = _estimate(vat_enabled=False)
+    second.id = 12
+    second.name = "Свадьба [зал]"
+    second.client = None
+
+    writer = EstimatesWorkbookWriter()
+    writer.add_estimates([first])
+    writer.add_estimates([second])
+    wb = load_workbook(writer.close())
+
+    assert wb.sheetnames == ["Сводка", "7 Смета- концерт", "12 Свадьба -зал-"]
+    summary = wb["Сводка"]
+    assert summary["A2"].value == 7
+    assert summary["B2"].hyperlink.location == "'7 Смета- концерт'!A1"
+    assert summary["G2"].value == "='7 Смета- концерт'!I25"
+    assert summary["H2"].value == "='7 Смета- концерт'!I28"
+    assert summary["C3"].value == "—"
+    assert summary["H3"].value == "='12 Свадьба -зал-'!I27"
+    assert summary["G5"].value == "=SUM(G2:G3)"
+    assert summary["H5"].value == "=SUM(H2:H3)"
+    assert wb["12 Свадьба -зал-"]["G25"].value == "=SUM(G15,G16,G20)"
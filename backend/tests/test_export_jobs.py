@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.audit_ledger import AuditLedgerEntry
+from app.models.estimate import Estimate
+from app.models.export_job import ExportJob, ExportJobStatus
+from app.models.item import EstimateItem
+from app.schemas.export_job import ExportJobCreate
+from app.services import export_jobs
+from app.utils.pdf import PdfRenderQueueFull
+
+
+def _job(**overrides):
+    values = dict(
+        id=7,
+        kind="estimate_pdf",
+        status=ExportJobStatus.QUEUED,
+        progress=0,
+        error=None,
+        file_name=None,
+        file_size=None,
+        created_at=datetime(2026, 3, 13, tzinfo=timezone.utc),
+        started_at=None,
+        finished_at=None,
+        expires_at=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_export_job_create_requires_estimate_for_estimate_kinds():
+    with pytest.raises(ValidationError):
+        ExportJobCreate(kind="invoice_pdf")
+
+    payload = ExportJobCreate(kind="analytics_csv")
+    assert payload.estimate_id is None
+
+
+def test_export_job_out_exposes_download_url_only_when_ready():
+    assert export_jobs.to_export_job_out(_job()).download_url is None
+
+    ready = export_jobs.to_export_job_out(
+        _job(status=ExportJobStatus.SUCCEEDED, progress=100, file_name="estimate_7.pdf")
+    )
+    assert ready.download_url == "/api/exports/7/download"
+
+
+def test_export_files_are_stored_per_job_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXPORTS_JOBS_DIR", str(tmp_path))
+
+    path = export_jobs.store_export_file(7, "Смета 1/2.xlsx", b"xlsx")
+
+    assert path == tmp_path / "7" / "Смета 1_2.xlsx"
+    assert path.read_bytes() == b"xlsx"
+    assert list((tmp_path / "7").iterdir()) == [path]
+
+    export_jobs.remove_export_files(7)
+    assert not (tmp_path / "7").exists()
+
+
+def test_export_job_worker_notify_is_noop_until_started():
+    worker = export_jobs.ExportJobWorker(concurrency=1)
+    worker.notify()
+    assert worker.stats()["enabled"] is False
+
+
+async def _add_job(pg_sessionmaker, workspace, **values):
+    async with pg_sessionmaker() as session:
+        job = ExportJob(
+            user_id=workspace.user_id,
+            organization_id=workspace.organization_id,
+            kind=values.pop("kind", "estimate_excel"),
+            params=values.pop("params", {}),
+            status=values.pop("status", ExportJobStatus.QUEUED),
+            progress=0,
+            attempts=values.pop("attempts", 0),
+            **values,
+        )
+        session.add(job)
+        await session.commit()
+        return job.id
+
+
+async def _get_job(pg_sessionmaker, job_id):
+    async with pg_sessionmaker() as session:
+        return await session.get(ExportJob, job_id)
+
+
+async def test_claim_skips_jobs_locked_by_another_runner(pg_sessionmaker, pg_workspace):
+    first = await _add_job(pg_sessionmaker, pg_workspace)
+    second = await _add_job(pg_sessionmaker, pg_workspace)
+
+    async with pg_sessionmaker() as holder, pg_sessionmaker() as runner:
+        locked = await holder.execute(
+            select(ExportJob).where(ExportJob.id == first).with_for_update()
+        )
+        assert locked.scalar_one().id == first
+
+        claimed = await export_jobs.claim_next_export_job(runner)
+        assert claimed.id == second
+        assert await export_jobs.claim_next_export_job(runner) is None
+        await holder.rollback()
+
+    job = await _get_job(pg_sessionmaker, second)
+    assert (job.status, job.attempts, job.progress) == (ExportJobStatus.RUNNING, 1, 5)
+
+
+async def test_claim_requeues_stale_jobs_and_fails_exhausted_ones(pg_sessionmaker, pg_workspace):
+    now = datetime.now(timezone.utc)
+    stale_at = now - timedelta(seconds=export_jobs.STALE_AFTER_SECONDS + 60)
+    exhausted = await _add_job(
+        pg_sessionmaker,
+        pg_workspace,
+        status=ExportJobStatus.RUNNING,
+        attempts=export_jobs.MAX_ATTEMPTS,
+        heartbeat_at=stale_at,
+    )
+    stale = await _add_job(
+        pg_sessionmaker, pg_workspace, status=ExportJobStatus.RUNNING, attempts=1, heartbeat_at=stale_at
+    )
+    await _add_job(
+        pg_sessionmaker, pg_workspace, status=ExportJobStatus.RUNNING, attempts=1, heartbeat_at=now
+    )
+    await _add_job(pg_sessionmaker, pg_workspace, run_after=now + timedelta(minutes=5))
+
+    async with pg_sessionmaker() as session:
+        claimed = await export_jobs.claim_next_export_job(session)
+        assert claimed.id == stale
+        assert await export_jobs.claim_next_export_job(session) is None
+
+    job = await _get_job(pg_sessionmaker, stale)
+    assert (job.status, job.attempts) == (ExportJobStatus.RUNNING, 2)
+    assert job.heartbeat_at > stale_at
+    job = await _get_job(pg_sessionmaker, exhausted)
+    assert job.status == ExportJobStatus.FAILED
+    assert job.expires_at is not None
+
+
+async def _add_estimate(pg_sessionmaker, workspace):
+    async with pg_sessionmaker() as session:
+        estimate = Estimate(
+            name="Корпоратив",
+            responsible="Иван",
+            user_id=workspace.user_id,
+            organization_id=workspace.organization_id,
+            items=[EstimateItem(name="Звук", quantity=2, internal_price=100, external_price=150)],
+        )
+        session.add(estimate)
+        await session.commit()
+        return estimate.id
+
+
+async def _run(pg_sessionmaker, monkeypatch, tmp_path, job_id):
+    monkeypatch.setattr(export_jobs, "SessionLocal", pg_sessionmaker)
+    monkeypatch.setattr(settings, "EXPORTS_JOBS_DIR", str(tmp_path))
+    async with pg_sessionmaker() as session:
+        claimed = await export_jobs.claim_next_export_job(session)
+        assert claimed.id == job_id
+    return await export_jobs.run_export_job(job_id)
+
+
+async def test_run_export_job_stores_the_document(pg_sessionmaker, pg_workspace, monkeypatch, tmp_path):
+    estimate_id = await _add_estimate(pg_sessionmaker, pg_workspace)
+    job_id = await _add_job(pg_sessionmaker, pg_workspace, params={"estimate_id": estimate_id})
+
+    status = await _run(pg_sessionmaker, monkeypatch, tmp_path, job_id)
+
+    assert status == ExportJobStatus.SUCCEEDED
+    job = await _get_job(pg_sessionmaker, job_id)
+    assert (job.status, job.progress, job.file_name) == (ExportJobStatus.SUCCEEDED, 100, "Корпоратив.xlsx")
+    assert job.file_size == len((tmp_path / str(job_id) / "Корпоратив.xlsx").read_bytes())
+    async with pg_sessionmaker() as session:
+        actions = (await session.execute(select(AuditLedgerEntry.action))).scalars().all()
+    assert actions == ["estimate.export.excel"]
+
+
+async def test_run_export_job_records_the_failure(pg_sessionmaker, pg_workspace, monkeypatch, tmp_path):
+    job_id = await _add_job(pg_sessionmaker, pg_workspace, kind="analytics_csv")
+
+    status = await _run(pg_sessionmaker, monkeypatch, tmp_path, job_id)
+
+    assert status == ExportJobStatus.FAILED
+    job = await _get_job(pg_sessionmaker, job_id)
+    assert job.status == ExportJobStatus.FAILED
+    assert job.error == "Смет по данным фильтрам не найдено"
+    assert job.expires_at is not None
+
+
+async def test_render_backpressure_requeues_the_job_with_a_delay(
+    pg_sessionmaker, pg_workspace, monkeypatch, tmp_path
+):
+    async def busy_builder(db, estimate_id, organization_id):
+        raise PdfRenderQueueFull("busy")
+
+    monkeypatch.setitem(
+        export_jobs.ESTIMATE_DOCUMENT_BUILDERS, "estimate_pdf", (busy_builder, "estimate.export.pdf")
+    )
+    job_id = await _add_job(pg_sessionmaker, pg_workspace, kind="estimate_pdf", params={"estimate_id": 1})
+
+    status = await _run(pg_sessionmaker, monkeypatch, tmp_path, job_id)
+
+    assert status == ExportJobStatus.QUEUED
+    job = await _get_job(pg_sessionmaker, job_id)
+    assert (job.status, job.attempts, job.error) == (ExportJobStatus.QUEUED, 0, None)
+    assert job.run_after > datetime.now(timezone.utc) + timedelta(
+        seconds=export_jobs.BACKPRESSURE_RETRY_SECONDS - 5
+    )
+    async with pg_sessionmaker() as session:
+        assert await export_jobs.claim_next_export_job(session) is None
+
+
+async def test_cleanup_expires_jobs_and_removes_their_files(
+    pg_sessionmaker, pg_workspace, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(settings, "EXPORTS_JOBS_DIR", str(tmp_path))
+    now = datetime.now(timezone.utc)
+    expired = await _add_job(
+        pg_sessionmaker, pg_workspace, status=ExportJobStatus.SUCCEEDED, expires_at=now - timedelta(hours=1)
+    )
+    fresh = await _add_job(
+        pg_sessionmaker, pg_workspace, status=ExportJobStatus.SUCCEEDED, expires_at=now + timedelta(hours=1)
+    )
+    for job_id in (expired, fresh):
+        export_jobs.store_export_file(job_id, "export.csv", b"csv")
+
+    async with pg_sessionmaker() as session:
+        assert await export_jobs.cleanup_expired_export_jobs(session) == 1
+
+    job = await _get_job(pg_sessionmaker, expired)
+    assert (job.status, job.file_path) == (ExportJobStatus.EXPIRED, None)
+    assert not (tmp_path / str(expired)).exists()
+    assert (tmp_path / str(fresh) / "export.csv").exists()
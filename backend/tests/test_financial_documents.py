@@ -4,7 +4,7 @@ from types import SimpleNamespace
 import pytest
 from fastapi import HTTPException
 
-from app.api.estimates import (
+from app.services.export_documents import (
     build_financial_document_number,
     calculate_estimate_totals,
     ensure_financial_documents_allowed,
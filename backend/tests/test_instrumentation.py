@@ -0,0 +1,118 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from app.core import instrumentation
+from app.core.instrumentation import (
+    RequestInstrumentationMiddleware,
+    RequestTimings,
+    install_sql_hooks,
+    instrument_routes,
+    timed,
+)
+
+
+def _fake_statement() -> None:
+    context = SimpleNamespace()
+    instrumentation._before_cursor_execute(None, None, "SELECT 1", (), context, False)
+    instrumentation._after_cursor_execute(None, None, "SELECT 1", (), context, False)
+
+
+def _build_app(**options) -> FastAPI:
+    async def current_user():
+        with timed("auth"):
+            _fake_statement()
+            return {"id": 1}
+
+    test_app = FastAPI()
+
+    @test_app.get("/items/{item_id}")
+    async def read_item(item_id: int, user=Depends(current_user)):
+        _fake_statement()
+        with timed("render"):
+            pass
+        return {"item_id": item_id, "user": user["id"]}
+
+    @test_app.get("/sync")
+    def read_sync():
+        return {"ok": True}
+
+    instrument_routes(test_app.routes)
+    test_app.add_middleware(RequestInstrumentationMiddleware, **options)
+    return test_app
+
+
+def _server_timing(response) -> dict[str, str]:
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, *params = entry.split(";")
+        entries[name] = ";".join(params)
+    return entries
+
+
+def test_server_timing_reports_statements_and_phases(caplog):
+    client = TestClient(_build_app())
+
+    with caplog.at_level(logging.INFO, logger="app.requests"):
+        response = client.get("/items/7")
+
+    assert response.status_code == 200
+    assert response.json() == {"item_id": 7, "user": 1}
+    entries = _server_timing(response)
+    assert list(entries) == ["db", "auth", "handler", "serialize", "render", "total"]
+    assert entries["db"].endswith('desc="2 queries"')
+
+    [record] = [record for record in caplog.records if record.name == "app.requests"]
+    message = record.getMessage()
+    assert message.startswith("request method=GET path=/items/7 route=/items/{item_id} status=200 ")
+    assert "db_count=2" in message
+    assert "handler_ms=" in message and "serialize_ms=" in message
+
+
+def test_sync_endpoints_are_timed_and_logging_respects_the_threshold(caplog):
+    client = TestClient(_build_app(log_min_duration_ms=60_000))
+
+    with caplog.at_level(logging.INFO, logger="app.requests"):
+        response = client.get("/sync")
+
+    assert response.json() == {"ok": True}
+    assert list(_server_timing(response)) == ["db", "handler", "serialize", "total"]
+    assert not [record for record in caplog.records if record.name == "app.requests"]
+
+
+def test_header_can_be_disabled_and_timers_are_inert_outside_requests():
+    client = TestClient(_build_app(server_timing=False, log_requests=False))
+
+    response = client.get("/items/1")
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    with timed("render"):
+        pass
+    _fake_statement()
+
+
+def test_failed_statements_leave_nothing_on_the_pooled_connection():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    install_sql_hooks(engine)
+    timings = RequestTimings()
+    token = instrumentation._current.set(timings)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+            info = dict(conn.connection.info)
+    finally:
+        instrumentation._current.reset(token)
+        engine.dispose()
+
+    assert timings.db_count == 1
+    assert not any(key.startswith("instrumentation") for key in info)
@@ -0,0 +1,80 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry
+
+
+def test_registry_renders_the_prometheus_text_format():
+    registry = MetricsRegistry()
+    latency = registry.histogram("job_seconds", "Job time.", ("kind",), buckets=(0.1, 1.0))
+    failures = registry.counter("job_failures_total", "Failed jobs.")
+    registry.gauge("queue_depth", "Waiting jobs.", callback=lambda: 3)
+
+    latency.observe(0.05, 'say "hi"')
+    latency.observe(0.5, 'say "hi"')
+    latency.observe(5, 'say "hi"')
+    failures.inc()
+
+    assert registry.render().splitlines() == [
+        "# HELP job_seconds Job time.",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{kind="say \\"hi\\"",le="0.1"} 1',
+        'job_seconds_bucket{kind="say \\"hi\\"",le="1"} 2',
+        'job_seconds_bucket{kind="say \\"hi\\"",le="+Inf"} 3',
+        'job_seconds_sum{kind="say \\"hi\\""} 5.55',
+        'job_seconds_count{kind="say \\"hi\\""} 3',
+        "# HELP job_failures_total Failed jobs.",
+        "# TYPE job_failures_total counter",
+        "job_failures_total 1",
+        "# HELP queue_depth Waiting jobs.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+
+
+def test_middleware_records_latency_per_route_template(monkeypatch):
+    registry = MetricsRegistry()
+    latency = registry.histogram("http_seconds", "Latency.", ("method", "route", "status"))
+    in_flight = registry.gauge("http_in_flight", "In flight.")
+    monkeypatch.setattr("app.core.metrics.HTTP_REQUEST_SECONDS", latency)
+    monkeypatch.setattr("app.core.metrics.HTTP_REQUESTS_IN_FLIGHT", in_flight)
+    seen_in_flight = []
+
+    test_app = FastAPI()
+
+    @test_app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        seen_in_flight.append(in_flight._values[()])
+        return {"item_id": item_id}
+
+    test_app.add_middleware(MetricsMiddleware)
+    client = TestClient(test_app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    text = registry.render()
+    assert seen_in_flight == [1, 1]
+    assert 'http_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in text
+    assert 'http_seconds_count{method="GET",route="<unmatched>",status="404"} 1' in text
+    assert "http_in_flight 0" in text
+
+
+def test_metrics_endpoint_exposes_pool_and_subsystem_metrics():
+    client = TestClient(main_module.app)
+
+    response = client.get("/api/health/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    for name in (
+        "db_pool_checked_out",
+        "db_pool_overflow",
+        "pdf_render_queue_depth",
+        "pdf_render_duration_seconds",
+        "excel_generation_duration_seconds",
+        "email_send_failures_total",
+        "audit_ledger_append_duration_seconds",
+    ):
+        assert f"\n# TYPE {name} " in response.text
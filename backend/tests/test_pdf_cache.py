@@ -0,0 +1,57 @@
+import os
+
+from app.utils.pdf_cache import PdfCache
+
+
+def _make_cache(tmp_path, max_bytes=1024):
+    templates_dir = tmp_path / "templates"
+    templates_dir.mkdir()
+    (templates_dir / "estimate_pdf.html").write_text("<h1>{{ name }}</h1>", encoding="utf-8")
+    return PdfCache(tmp_path / "cache", max_bytes=max_bytes, templates_dir=templates_dir)
+
+
+def test_pdf_cache_key_tracks_html_and_template(tmp_path):
+    cache = _make_cache(tmp_path)
+    key = cache.build_key("estimate_pdf.html", "<h1>A</h1>")
+
+    assert cache.build_key("estimate_pdf.html", "<h1>A</h1>") == key
+    assert cache.build_key("estimate_pdf.html", "<h1>B</h1>") != key
+
+    template = tmp_path / "templates" / "estimate_pdf.html"
+    template.write_text("<h2>{{ name }}</h2>", encoding="utf-8")
+    stat = template.stat()
+    os.utime(template, (stat.st_atime, stat.st_mtime + 10))
+    assert cache.build_key("estimate_pdf.html", "<h1>A</h1>") != key
+
+
+def test_pdf_cache_get_put_and_invalidate(tmp_path):
+    cache = _make_cache(tmp_path)
+    key = cache.build_key("estimate_pdf.html", "<h1>A</h1>")
+
+    assert cache.get(7, key) is None
+    cache.put(7, key, b"%PDF-1")
+    assert cache.get(7, key) == b"%PDF-1"
+
+    cache.invalidate_estimate(7)
+    assert cache.get(7, key) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_pdf_cache_evicts_least_recently_used(tmp_path):
+    cache = _make_cache(tmp_path, max_bytes=250)
+    cache.put(1, "old", b"x" * 100)
+    cache.put(2, "recent", b"y" * 100)
+    os.utime(tmp_path / "cache" / "1" / "old.pdf", (1, 1))
+    os.utime(tmp_path / "cache" / "2" / "recent.pdf", (2, 2))
+
+    assert cache.get(1, "old") == b"x" * 100  # refreshes mtime
+    cache.put(3, "new", b"z" * 100)
+
+    assert cache.get(1, "old") is not None
+    assert cache.get(2, "recent") is None
+    assert cache.get(3, "new") is not None
+    assert not (tmp_path / "cache" / "2").exists()
+    assert cache.stats()["evictions"] == 1
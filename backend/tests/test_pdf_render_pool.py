@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import sys
+import threading
+
+import pytest
+
+from app.utils import pdf as pdf_module
+from app.utils.pdf import PdfRenderPool, PdfRenderQueueFull
+from app.utils.pdf_worker import ResidentRenderer, ResidentRendererError
+
+
+@pytest.mark.asyncio
+async def test_pdf_render_pool_reports_in_flight_and_queued(monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+
+    def _slow_render(html):
+        started.set()
+        release.wait(timeout=5)
+        return html.encode()
+
+    monkeypatch.setattr(pdf_module, "html_to_pdf", _slow_render)
+    pool = PdfRenderPool(workers=1, queue_depth=1)
+    try:
+        first = asyncio.create_task(pool.render("<p>1</p>"))
+        second = asyncio.create_task(pool.render("<p>2</p>"))
+        await asyncio.to_thread(started.wait, 5)
+        await asyncio.sleep(0)
+
+        stats = pool.stats()
+        assert stats["in_flight"] == 1
+        assert stats["queued"] == 1
+
+        with pytest.raises(PdfRenderQueueFull):
+            await pool.render("<p>3</p>")
+
+        release.set()
+        assert await first == b"<p>1</p>"
+        assert await second == b"<p>2</p>"
+
+        stats = pool.stats()
+        assert stats["in_flight"] == 0
+        assert stats["queued"] == 0
+        assert stats["completed"] == 2
+        assert stats["rejected"] == 1
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pdf_render_pool_counts_failures(monkeypatch):
+    def _broken_render(_html):
+        raise OSError("wkhtmltopdf missing")
+
+    monkeypatch.setattr(pdf_module, "html_to_pdf", _broken_render)
+    pool = PdfRenderPool(workers=2, queue_depth=0)
+    try:
+        with pytest.raises(OSError):
+            await pool.render("<p></p>")
+        assert pool.stats()["failed"] == 1
+        assert pool.stats()["in_flight"] == 0
+    finally:
+        pool.shutdown()
+
+
+# Ведёт себя как `wkhtmltopdf --read-args-from-stdin`: задача на строку,
+# прогресс и "Done" в stderr, выход по концу stdin
+FAKE_WKHTMLTOPDF = """#!{python}
+import os, sys, time
+assert sys.argv[1:] == ["--read-args-from-stdin"]
+for line in sys.stdin:
+    *options, source, target = line.split()
+    assert options == ["--encoding", "utf-8"]
+    html = open(source, encoding="utf-8").read()
+    if "crash" in html:
+        os._exit(1)
+    if "hang" in html:
+        time.sleep(30)
+    with open(target, "w") as file:
+        file.write(f"%PDF pid={{os.getpid()}} {{html}}")
+    sys.stderr.write("Loading pages (1/6)\\n[====>   ] 50%\\r[========] 100%\\rDone\\n")
+    sys.stderr.flush()
+"""
+
+
+@pytest.fixture
+def fake_wkhtmltopdf(tmp_path):
+    binary = tmp_path / "wkhtmltopdf"
+    binary.write_text(FAKE_WKHTMLTOPDF.format(python=sys.executable))
+    binary.chmod(0o755)
+    return str(binary)
+
+
+def _resident_pool(binary, **options):
+    pool = PdfRenderPool(processes=True, **options)
+    pool._renderer_factory = functools.partial(ResidentRenderer, binary=binary, timeout=5)
+    return pool
+
+
+def _pid(pdf: bytes) -> str:
+    return pdf.split()[1].decode()
+
+
+@pytest.mark.asyncio
+async def test_pdf_render_pool_reuses_and_recycles_resident_wkhtmltopdf(fake_wkhtmltopdf):
+    pool = _resident_pool(fake_wkhtmltopdf, workers=1, queue_depth=4, max_jobs_per_worker=2)
+    try:
+        pdfs = [await pool.render(f"<p>{index}</p>") for index in range(4)]
+        assert pdfs[3].endswith(b"<p>3</p>")
+        pids = [_pid(pdf) for pdf in pdfs]
+        assert pids[0] == pids[1]
+        assert pids[2] == pids[3]
+        assert pids[0] != pids[2]
+        assert pool.stats()["completed"] == 4
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pdf_render_pool_replaces_crashed_wkhtmltopdf(fake_wkhtmltopdf):
+    pool = _resident_pool(fake_wkhtmltopdf, workers=1, queue_depth=0)
+    try:
+        first = _pid(await pool.render("<p>1</p>"))
+        with pytest.raises(ResidentRendererError):
+            await pool.render("<p>crash</p>")
+        stats = pool.stats()
+        assert stats["failed"] == 1
+        assert stats["worker_restarts"] == 1
+
+        assert _pid(await pool.render("<p>2</p>")) != first
+        assert pool.stats()["completed"] == 2
+    finally:
+        pool.shutdown()
+
+
+def test_resident_renderer_gives_up_on_a_hung_process(fake_wkhtmltopdf):
+    renderer = ResidentRenderer(binary=fake_wkhtmltopdf, timeout=0.5)
+    try:
+        renderer.render("<p>1</p>")
+        first = renderer.pid
+        with pytest.raises(ResidentRendererError):
+            renderer.render("<p>hang</p>")
+        assert renderer.pid is None
+        renderer.render("<p>2</p>")
+        assert renderer.pid != first
+        assert renderer.starts == 2
+    finally:
+        renderer.stop()
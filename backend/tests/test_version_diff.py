@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api.versions import list_versions
+from app.services.version_diff import compare_snapshots
+
+
+def _snapshot(**overrides):
+    snapshot = {
+        "id": 10,
+        "name": "Концерт",
+        "status": "draft",
+        "vat_enabled": True,
+        "vat_rate": 20,
+        "use_internal_price": True,
+        "is_favorite": False,
+        "items": [
+            {"id": 1, "name": "Звук", "category": "Техника", "quantity": 1, "internal_price": 50.0, "external_price": 100.0},
+            {"id": 2, "name": "Свет", "category": "Техника", "quantity": 2, "internal_price": 20.0, "external_price": 50.0},
+        ],
+    }
+    snapshot.update(overrides)
+    return snapshot
+
+
+def test_compare_reports_fields_items_and_totals():
+    old = _snapshot()
+    new = _snapshot(
+        name="Концерт 2",
+        is_favorite=True,
+        items=[
+            # id сменился после восстановления версии — пара находится по названию
+            {"id": 8, "name": "Звук", "category": "Техника", "quantity": 3, "internal_price": 50.0, "external_price": 100.0},
+            {"id": 9, "name": "Сцена", "category": "Площадка", "quantity": 1, "internal_price": 300.0, "external_price": 500.0},
+        ],
+    )
+
+    diff = compare_snapshots(old, new)
+
+    assert diff["fields"] == [{"field": "name", "old": "Концерт", "new": "Концерт 2"}]
+    assert diff["items"]["changed"] == [
+        {"id": 8, "name": "Звук", "changes": [{"field": "quantity", "old": 1, "new": 3}]}
+    ]
+    assert [item["name"] for item in diff["items"]["added"]] == ["Сцена"]
+    assert [item["name"] for item in diff["items"]["removed"]] == ["Свет"]
+    assert diff["totals_from"]["total_external"] == 200.0
+    assert diff["totals_to"]["total_external"] == 800.0
+    assert diff["totals_to"]["total_with_vat"] == pytest.approx(960.0)
+
+
+def test_compare_ignores_timestamps_and_stored_totals():
+    # старый снимок без итогов против текущего состояния сметы с итогами
+    old = _snapshot(updated_at="2026-03-01T10:00:00+00:00")
+    new = _snapshot(
+        updated_at="2026-10-18T10:00:00+00:00",
+        items_count=2,
+        total_internal=90.0,
+        total_external=200.0,
+        margin=110.0,
+        total_with_vat=240.0,
+    )
+
+    diff = compare_snapshots(old, new)
+
+    assert diff["fields"] == []
+    assert diff["totals_from"] == diff["totals_to"]
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _VersionsDb:
+    def __init__(self):
+        self.statements = []
+
+    async def get(self, _model, _object_id):
+        return SimpleNamespace(organization_id=1)
+
+    async def scalar(self, _statement):
+        return 1
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        row = SimpleNamespace(
+            _mapping={
+                "id": 5,
+                "estimate_id": 10,
+                "version": 1,
+                "created_at": datetime(2026, 10, 1, tzinfo=timezone.utc),
+                "user_id": 7,
+                "user_name": "Иван",
+            }
+        )
+        return _Rows([row])
+
+
+@pytest.mark.asyncio
+async def test_metadata_listing_does_not_read_snapshots():
+    db = _VersionsDb()
+    context = SimpleNamespace(organization_id=1, user=SimpleNamespace(id=7))
+
+    result = await list_versions(10, page=1, limit=10, include_payload=False, db=db, context=context)
+
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "estimate_versions.payload" not in sql
+    assert "estimate_versions.data" not in sql
+    assert "users.name AS user_name" in sql
+    assert result.items[0].user_name == "Иван"
+    assert not hasattr(result.items[0], "payload")
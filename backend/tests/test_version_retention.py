@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.models.estimate import Estimate
+from app.models.estimate_approval import EstimateApprovalWorkflow
+from app.models.version import EstimateVersion
+from app.services import version_retention
+from app.services.version_retention import (
+    COMPACTION_LOCK_KEY,
+    VersionCompactor,
+    compact_estimate_versions,
+    retention_candidates_query,
+    retention_range_end_query,
+)
+from app.services.version_store import VERSION_KIND_DELTA, VERSION_KIND_KEYFRAME, build_estimate_version
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_candidates_keep_one_version_per_day_then_per_week(monkeypatch):
+    monkeypatch.setattr(settings, "VERSIONS_KEEP_ALL_DAYS", 7)
+    monkeypatch.setattr(settings, "VERSIONS_KEEP_DAILY_DAYS", 30)
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+    sql = _sql(retention_candidates_query(now, 40, 90))
+
+    assert "estimate_versions.created_at < '2026-10-11 00:00:00+00:00'" in sql
+    assert "WHEN (estimate_versions.created_at >= '2026-09-18 00:00:00+00:00')" in sql
+    assert "date_trunc('day', estimate_versions.created_at)" in sql
+    assert "date_trunc('week', estimate_versions.created_at)" in sql
+    assert "row_number() OVER (PARTITION BY estimate_versions.estimate_id" in sql
+    assert "anon_1.bucket_rank > 1" in sql
+    # последний keyframe и снимки согласований не удаляются
+    assert "estimate_versions_1.kind = 'keyframe'" in sql
+    assert "estimate_approval_workflows.started_at" in sql
+    assert "estimate_approval_workflows.completed_at" in sql
+    # диапазон смет ограничивает и окно, и снимки согласований
+    assert sql.count("estimate_versions.estimate_id >= 40 AND estimate_versions.estimate_id <= 90") == 1
+    assert sql.count("estimate_approval_workflows.estimate_id >= 40") == 2
+    assert sql.count("estimate_approval_workflows.estimate_id <= 90") == 2
+    assert "LIMIT" not in sql
+
+
+def test_range_end_skips_one_batch_of_old_versions():
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+    sql = _sql(retention_range_end_query(now, 40, 500))
+
+    assert "estimate_versions.estimate_id >= 40" in sql
+    assert sql.rstrip().endswith("LIMIT 1 OFFSET 499")
+
+
+@pytest.mark.asyncio
+async def test_compactor_accumulates_reclaimed_rows_and_bytes(monkeypatch):
+    reports = iter(
+        [
+            {"estimates": 2, "rows": 5, "bytes": 4000, "duration_ms": 3.0},
+            {"estimates": 1, "rows": 1, "bytes": 700, "duration_ms": 1.0},
+        ]
+    )
+
+    async def fake_compact(**_kwargs):
+        return next(reports)
+
+    monkeypatch.setattr(version_retention, "compact_estimate_versions", fake_compact)
+    compactor = VersionCompactor()
+
+    await compactor.run_once()
+    await compactor.run_once()
+
+    stats = compactor.stats()
+    assert stats["runs"] == 2
+    assert stats["rows_reclaimed"] == 6
+    assert stats["bytes_reclaimed"] == 4700
+    assert stats["last_run"]["rows"] == 1
+
+
+def _at(month, day, hour=10):
+    return datetime(2026, month, day, hour, tzinfo=timezone.utc)
+
+
+# версия: (время создания, keyframe, от которого считается delta)
+HISTORY = {
+    1: (_at(8, 3), None),
+    2: (_at(8, 5), None),  # последняя за неделю
+    3: (_at(9, 20, 9), 2),
+    4: (_at(9, 20, 12), 2),  # последняя за день
+    5: (_at(9, 21, 9), None),  # снимок на момент запуска согласования
+    6: (_at(9, 21, 12), 5),
+    7: (_at(9, 22, 9), None),  # последний keyframe
+    8: (_at(9, 22, 12), 7),
+    9: (_at(10, 15), 7),  # моложе keep_all_days
+}
+
+
+async def _seed_history(pg_sessionmaker, workspace):
+    items = [{"id": index, "name": f"Позиция {index}", "quantity": 1} for index in range(30)]
+    async with pg_sessionmaker() as session:
+        estimate = Estimate(
+            name="Концерт",
+            responsible="Иван",
+            user_id=workspace.user_id,
+            organization_id=workspace.organization_id,
+        )
+        session.add(estimate)
+        await session.flush()
+        rows = {}
+        for version, (created_at, base) in HISTORY.items():
+            payload = {"name": f"Концерт v{version}", "items": items}
+            row = build_estimate_version(
+                estimate.id, version, workspace.user_id, payload, rows.get(base)
+            )
+            row.created_at = created_at
+            rows[version] = row
+            session.add(row)
+        session.add(
+            EstimateApprovalWorkflow(
+                estimate_id=estimate.id,
+                owner_user_id=workspace.user_id,
+                status="approved",
+                started_at=_at(9, 21, 8),
+            )
+        )
+        await session.commit()
+    assert {version: row.kind for version, row in rows.items()} == {
+        version: VERSION_KIND_DELTA if base else VERSION_KIND_KEYFRAME
+        for version, (_created_at, base) in HISTORY.items()
+    }
+    return estimate.id
+
+
+@pytest.fixture
+def retention_settings(monkeypatch, pg_sessionmaker):
+    monkeypatch.setattr(version_retention, "SessionLocal", pg_sessionmaker)
+    monkeypatch.setattr(settings, "VERSIONS_KEEP_ALL_DAYS", 7)
+    monkeypatch.setattr(settings, "VERSIONS_KEEP_DAILY_DAYS", 30)
+    monkeypatch.setattr(settings, "VERSIONS_KEYFRAME_INTERVAL", 100)
+    # диапазон из одной старой версии: проверяется переход между пачками
+    monkeypatch.setattr(settings, "VERSIONS_COMPACT_BATCH_SIZE", 1)
+
+
+async def test_compaction_keeps_bucket_heads_keyframe_and_approval_snapshots(
+    pg_sessionmaker, pg_workspace, retention_settings
+):
+    estimate_ids = [await _seed_history(pg_sessionmaker, pg_workspace) for _ in range(2)]
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+    dry_run = await compact_estimate_versions(dry_run=True, now=now)
+    report = await compact_estimate_versions(now=now)
+
+    assert (dry_run["rows"], dry_run["estimates"], dry_run["skipped"]) == (4, 2, False)
+    assert (report["rows"], report["estimates"]) == (4, 2)
+    async with pg_sessionmaker() as session:
+        for estimate_id in estimate_ids:
+            kept = await session.scalars(
+                select(EstimateVersion.version)
+                .where(EstimateVersion.estimate_id == estimate_id)
+                .order_by(EstimateVersion.version)
+            )
+            assert list(kept) == [2, 4, 5, 6, 7, 8, 9]
+
+
+async def test_compaction_is_skipped_while_another_process_holds_the_lock(
+    pg_engine, pg_sessionmaker, pg_workspace, retention_settings
+):
+    await _seed_history(pg_sessionmaker, pg_workspace)
+
+    async with pg_engine.connect() as other:
+        assert await other.scalar(select(func.pg_try_advisory_lock(COMPACTION_LOCK_KEY)))
+        report = await compact_estimate_versions(now=datetime(2026, 10, 18, tzinfo=timezone.utc))
+        await other.execute(select(func.pg_advisory_unlock(COMPACTION_LOCK_KEY)))
+
+    assert (report["skipped"], report["rows"]) == (True, 0)
+    async with pg_sessionmaker() as session:
+        assert await session.scalar(select(func.count()).select_from(EstimateVersion)) == 9
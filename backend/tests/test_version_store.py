@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.version_store import (
+    apply_delta,
+    diff_payloads,
+    encode_version,
+    reencode_versions,
+    version_payload,
+)
+
+
+def _payload(**overrides):
+    payload = {
+        "id": 1,
+        "name": "Концерт",
+        "status": "draft",
+        "client": {"id": 3, "name": "ООО Ромашка"},
+        "items": [
+            {"id": 1, "name": "Звук", "quantity": 1, "external_price": 100.0},
+            {"id": 2, "name": "Свет", "quantity": 2, "external_price": 50.0},
+        ],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _row(version, values):
+    return SimpleNamespace(version=version, **values)
+
+
+@pytest.fixture(autouse=True)
+def _storage_settings(monkeypatch):
+    monkeypatch.setattr(settings, "VERSIONS_KEYFRAME_INTERVAL", 3)
+    monkeypatch.setattr(settings, "VERSIONS_COMPRESSION", "zlib")
+
+
+def test_delta_roundtrip_matches_items_by_id():
+    base = _payload()
+    target = _payload(
+        name="Концерт 2",
+        items=[
+            {"id": 2, "name": "Свет", "quantity": 4, "external_price": 50.0},
+            {"id": 7, "name": "Сцена", "quantity": 1, "external_price": 900.0},
+        ],
+    )
+    del target["client"]
+
+    delta = diff_payloads(base, target)
+
+    assert delta["set"] == {"name": "Концерт 2"}
+    assert delta["unset"] == ["client"]
+    assert delta["items"]["changed"] == {
+        "2": {"patch": {"quantity": 4}},
+        "7": {"full": target["items"][1]},
+    }
+    assert apply_delta(base, delta) == target
+
+
+def test_items_without_ids_are_stored_as_a_whole_list():
+    base = _payload()
+    target = _payload(items=[{"id": None, "name": "Звук"}])
+
+    delta = diff_payloads(base, target)
+
+    assert delta["items"] == {"replace": target["items"]}
+    assert apply_delta(base, delta) == target
+
+
+def test_encode_switches_to_keyframe_every_interval():
+    keyframe = _row(1, encode_version(1, _payload()))
+    delta = _row(2, encode_version(2, _payload(name="Концерт 2"), keyframe))
+    late = _row(4, encode_version(4, _payload(name="Концерт 4"), keyframe))
+
+    assert keyframe.kind == "keyframe" and keyframe.payload is None
+    assert delta.kind == "delta" and delta.base_version == 1
+    assert delta.size_bytes < keyframe.size_bytes
+    assert late.kind == "keyframe"
+    assert version_payload(delta, version_payload(keyframe))["name"] == "Концерт 2"
+    with pytest.raises(ValueError):
+        version_payload(delta)
+
+
+def test_reencode_converts_legacy_snapshots_into_a_chain():
+    payloads = {version: _payload(name=f"Концерт {version}") for version in range(1, 6)}
+    rows = [
+        SimpleNamespace(
+            version=version,
+            payload=payload,
+            kind="keyframe",
+            base_version=None,
+            encoding=None,
+            data=None,
+            size_bytes=None,
+        )
+        for version, payload in payloads.items()
+    ]
+
+    reencode_versions(rows, payloads)
+
+    assert [row.kind for row in rows] == ["keyframe", "delta", "delta", "keyframe", "delta"]
+    assert [row.base_version for row in rows] == [None, 1, 1, None, 4]
+    assert all(row.payload is None for row in rows)
+    keyframes = {row.version: version_payload(row) for row in rows if row.kind == "keyframe"}
+    for row in rows:
+        assert version_payload(row, keyframes.get(row.base_version)) == payloads[row.version]